@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User
+from .models import OutboundEmail, User
 
 @admin.register(User)
 class UserAdmin(BaseUserAdmin):
@@ -11,4 +11,13 @@ class UserAdmin(BaseUserAdmin):
         ('Role Information', {'fields': ('role',)}),
     )
     list_display = ['username', 'email', 'first_name', 'last_name', 'role', 'is_active']
-    list_filter = ['role', 'is_active', 'date_joined']
\ No newline at end of file
+    list_filter = ['role', 'is_active', 'date_joined']
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ['id', 'kind', 'subject', 'status', 'attempts', 'next_attempt_at', 'sent_at', 'created_at']
+    list_filter = ['status', 'kind']
+    search_fields = ['subject']
+    readonly_fields = ['attempts', 'worker', 'claimed_at', 'last_error', 'created_at', 'sent_at']
+    # invite and reset bodies carry live set-password links
+    exclude = ['body']
@@ -0,0 +1,183 @@
+"""
+Batched AuditLog writer.
+
+record_audit() never writes inline:
+  - inside a transaction the record is queued with transaction.on_commit, so
+    it is dropped if the transaction (or its savepoint) rolls back, exactly
+    like a row created inside it would have been;
+  - during a request (AuditBufferMiddleware) committed records are buffered
+    and written with one bulk_create when the response is ready;
+  - outside a request (management commands, shell) they are written at once.
+
+With AUDIT_ASYNC = True the batches are handed to a background writer
+thread through a bounded queue instead of being written by the request
+thread. When the queue is full, or the database write fails, the batch is
+appended to a JSONL spill file in AUDIT_SPILL_DIR; `manage.py
+replay_audit_spill` loads spill files back into the table.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from .models import AuditLog
+
+
+logger = logging.getLogger(__name__)
+
+SPILL_FIELDS = ["actor_id", "action", "target_type", "target_id", "summary", "ip_address", "created_at"]
+
+_local = threading.local()
+
+
+def record_audit(actor, action, target_type, target_id, summary, ip_address=None):
+    entry = AuditLog(
+        actor=actor if getattr(actor, "pk", None) else None,
+        action=action,
+        target_type=target_type,
+        target_id=str(target_id),
+        summary=summary,
+        ip_address=ip_address or None,
+        created_at=timezone.now(),
+    )
+    transaction.on_commit(lambda: _committed(entry))
+
+
+def _committed(entry):
+    buffer = getattr(_local, "buffer", None)
+    if buffer is not None:
+        buffer.append(entry)
+    else:
+        write_batch([entry])
+
+
+# ---- per-request buffer ----
+
+def begin_buffer():
+    _local.buffer = []
+
+
+def flush_buffer():
+    """Write everything buffered on this thread and stop buffering."""
+    entries = getattr(_local, "buffer", None) or []
+    _local.buffer = None
+    if entries:
+        write_batch(entries)
+
+
+class AuditBufferMiddleware:
+    """Collects the audit records of one request into a single bulk_create."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        begin_buffer()
+        try:
+            return self.get_response(request)
+        finally:
+            flush_buffer()
+
+
+# ---- writers ----
+
+def write_batch(entries):
+    if getattr(settings, "AUDIT_ASYNC", False):
+        _background_writer().submit(entries)
+    else:
+        _bulk_insert(entries)
+
+
+def _bulk_insert(entries):
+    try:
+        AuditLog.objects.bulk_create(entries, batch_size=500)
+    except Exception:
+        logger.exception("Could not write %s audit record(s); spilling to disk.", len(entries))
+        spill_to_disk(entries)
+
+
+def spill_path():
+    spill_dir = str(getattr(settings, "AUDIT_SPILL_DIR", "audit_spill"))
+    return os.path.join(spill_dir, f"audit-spill-{os.getpid()}.jsonl")
+
+
+_spill_lock = threading.Lock()
+
+
+def spill_to_disk(entries):
+    path = spill_path()
+    try:
+        with _spill_lock:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "a", encoding="utf-8") as fh:
+                for e in entries:
+                    fh.write(json.dumps({f: getattr(e, f) for f in SPILL_FIELDS}, cls=DjangoJSONEncoder))
+                    fh.write("\n")
+    except Exception:
+        # last resort: keep the records in the application log
+        for e in entries:
+            logger.error("Lost audit record: %s %s %s %s", e.action, e.target_type, e.target_id, e.summary)
+
+
+class _BackgroundWriter:
+    def __init__(self, maxsize, batch_size):
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.batch_size = batch_size
+        self.thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self.thread.start()
+        atexit.register(self.drain)
+
+    def submit(self, entries):
+        try:
+            self.queue.put_nowait(list(entries))
+        except queue.Full:
+            spill_to_disk(entries)
+
+    def _take_batch(self, block):
+        batch = self.queue.get(block=block)
+        while len(batch) < self.batch_size:
+            try:
+                batch.extend(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        from django.db import close_old_connections
+
+        while True:
+            batch = self._take_batch(block=True)
+            close_old_connections()
+            _bulk_insert(batch)
+
+    def drain(self):
+        """Write whatever is still queued (process exit)."""
+        while True:
+            try:
+                batch = self._take_batch(block=False)
+            except queue.Empty:
+                return
+            _bulk_insert(batch)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def _background_writer():
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = _BackgroundWriter(
+                    maxsize=int(getattr(settings, "AUDIT_QUEUE_SIZE", 1000)),
+                    batch_size=int(getattr(settings, "AUDIT_BATCH_SIZE", 500)),
+                )
+    return _writer
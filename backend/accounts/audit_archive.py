@@ -0,0 +1,290 @@
+"""
+Cold storage for old AuditLog rows.
+
+`manage.py archive_audit_logs` moves rows older than AUDIT_RETENTION_DAYS out
+of the table into segments under AUDIT_ARCHIVE_DIR, one or more per month:
+
+  audit-YYYYMM-<n>.jsonl.gz    rows as JSON lines, gzip-compressed in blocks of
+                               AUDIT_ARCHIVE_BLOCK_ROWS rows (one gzip member
+                               per block, so a block is read with one seek)
+  audit-YYYYMM-<n>.time.idx    fixed-size records (key, ts, block offset,
+  audit-YYYYMM-<n>.actor.idx   block length, row in block) sorted by (key, ts);
+  audit-YYYYMM-<n>.target.idx  key is the time, the actor id or a target hash
+  audit-YYYYMM-<n>.json        manifest (row count, time and id range), written
+                               last: a segment without one is incomplete
+
+search_archive() memory-maps the index that fits the filters, binary-searches
+the key / time range and only decompresses the blocks holding matches.
+"""
+import bisect
+import glob
+import gzip
+import hashlib
+import json
+import mmap
+import os
+import struct
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import AuditLog
+
+
+INDEX_RECORD = struct.Struct("<qqQII")  # key, ts (epoch µs), block offset, block length, row in block
+INDEX_KINDS = ["time", "actor", "target"]
+TS_MIN = -(2 ** 63)
+TS_MAX = 2 ** 63 - 1
+
+ARCHIVE_FIELDS = [
+    "id", "actor_id", "actor__username", "action", "target_type", "target_id", "summary", "ip_address", "created_at",
+]
+
+
+def archive_dir():
+    return str(getattr(settings, "AUDIT_ARCHIVE_DIR", "archive/audit"))
+
+
+def to_ts(dt) -> int:
+    """Aware datetime -> epoch microseconds."""
+    delta = dt.astimezone(dt_timezone.utc) - datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def target_key(target_type, target_id) -> int:
+    # target_type spelling varies ('LOAN' / 'Loan'); matches are re-checked on the row
+    digest = hashlib.blake2b(f"{str(target_type).lower()}:{target_id}".encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+def _segment_paths(name):
+    base = os.path.join(archive_dir(), name)
+    return {
+        "data": f"{base}.jsonl.gz",
+        "manifest": f"{base}.json",
+        **{kind: f"{base}.{kind}.idx" for kind in INDEX_KINDS},
+    }
+
+
+def list_segments():
+    """Manifests of complete segments, newest first."""
+    manifests = []
+    for path in glob.glob(os.path.join(archive_dir(), "audit-*.json")):
+        with open(path, encoding="utf-8") as fh:
+            manifests.append(json.load(fh))
+    return sorted(manifests, key=lambda m: (m["ts_to"], m["segment"]), reverse=True)
+
+
+def remove_segment(name):
+    for path in _segment_paths(name).values():
+        for p in (path, f"{path}.tmp"):
+            if os.path.exists(p):
+                os.remove(p)
+
+
+# ---- writing ----
+
+def write_segment(rows, month, block_rows=None):
+    """
+    Write `rows` (dicts with ARCHIVE_FIELDS, ordered by created_at, id) as a
+    new segment for `month`. Returns the manifest, or None if there were no
+    rows. Files are renamed into place at the end, manifest last.
+    """
+    block_rows = block_rows or int(getattr(settings, "AUDIT_ARCHIVE_BLOCK_ROWS", 1000))
+    os.makedirs(archive_dir(), exist_ok=True)
+
+    prefix = f"audit-{month:%Y%m}-"
+    existing = [os.path.basename(p)[len(prefix):-len(".json")] for p in glob.glob(os.path.join(archive_dir(), f"{prefix}*.json"))]
+    name = f"{prefix}{1 + max([int(n) for n in existing if n.isdigit()], default=0)}"
+    paths = _segment_paths(name)
+
+    index = {kind: [] for kind in INDEX_KINDS}
+    stats = {"rows": 0, "ts_from": None, "ts_to": None, "id_from": None, "id_to": None}
+    block = []
+
+    def flush_block(fh):
+        offset = fh.tell()
+        payload = gzip.compress("".join(line for line, _, _ in block).encode("utf-8"))
+        fh.write(payload)
+        for row_no, (_, ts, row) in enumerate(block):
+            location = (ts, offset, len(payload), row_no)
+            index["time"].append((ts,) + location)
+            index["actor"].append((row["actor_id"] or 0,) + location)
+            index["target"].append((target_key(row["target_type"], row["target_id"]),) + location)
+        block.clear()
+
+    with open(f"{paths['data']}.tmp", "wb") as fh:
+        for row in rows:
+            ts = to_ts(row["created_at"])
+            line = json.dumps({
+                "id": row["id"],
+                "actor": row["actor_id"],
+                "actor_username": row["actor__username"],
+                "action": row["action"],
+                "target_type": row["target_type"],
+                "target_id": row["target_id"],
+                "summary": row["summary"],
+                "ip_address": row["ip_address"],
+                # isoformat() keeps the microseconds DjangoJSONEncoder would cut (keyset cursors)
+                "created_at": row["created_at"].isoformat(),
+            }, cls=DjangoJSONEncoder)
+            block.append((line + "\n", ts, row))
+
+            stats["rows"] += 1
+            stats["ts_from"] = ts if stats["ts_from"] is None else min(stats["ts_from"], ts)
+            stats["ts_to"] = ts if stats["ts_to"] is None else max(stats["ts_to"], ts)
+            stats["id_from"] = row["id"] if stats["id_from"] is None else min(stats["id_from"], row["id"])
+            stats["id_to"] = row["id"] if stats["id_to"] is None else max(stats["id_to"], row["id"])
+            if len(block) >= block_rows:
+                flush_block(fh)
+        if block:
+            flush_block(fh)
+        fh.flush()
+        os.fsync(fh.fileno())
+
+    if not stats["rows"]:
+        os.remove(f"{paths['data']}.tmp")
+        return None
+
+    for kind in INDEX_KINDS:
+        with open(f"{paths[kind]}.tmp", "wb") as fh:
+            for record in sorted(index[kind]):
+                fh.write(INDEX_RECORD.pack(*record))
+
+    for key in ["data"] + INDEX_KINDS:
+        os.replace(f"{paths[key]}.tmp", paths[key])
+
+    manifest = {"segment": name, "month": f"{month:%Y-%m}", **stats}
+    with open(f"{paths['manifest']}.tmp", "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh)
+    os.replace(f"{paths['manifest']}.tmp", paths["manifest"])
+    return manifest
+
+
+# ---- reading ----
+
+class _MappedIndex:
+    """Sequence view over an .idx file; items are (key, ts) for bisect."""
+
+    def __init__(self, path):
+        self._fh = open(path, "rb")
+        size = os.fstat(self._fh.fileno()).st_size
+        self._mm = mmap.mmap(self._fh.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self._n = size // INDEX_RECORD.size
+
+    def __len__(self):
+        return self._n
+
+    def __getitem__(self, i):
+        return INDEX_RECORD.unpack_from(self._mm, i * INDEX_RECORD.size)[:2]
+
+    def record(self, i):
+        return INDEX_RECORD.unpack_from(self._mm, i * INDEX_RECORD.size)
+
+    def iter_desc(self, low, high):
+        """Records with low <= (key, ts) <= high, newest first."""
+        i = bisect.bisect_right(self, high) - 1
+        while i >= 0:
+            rec = self.record(i)
+            if rec[:2] < low:
+                break
+            yield rec
+            i -= 1
+
+    def close(self):
+        if isinstance(self._mm, mmap.mmap):
+            self._mm.close()
+        self._fh.close()
+
+
+def target_type_variants(target_type):
+    # target_type is written as e.g. 'LOAN', 'Client', 'TellerSession'; match the
+    # common spellings exactly (lets the hot table use its (target_type, target_id) index)
+    return {target_type, target_type.upper(), target_type.lower(), target_type[:1].upper() + target_type[1:]}
+
+
+def search_archive(*, actor_id=None, action=None, target_type=None, target_id=None,
+                   date_from=None, date_to=None, text=None, before=None, limit=50):
+    """
+    Archived rows matching the filters, newest first, at most `limit`.
+    `text` keeps rows whose summary or target id contains every word.
+    `before` is a (created_at, id) keyset bound (exclusive), as used by the
+    hot-table pagination. Rows are dicts shaped like AuditLogSerializer.
+    """
+    ts_lo = to_ts(date_from) if date_from else TS_MIN
+    ts_hi = to_ts(date_to) if date_to else TS_MAX
+    before_key = (to_ts(before[0]), before[1]) if before else None
+    if before_key:
+        ts_hi = min(ts_hi, before_key[0])
+    if ts_lo > ts_hi:
+        return []
+
+    if target_type and target_id:
+        kind, key = "target", target_key(target_type, target_id)
+        variants = target_type_variants(target_type)
+    elif actor_id:
+        kind, key = "actor", int(actor_id)
+    else:
+        kind, key = "time", None
+    low, high = ((ts_lo, ts_lo), (ts_hi, ts_hi)) if key is None else ((key, ts_lo), (key, ts_hi))
+
+    words = text.lower().split() if text else []
+    action_labels = dict(AuditLog.ACTION_CHOICES)
+    found = []
+    for manifest in list_segments():
+        if manifest["ts_to"] < ts_lo or manifest["ts_from"] > ts_hi:
+            continue
+        paths = _segment_paths(manifest["segment"])
+        index = _MappedIndex(paths[kind])
+        blocks = {}
+        matched = 0
+        try:
+            with open(paths["data"], "rb") as data:
+                for _key, ts, offset, length, row_no in index.iter_desc(low, high):
+                    if offset not in blocks:
+                        data.seek(offset)
+                        blocks[offset] = gzip.decompress(data.read(length)).decode("utf-8").splitlines()
+                    row = json.loads(blocks[offset][row_no])
+
+                    if before_key and (ts, row["id"]) >= before_key:
+                        continue
+                    if action and row["action"] != action:
+                        continue
+                    if actor_id and row["actor"] != int(actor_id):
+                        continue
+                    if kind == "target" and (row["target_type"] not in variants or row["target_id"] != str(target_id)):
+                        continue
+                    if words:
+                        haystack = f"{row['summary']} {row['target_id']}".lower()
+                        if not all(word in haystack for word in words):
+                            continue
+
+                    row["action_display"] = action_labels.get(row["action"], row["action"])
+                    row["archived"] = True
+                    found.append((ts, row["id"], row))
+                    matched += 1
+                    if matched >= limit:
+                        break
+        finally:
+            index.close()
+
+    found.sort(key=lambda item: (item[0], item[1]), reverse=True)
+    return [row for _, _, row in found[:limit]]
+
+
+def parse_bound(value):
+    """Query-string date/datetime -> aware datetime (dates mean midnight, like the ORM filters)."""
+    if not value:
+        return None
+    dt = parse_datetime(value)
+    if dt is None:
+        d = parse_date(value)
+        if d is None:
+            return None
+        dt = datetime(d.year, d.month, d.day)
+    if timezone.is_naive(dt):
+        dt = timezone.make_aware(dt)
+    return dt
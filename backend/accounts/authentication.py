@@ -0,0 +1,110 @@
+"""
+JWT authentication without a users-table query per request.
+
+Tokens issued by issue_tokens() carry role, branch_id, username and the
+user's token_version ("ver"). ClaimsJWTAuthentication builds request.user
+from those claims: an unsaved-looking User instance (with a Branch stub in
+its branch cache) that works for permission checks, queryset filters and FK
+assignment, so neither the User nor the Branch row is loaded.
+
+Revocation: the only per-request lookup is (token_version, is_active).
+revoke_tokens() bumps the version, which invalidates every token issued
+before; it is called when a user is deactivated or locked out, changes role
+or branch, or sets a new password. The lookup is cached for
+AUTH_STATE_CACHE_TTL seconds only when AUTH_STATE_CACHE_ALIAS is shared by
+all workers, so revoke_tokens() clears it everywhere; with a per-process
+cache (LocMem) it is read from the database on every request.
+Tokens without a "ver" claim (issued before this scheme) fall back to the
+stock simplejwt user lookup.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import F
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import Branch, User
+from .utils import cache_is_shared
+
+
+def _alias():
+    return getattr(settings, "AUTH_STATE_CACHE_ALIAS", "default")
+
+
+def _cache():
+    return caches[_alias()]
+
+
+def _state_key(user_id):
+    return f"auth:state:{user_id}"
+
+
+def get_auth_state(user_id):
+    """(token_version, is_active) for `user_id`, or None if the user is gone."""
+    # another worker's revoke_tokens() cannot clear a per-process cache
+    shared = cache_is_shared(_alias())
+    key = _state_key(user_id)
+    state = _cache().get(key) if shared else None
+    if state is None:
+        row = User.objects.filter(pk=user_id).values_list("token_version", "is_active").first()
+        state = tuple(row) if row else ()
+        if shared:
+            _cache().set(key, state, int(getattr(settings, "AUTH_STATE_CACHE_TTL", 60)))
+    return state or None
+
+
+def forget_auth_state(user_id):
+    _cache().delete(_state_key(user_id))
+
+
+def revoke_tokens(user):
+    """Invalidate every token issued to `user` so far."""
+    User.objects.filter(pk=user.pk).update(token_version=F("token_version") + 1)
+    forget_auth_state(user.pk)
+
+
+def issue_tokens(user) -> RefreshToken:
+    refresh = RefreshToken.for_user(user)
+    refresh["username"] = user.username
+    refresh["role"] = user.role
+    refresh["branch_id"] = user.branch_id
+    refresh["ver"] = user.token_version
+    return refresh
+
+
+def check_token_version(token):
+    """Raise AuthenticationFailed if `token` was revoked (only for tokens carrying "ver")."""
+    if "ver" not in token:
+        return
+    state = get_auth_state(token[api_settings.USER_ID_CLAIM])
+    if state is None or not state[1] or state[0] != token["ver"]:
+        raise AuthenticationFailed("Token has been revoked.", code="token_revoked")
+
+
+def claims_user(token) -> User:
+    user = User(
+        id=User._meta.pk.to_python(token[api_settings.USER_ID_CLAIM]),
+        username=token.get("username", ""),
+        role=token.get("role", ""),
+        branch_id=token.get("branch_id"),
+        token_version=token["ver"],
+        is_active=True,
+    )
+    user._state.adding = False
+    user._state.db = "default"
+    if user.branch_id:
+        branch = Branch(id=user.branch_id)
+        branch._state.adding = False
+        branch._state.db = "default"
+        user.branch = branch
+    return user
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        if "ver" not in validated_token:
+            return super().get_user(validated_token)
+        check_token_version(validated_token)
+        return claims_user(validated_token)
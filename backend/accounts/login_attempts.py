@@ -0,0 +1,123 @@
+"""
+Failed-login counters and per-IP login throttling, kept in the cache
+(LOGIN_ATTEMPT_CACHE_ALIAS) instead of on the User row.
+
+Counters use add() + incr(), which are atomic on Redis/Memcached, so a burst
+of concurrent attempts never loses an increment and never writes the users
+table. The row is only written when the lock state changes (see
+accounts.views._handle_failed_login_attempt).
+
+Any other backend (LocMem is per process, database/file caches increment
+with get + set) would let each worker grant its own MAX_LOGIN_ATTEMPTS, so
+failures are then counted on User.failed_login_attempts with a conditional
+UPDATE instead. The per-IP throttle stays in the cache: on a per-process
+backend it limits each worker separately.
+
+The per-IP throttle counts failed logins only, so a branch behind one NAT
+address is not locked out by its own successful logins at shift change. It
+is a sliding-window counter: failures are counted in fixed buckets of
+LOGIN_IP_WINDOW_SECONDS and the previous bucket is weighted by how much of
+it still overlaps the window. The address is REMOTE_ADDR, or the
+X-Forwarded-For entry added by the outermost of LOGIN_TRUSTED_PROXY_COUNT
+proxies (throttle_address()); entries further left are set by the client.
+"""
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import F
+
+from .models import User
+from .utils import cache_is_shared
+
+
+def _alias():
+    return getattr(settings, "LOGIN_ATTEMPT_CACHE_ALIAS", "default")
+
+
+def _cache():
+    return caches[_alias()]
+
+
+def _counts_in_cache() -> bool:
+    return cache_is_shared(_alias(), atomic=True)
+
+
+def _incr(key, timeout) -> int:
+    cache = _cache()
+    cache.add(key, 0, timeout)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # evicted/expired between add() and incr()
+        cache.add(key, 1, timeout)
+        return 1
+
+
+def _failure_key(user_id):
+    return f"login:fail:{user_id}"
+
+
+def record_failure(user) -> int:
+    """Count one failed login for `user`; returns the failures so far."""
+    if not _counts_in_cache():
+        users = User.objects.filter(pk=user.pk)
+        users.update(failed_login_attempts=F("failed_login_attempts") + 1)
+        return users.values_list("failed_login_attempts", flat=True).first() or 0
+    ttl = int(getattr(settings, "LOGIN_FAILURE_TTL_SECONDS", 86400))
+    return _incr(_failure_key(user.pk), ttl)
+
+
+def clear_failures(user):
+    # without a shared counter the callers reset User.failed_login_attempts themselves
+    if _counts_in_cache():
+        _cache().delete(_failure_key(user.pk))
+
+
+def throttle_address(request):
+    """Client address for the per-IP throttle; never an entry the client could have forged."""
+    proxies = int(getattr(settings, "LOGIN_TRUSTED_PROXY_COUNT", 0))
+    if proxies > 0:
+        forwarded = [a.strip() for a in request.META.get("HTTP_X_FORWARDED_FOR", "").split(",") if a.strip()]
+        if len(forwarded) >= proxies:
+            return forwarded[-proxies]
+    return request.META.get("REMOTE_ADDR")
+
+
+def _ip_window():
+    limit = int(getattr(settings, "LOGIN_IP_MAX_ATTEMPTS", 20))
+    window = int(getattr(settings, "LOGIN_IP_WINDOW_SECONDS", 60))
+    return limit, window
+
+
+def _ip_key(ip, bucket):
+    return f"login:ip:{ip}:{bucket}"
+
+
+def throttle_ip(ip):
+    """
+    None when `ip` may try to log in, or the seconds to wait when it has
+    LOGIN_IP_MAX_ATTEMPTS failed logins in the window.
+    """
+    limit, window = _ip_window()
+    if not ip or limit <= 0:
+        return None
+
+    now = time.time()
+    bucket = int(now // window)
+    current = _cache().get(_ip_key(ip, bucket), 0)
+    previous = _cache().get(_ip_key(ip, bucket - 1), 0)
+
+    overlap = 1 - (now - bucket * window) / window
+    if current + previous * overlap < limit:
+        return None
+    return max(1, math.ceil((bucket + 1) * window - now))
+
+
+def record_ip_failure(ip):
+    """Count one failed login from `ip` towards throttle_ip()."""
+    limit, window = _ip_window()
+    if not ip or limit <= 0:
+        return
+    _incr(_ip_key(ip, int(time.time() // window)), window * 2)
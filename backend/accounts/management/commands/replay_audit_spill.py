@@ -0,0 +1,51 @@
+import glob
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils.dateparse import parse_datetime
+
+from accounts.audit import SPILL_FIELDS
+from accounts.models import AuditLog
+
+
+class Command(BaseCommand):
+    help = (
+        "Load audit records spilled to AUDIT_SPILL_DIR (background writer queue full or database "
+        "unavailable) back into the AuditLog table, then remove the spill files."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dir", help="Override AUDIT_SPILL_DIR.")
+
+    def handle(self, *args, **options):
+        spill_dir = options.get("dir") or str(getattr(settings, "AUDIT_SPILL_DIR", "audit_spill"))
+        files = sorted(glob.glob(os.path.join(spill_dir, "audit-spill-*.jsonl")))
+        if not files:
+            self.stdout.write(self.style.SUCCESS("No spill files."))
+            return
+
+        total = 0
+        for path in files:
+            # claim the file first so a live writer starts a new one
+            claimed = f"{path}.replaying"
+            os.replace(path, claimed)
+
+            entries = []
+            with open(claimed, encoding="utf-8") as fh:
+                for line in fh:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    row = json.loads(line)
+                    data = {f: row.get(f) for f in SPILL_FIELDS}
+                    data["created_at"] = parse_datetime(data["created_at"]) if data["created_at"] else None
+                    entries.append(AuditLog(**data))
+
+            AuditLog.objects.bulk_create(entries, batch_size=500)
+            os.remove(claimed)
+            total += len(entries)
+            self.stdout.write(f"- {os.path.basename(path)}: {len(entries)} record(s)")
+
+        self.stdout.write(self.style.SUCCESS(f"Done. Replayed {total} audit record(s)."))
@@ -0,0 +1,63 @@
+import os
+import socket
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from accounts.models import OutboundEmailStatus
+from accounts.outbox import claim_emails, requeue_stale_emails, send_claimed
+
+
+class Command(BaseCommand):
+    help = (
+        "Send queued OutboundEmail rows in batches over one EMAIL_BACKEND connection, "
+        "retrying failures with backoff. Runs until interrupted; use --once to drain the queue and exit."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=getattr(settings, "EMAIL_OUTBOX_BATCH_SIZE", 50),
+            help="Emails per connection (default: EMAIL_OUTBOX_BATCH_SIZE).",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=getattr(settings, "EMAIL_OUTBOX_POLL_SECONDS", 5),
+            help="Seconds between queue polls when idle (default: EMAIL_OUTBOX_POLL_SECONDS).",
+        )
+        parser.add_argument("--once", action="store_true", help="Exit when no email is due.")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        if batch_size < 1:
+            raise CommandError("--batch-size must be at least 1.")
+        poll = options["poll_interval"]
+        worker = f"{socket.gethostname()}:{os.getpid()}"
+        self.stdout.write(f"Email worker {worker} started.")
+
+        try:
+            while True:
+                requeue_stale_emails()
+                claimed = claim_emails(limit=batch_size, worker=worker)
+                if not claimed:
+                    if options["once"]:
+                        break
+                    # drop a connection the database closed while idle
+                    close_old_connections()
+                    time.sleep(poll)
+                    continue
+
+                counts = send_claimed(claimed)
+                self.stdout.write(
+                    f"- sent {counts[OutboundEmailStatus.SENT]}, "
+                    f"retrying {counts[OutboundEmailStatus.PENDING]}, "
+                    f"failed {counts[OutboundEmailStatus.FAILED]}"
+                )
+        except KeyboardInterrupt:
+            self.stdout.write("Interrupted.")
+
+        self.stdout.write(self.style.SUCCESS("Email worker stopped."))
@@ -0,0 +1,102 @@
+# Generated by Django 6.0.2 on 2026-10-19 00:40
+"""
+Full-text search over audit logs (PostgreSQL only; other vendors only get
+the column and fall back to icontains in AuditLogViewSet).
+
+The vector is maintained by a BEFORE INSERT OR UPDATE trigger so every write
+path is covered, including the bulk_create used by accounts.audit. Existing
+rows are backfilled in batches and the GIN index is built CONCURRENTLY, hence
+the non-atomic migration: the table stays writable while it runs.
+"""
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+TABLE = "accounts_auditlog"
+BACKFILL_BATCH = 50000
+
+# 'simple' configuration: no stemming or stop words, so client names, loan
+# numbers and amounts are indexed as written.
+CREATE_FUNCTIONS = f"""
+CREATE OR REPLACE FUNCTION auditlog_search_document(action text, target_type text, target_id text, summary text)
+RETURNS tsvector LANGUAGE sql IMMUTABLE AS $$
+    SELECT setweight(to_tsvector('simple', coalesce(target_type, '') || ' ' || coalesce(target_id, '')), 'A')
+        || setweight(to_tsvector('simple', coalesce(summary, '')), 'B')
+        || setweight(to_tsvector('simple', replace(coalesce(action, ''), '_', ' ')), 'C')
+$$;
+
+CREATE OR REPLACE FUNCTION auditlog_search_vector_trigger() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.search_vector := auditlog_search_document(NEW.action, NEW.target_type, NEW.target_id, NEW.summary);
+    RETURN NEW;
+END
+$$;
+
+DROP TRIGGER IF EXISTS auditlog_search_vector_update ON {TABLE};
+CREATE TRIGGER auditlog_search_vector_update
+    BEFORE INSERT OR UPDATE OF action, target_type, target_id, summary ON {TABLE}
+    FOR EACH ROW EXECUTE FUNCTION auditlog_search_vector_trigger();
+"""
+
+DROP_FUNCTIONS = f"""
+DROP TRIGGER IF EXISTS auditlog_search_vector_update ON {TABLE};
+DROP FUNCTION IF EXISTS auditlog_search_vector_trigger();
+DROP FUNCTION IF EXISTS auditlog_search_document(text, text, text, text);
+"""
+
+
+def install_search(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(CREATE_FUNCTIONS)
+
+        cursor.execute(f"SELECT COALESCE(MIN(id), 0), COALESCE(MAX(id), -1) FROM {TABLE}")
+        low, high = cursor.fetchone()
+        for start in range(low, high + 1, BACKFILL_BATCH):
+            cursor.execute(
+                f"UPDATE {TABLE} SET search_vector = auditlog_search_document(action, target_type, target_id, summary) "
+                f"WHERE id >= %s AND id < %s AND search_vector IS NULL",
+                [start, start + BACKFILL_BATCH],
+            )
+
+        cursor.execute(
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS auditlog_search_gin ON {TABLE} USING gin (search_vector)"
+        )
+
+
+def remove_search(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("DROP INDEX CONCURRENTLY IF EXISTS auditlog_search_gin")
+        cursor.execute(DROP_FUNCTIONS)
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('accounts', '0011_auditlog_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='auditlog',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='auditlog',
+                    index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='auditlog_search_gin'),
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(install_search, remove_search),
+            ],
+        ),
+    ]
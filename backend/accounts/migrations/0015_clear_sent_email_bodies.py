@@ -0,0 +1,18 @@
+from django.db import migrations
+
+
+def clear_sent_bodies(apps, schema_editor):
+    # sent invites and resets no longer need their set-password links
+    OutboundEmail = apps.get_model("accounts", "OutboundEmail")
+    OutboundEmail.objects.filter(status="SENT").exclude(body="").update(body="")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0014_user_token_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_sent_bodies, migrations.RunPython.noop),
+    ]
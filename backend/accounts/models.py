@@ -1,6 +1,9 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import AbstractUser, UserManager
 from django.contrib.auth.tokens import PasswordResetTokenGenerator
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 
 class CustomUserManager(UserManager):
     """Custom manager to set SUPER_ADMIN role for superusers"""
@@ -48,6 +51,9 @@ class User(AbstractUser):
         related_name='users'
     )
     failed_login_attempts = models.PositiveIntegerField(default=0)
+    # embedded in JWTs; bumping it revokes every token issued before
+    # (accounts.authentication.revoke_tokens)
+    token_version = models.PositiveIntegerField(default=0)
     
     objects = CustomUserManager()
     
@@ -104,10 +110,63 @@ class AuditLog(models.Model):
     target_id = models.CharField(max_length=50)
     summary = models.TextField()
     ip_address = models.GenericIPAddressField(null=True, blank=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # time of the audited event; set by accounts.audit when the record is
+    # queued, which can be slightly before it is written
+    created_at = models.DateTimeField(default=timezone.now)
+    # full-text document (action, target, summary); filled by a database
+    # trigger on PostgreSQL, so bulk_create rows are covered too
+    search_vector = SearchVectorField(null=True, editable=False)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at'], name='auditlog_created_idx'),
+            models.Index(fields=['actor', 'created_at'], name='auditlog_actor_created_idx'),
+            models.Index(fields=['action', 'created_at'], name='auditlog_action_created_idx'),
+            # created_at last so an entity timeline is read in index order
+            models.Index(fields=['target_type', 'target_id', 'created_at'], name='auditlog_target_idx'),
+            # PostgreSQL only (created by migration 0012)
+            GinIndex(fields=['search_vector'], name='auditlog_search_gin'),
+        ]
     
     def __str__(self):
-        return f"{self.action} by {self.actor} on {self.created_at}"
\ No newline at end of file
+        return f"{self.action} by {self.actor} on {self.created_at}"
+
+class OutboundEmailStatus(models.TextChoices):
+    PENDING = 'PENDING', 'Pending'
+    SENDING = 'SENDING', 'Sending'
+    SENT = 'SENT', 'Sent'
+    FAILED = 'FAILED', 'Failed'
+
+
+class OutboundEmail(models.Model):
+    """
+    Email outbox. Requests only insert PENDING rows (accounts.outbox.enqueue_email);
+    `manage.py run_email_worker` sends them in batches over one connection,
+    retrying failures with exponential backoff until EMAIL_OUTBOX_MAX_ATTEMPTS.
+    `body` may contain set-password links; it is emptied once the email is SENT.
+    """
+    kind = models.CharField(max_length=50, blank=True, default='')
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=255)
+    to = models.JSONField(default=list)
+
+    status = models.CharField(max_length=20, choices=OutboundEmailStatus.choices, default=OutboundEmailStatus.PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    worker = models.CharField(max_length=100, blank=True, default='')
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_status_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"OutboundEmail#{self.id} {self.kind} to {', '.join(self.to)} [{self.status}]"
@@ -0,0 +1,129 @@
+"""
+DB-backed email outbox.
+
+Requests call enqueue_email(), which only inserts an OutboundEmail row (in
+the caller's transaction, so an invite for a user whose creation rolls back
+is never sent). `manage.py run_email_worker` claims due rows with a
+conditional UPDATE, sends a batch over one open connection of EMAIL_BACKEND
+(SMTP in production; console, file or locmem backends work for local
+testing) and reschedules failures with exponential backoff.
+
+Invite and reset bodies hold live set-password links: the admin never shows
+them, and a body is cleared as soon as its email is SENT.
+"""
+import traceback
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OutboundEmail, OutboundEmailStatus
+
+
+def enqueue_email(*, subject, body, to, from_email, kind="") -> OutboundEmail:
+    return OutboundEmail.objects.create(
+        kind=kind,
+        subject=subject,
+        body=body,
+        from_email=from_email,
+        to=list(to),
+    )
+
+
+def claim_emails(*, limit: int, worker: str) -> list:
+    """Mark up to `limit` due PENDING emails SENDING for `worker`, oldest first."""
+    if limit <= 0:
+        return []
+    now = timezone.now()
+    candidates = list(
+        OutboundEmail.objects.filter(status=OutboundEmailStatus.PENDING, next_attempt_at__lte=now)
+        .order_by("next_attempt_at", "id")
+        .values_list("id", flat=True)[: limit * 2]
+    )
+    claimed = []
+    for email_id in candidates:
+        if len(claimed) >= limit:
+            break
+        updated = OutboundEmail.objects.filter(pk=email_id, status=OutboundEmailStatus.PENDING).update(
+            status=OutboundEmailStatus.SENDING,
+            worker=worker,
+            claimed_at=now,
+            attempts=F("attempts") + 1,
+        )
+        if updated:
+            claimed.append(email_id)
+    return claimed
+
+
+def requeue_stale_emails() -> int:
+    """Emails SENDING longer than EMAIL_OUTBOX_CLAIM_TIMEOUT belong to a worker that died."""
+    timeout = int(getattr(settings, "EMAIL_OUTBOX_CLAIM_TIMEOUT", 300))
+    return OutboundEmail.objects.filter(
+        status=OutboundEmailStatus.SENDING,
+        claimed_at__lt=timezone.now() - timezone.timedelta(seconds=timeout),
+    ).update(status=OutboundEmailStatus.PENDING, worker="")
+
+
+def retry_delay(attempts: int) -> int:
+    """Seconds before the next try: EMAIL_OUTBOX_BACKOFF_SECONDS doubled per attempt, capped."""
+    base = int(getattr(settings, "EMAIL_OUTBOX_BACKOFF_SECONDS", 60))
+    cap = int(getattr(settings, "EMAIL_OUTBOX_BACKOFF_MAX_SECONDS", 3600))
+    return min(cap, base * 2 ** max(attempts - 1, 0))
+
+
+def _failed(email, message):
+    max_attempts = int(getattr(settings, "EMAIL_OUTBOX_MAX_ATTEMPTS", 5))
+    if email.attempts >= max_attempts:
+        changes = {"status": OutboundEmailStatus.FAILED}
+    else:
+        changes = {
+            "status": OutboundEmailStatus.PENDING,
+            "next_attempt_at": timezone.now() + timezone.timedelta(seconds=retry_delay(email.attempts)),
+        }
+    OutboundEmail.objects.filter(pk=email.pk, status=OutboundEmailStatus.SENDING).update(
+        worker="", last_error=message[:4000], **changes
+    )
+    return changes["status"]
+
+
+def send_claimed(email_ids) -> dict:
+    """
+    Send claimed emails over one connection. Returns a count per final status.
+    A connection failure reschedules the whole batch.
+    """
+    emails = list(OutboundEmail.objects.filter(pk__in=email_ids, status=OutboundEmailStatus.SENDING).order_by("id"))
+    counts = {OutboundEmailStatus.SENT: 0, OutboundEmailStatus.PENDING: 0, OutboundEmailStatus.FAILED: 0}
+    if not emails:
+        return counts
+
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception:
+        error = traceback.format_exc()
+        for email in emails:
+            counts[_failed(email, error)] += 1
+        return counts
+
+    try:
+        for email in emails:
+            message = EmailMessage(
+                subject=email.subject,
+                body=email.body,
+                from_email=email.from_email,
+                to=email.to,
+                connection=connection,
+            )
+            try:
+                message.send()
+            except Exception:
+                counts[_failed(email, traceback.format_exc())] += 1
+                continue
+            OutboundEmail.objects.filter(pk=email.pk, status=OutboundEmailStatus.SENDING).update(
+                status=OutboundEmailStatus.SENT, sent_at=timezone.now(), worker="", last_error="", body=""
+            )
+            counts[OutboundEmailStatus.SENT] += 1
+    finally:
+        connection.close()
+    return counts
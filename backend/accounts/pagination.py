@@ -0,0 +1,12 @@
+from rest_framework.pagination import CursorPagination
+
+
+class AuditLogCursorPagination(CursorPagination):
+    """
+    Keyset pagination for audit logs: each page is an index range scan on
+    created_at, so page 10,000 costs the same as page 1 (no OFFSET).
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = ('-created_at', '-id')
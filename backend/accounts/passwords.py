@@ -0,0 +1,197 @@
+"""
+Password verification off the event loop.
+
+The async login views (accounts.views.login / login_email, served by
+mfi.asgi) await verify_password(), which runs the hasher in a bounded thread
+pool (LOGIN_HASH_WORKERS threads). PBKDF2 runs inside OpenSSL without the
+GIL, so the pool hashes in parallel while the loop keeps serving requests.
+At most LOGIN_HASH_MAX_PENDING verifications may be queued or running per
+process; beyond that HashPoolBusy is raised and the view answers 503 rather
+than letting a login burst queue up behind the hasher.
+
+A correct password stored with an outdated hasher or iteration count is
+re-hashed in the same pool after the response is decided, with a
+conditional UPDATE so a concurrent password change is never overwritten.
+
+hash_metrics() reports per-process timings for the admin metrics endpoint.
+"""
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, get_hasher, identify_hasher, make_password
+from django.db import connections
+
+
+logger = logging.getLogger(__name__)
+
+# upper bounds (ms) of the timing histogram buckets; the last bucket is open-ended
+HISTOGRAM_BOUNDS_MS = [50, 100, 200, 400, 800, 1600]
+
+
+class HashPoolBusy(Exception):
+    pass
+
+
+class _Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._zero()
+
+    def _zero(self):
+        self.verifications = 0
+        self.rejected_busy = 0
+        self.rehashes = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+
+    def reset(self):
+        with self._lock:
+            self._zero()
+
+    def observe(self, elapsed_ms):
+        with self._lock:
+            self.verifications += 1
+            self.total_ms += elapsed_ms
+            self.max_ms = max(self.max_ms, elapsed_ms)
+            index = next((i for i, bound in enumerate(HISTOGRAM_BOUNDS_MS) if elapsed_ms <= bound), len(HISTOGRAM_BOUNDS_MS))
+            self.buckets[index] += 1
+
+    def count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def snapshot(self):
+        with self._lock:
+            labels = [f"<={b}ms" for b in HISTOGRAM_BOUNDS_MS] + [f">{HISTOGRAM_BOUNDS_MS[-1]}ms"]
+            return {
+                "verifications": self.verifications,
+                "rejected_busy": self.rejected_busy,
+                "rehashes": self.rehashes,
+                "avg_ms": round(self.total_ms / self.verifications, 2) if self.verifications else None,
+                "max_ms": round(self.max_ms, 2),
+                "histogram": dict(zip(labels, self.buckets)),
+                "pending": _pending,
+                "workers": _workers(),
+                "max_pending": _max_pending(),
+            }
+
+
+metrics = _Metrics()
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = 0
+_pending_lock = threading.Lock()
+
+
+def _workers():
+    return int(getattr(settings, "LOGIN_HASH_WORKERS", 4))
+
+
+def _max_pending():
+    return int(getattr(settings, "LOGIN_HASH_MAX_PENDING", 64))
+
+
+def _pool():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=_workers(), thread_name_prefix="login-hash")
+    return _executor
+
+
+def _reserve():
+    global _pending
+    with _pending_lock:
+        if _pending >= _max_pending():
+            metrics.count("rejected_busy")
+            raise HashPoolBusy()
+        _pending += 1
+
+
+def _release(_future=None):
+    global _pending
+    with _pending_lock:
+        _pending -= 1
+
+
+def _verify(encoded, password):
+    """Runs in the pool. Returns (matches, elapsed_ms)."""
+    started = time.perf_counter()
+    if encoded:
+        # no setter: the rehash is scheduled separately, never inside the check
+        ok = check_password(password, encoded)
+    else:
+        # unknown user: spend the same time as a real check (no user enumeration by timing)
+        make_password(password)
+        ok = False
+    return ok, (time.perf_counter() - started) * 1000
+
+
+def needs_rehash(encoded) -> bool:
+    try:
+        current = identify_hasher(encoded)
+    except ValueError:
+        return False
+    preferred = get_hasher("default")
+    return current.algorithm != preferred.algorithm or preferred.must_update(encoded)
+
+
+def rehash_password(user_id, old_encoded, password) -> bool:
+    """Store `password` with the preferred hasher unless the password changed meanwhile."""
+    from .models import User
+
+    updated = User.objects.filter(pk=user_id, password=old_encoded).update(password=make_password(password))
+    if updated:
+        metrics.count("rehashes")
+    return bool(updated)
+
+
+def _rehash_in_pool(user_id, old_encoded, password):
+    try:
+        return rehash_password(user_id, old_encoded, password)
+    finally:
+        # pool threads are not request threads; don't leave connections open
+        connections.close_all()
+
+
+def _schedule_rehash(user_id, old_encoded, password):
+    try:
+        _reserve()
+    except HashPoolBusy:
+        return  # opportunistic: try again on a later login
+    future = _pool().submit(_rehash_in_pool, user_id, old_encoded, password)
+    future.add_done_callback(_release)
+
+    def log_failure(f):
+        if f.exception():
+            logger.warning("Password rehash for user %s failed: %s", user_id, f.exception())
+
+    future.add_done_callback(log_failure)
+
+
+async def verify_password(user, password) -> bool:
+    """
+    Check `password` against `user` (or burn equivalent time if user is None)
+    in the hash pool. Raises HashPoolBusy when too many checks are pending.
+    """
+    encoded = user.password if user is not None and user.has_usable_password() else None
+    _reserve()
+    future = _pool().submit(_verify, encoded, password)
+    future.add_done_callback(_release)
+    ok, elapsed_ms = await asyncio.wrap_future(future)
+    metrics.observe(elapsed_ms)
+
+    if ok and needs_rehash(encoded):
+        _schedule_rehash(user.pk, encoded, password)
+    return ok
+
+
+def hash_metrics():
+    return metrics.snapshot()
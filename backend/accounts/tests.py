@@ -0,0 +1,405 @@
+import json
+import os
+import tempfile
+from unittest import mock
+
+from django.db import transaction
+from django.test import TestCase
+
+from .audit import begin_buffer, flush_buffer, spill_to_disk, record_audit
+from .models import AuditLog, Branch, User
+
+
+class AuditWriterTests(TestCase):
+    def setUp(self):
+        self.branch = Branch.objects.create(
+            name="Main", code="MAIN", region="East", phone="123", address="Addr"
+        )
+        self.user = User.objects.create_user(
+            username="mgr", email="mgr@example.com", password="x", role="BRANCH_MANAGER", branch=self.branch
+        )
+
+    def test_request_records_are_written_once_after_commit(self):
+        begin_buffer()
+        try:
+            with self.captureOnCommitCallbacks(execute=True):
+                record_audit(self.user, "LOAN_APPROVED", "LOAN", 1, "approved")
+                record_audit(self.user, "LOAN_DISBURSED", "LOAN", 1, "disbursed")
+                try:
+                    with transaction.atomic():
+                        record_audit(self.user, "LOAN_CLOSED", "LOAN", 1, "rolled back")
+                        raise RuntimeError
+                except RuntimeError:
+                    pass
+            self.assertEqual(AuditLog.objects.count(), 0)
+        finally:
+            with self.assertNumQueries(1):
+                flush_buffer()
+
+        self.assertEqual(
+            sorted(AuditLog.objects.values_list("action", flat=True)), ["LOAN_APPROVED", "LOAN_DISBURSED"]
+        )
+
+    def test_spilled_records_are_replayed(self):
+        from django.core.management import call_command
+
+        with tempfile.TemporaryDirectory() as spill_dir, self.settings(AUDIT_SPILL_DIR=spill_dir):
+            spill_to_disk([AuditLog(actor=self.user, action="USER_UPDATED", target_type="User", target_id="1", summary="x")])
+            with open(os.path.join(spill_dir, os.listdir(spill_dir)[0]), encoding="utf-8") as fh:
+                self.assertEqual(json.loads(fh.readline())["action"], "USER_UPDATED")
+
+            call_command("replay_audit_spill", stdout=open(os.devnull, "w"))
+            self.assertEqual(os.listdir(spill_dir), [])
+        self.assertTrue(AuditLog.objects.filter(action="USER_UPDATED", actor=self.user).exists())
+
+
+class AuditLogApiTests(TestCase):
+    def setUp(self):
+        from rest_framework.test import APIClient
+
+        self.admin = User.objects.create_user(
+            username="root", email="root@example.com", password="x", role="SUPER_ADMIN"
+        )
+        AuditLog.objects.bulk_create([
+            AuditLog(actor=self.admin, action="LOAN_APPROVED", target_type="LOAN", target_id=str(i % 3), summary=f"#{i}")
+            for i in range(7)
+        ])
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_cursor_pages_cover_every_row_once(self):
+        seen = []
+        url = "/api/admin/audit-logs/?page_size=3"
+        while url:
+            resp = self.client.get(url)
+            self.assertEqual(resp.status_code, 200)
+            seen += [row["id"] for row in resp.data["results"]]
+            url = resp.data["next"]
+        self.assertEqual(sorted(seen), sorted(AuditLog.objects.values_list("id", flat=True)))
+        self.assertEqual(len(seen), len(set(seen)))
+
+    def test_entity_timeline(self):
+        resp = self.client.get("/api/admin/audit-logs/timeline/loan/1/")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual([row["summary"] for row in resp.data["results"]], ["#4", "#1"])
+
+
+class AuditArchiveTests(TestCase):
+    def setUp(self):
+        from datetime import timedelta
+
+        from django.utils import timezone
+        from rest_framework.test import APIClient
+
+        self.admin = User.objects.create_user(
+            username="root", email="root@example.com", password="x", role="SUPER_ADMIN"
+        )
+        now = timezone.now()
+        AuditLog.objects.bulk_create([
+            AuditLog(
+                actor=self.admin, action="LOAN_APPROVED", target_type="LOAN", target_id=str(i % 2),
+                summary=f"old #{i}", created_at=now - timedelta(days=400 + i * 20),
+            )
+            for i in range(5)
+        ] + [
+            AuditLog(actor=self.admin, action="LOAN_APPROVED", target_type="LOAN", target_id="1", summary="recent"),
+        ])
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_archived_rows_leave_the_table_and_stay_searchable(self):
+        from django.core.management import call_command
+
+        with tempfile.TemporaryDirectory() as archive_dir, self.settings(
+            AUDIT_ARCHIVE_DIR=archive_dir, AUDIT_ARCHIVE_BLOCK_ROWS=2
+        ):
+            call_command("archive_audit_logs", older_than_days=365, stdout=open(os.devnull, "w"))
+            self.assertEqual(list(AuditLog.objects.values_list("summary", flat=True)), ["recent"])
+
+            resp = self.client.get("/api/admin/audit-logs/timeline/loan/1/?include_archived=1")
+            self.assertEqual(resp.status_code, 200)
+            self.assertEqual([r["summary"] for r in resp.data["results"]], ["recent", "old #1", "old #3"])
+            self.assertEqual([r["archived"] for r in resp.data["results"]], [False, True, True])
+
+            seen = []
+            url = "/api/admin/audit-logs/?include_archived=1&page_size=2"
+            while url:
+                resp = self.client.get(url)
+                self.assertEqual(resp.status_code, 200)
+                seen += [r["summary"] for r in resp.data["results"]]
+                url = resp.data["next"]
+            self.assertEqual(seen, ["recent"] + [f"old #{i}" for i in range(5)])
+
+    def test_search_filters_hot_and_archived_rows(self):
+        from django.core.management import call_command
+
+        AuditLog.objects.create(actor=self.admin, action="CLIENT_CREATED", target_type="Client", target_id="C-9", summary="Created client Amina Otieno")
+        resp = self.client.get("/api/admin/audit-logs/?search=amina otieno")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual([r["target_id"] for r in resp.data["results"]], ["C-9"])
+
+        with tempfile.TemporaryDirectory() as archive_dir, self.settings(AUDIT_ARCHIVE_DIR=archive_dir):
+            call_command("archive_audit_logs", older_than_days=365, stdout=open(os.devnull, "w"))
+            resp = self.client.get("/api/admin/audit-logs/?include_archived=1&search=OLD %232")
+            self.assertEqual([r["summary"] for r in resp.data["results"]], ["old #2"])
+
+
+class EmailOutboxTests(TestCase):
+    def setUp(self):
+        from rest_framework.test import APIClient
+
+        self.admin = User.objects.create_user(
+            username="root", email="root@example.com", password="x", role="SUPER_ADMIN"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def _invite(self):
+        resp = self.client.post(
+            "/api/admin/users/",
+            {"username": "newadmin", "email": "new@example.com", "role": "SUPER_ADMIN"},
+            format="json",
+        )
+        self.assertEqual(resp.status_code, 201)
+
+    def test_invite_is_queued_and_sent_by_the_worker(self):
+        from django.core import mail
+        from django.core.management import call_command
+
+        from .models import OutboundEmail, OutboundEmailStatus
+
+        self._invite()
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(OutboundEmail.objects.get().status, OutboundEmailStatus.PENDING)
+
+        call_command("run_email_worker", once=True, stdout=open(os.devnull, "w"))
+        self.assertEqual([m.to for m in mail.outbox], [["new@example.com"]])
+        self.assertIn("/set-password?uid=", mail.outbox[0].body)
+        email = OutboundEmail.objects.get()
+        self.assertEqual((email.status, email.body), (OutboundEmailStatus.SENT, ""))
+
+    def test_admin_never_shows_the_body(self):
+        from django.contrib import admin
+        from django.test import RequestFactory
+
+        from .models import OutboundEmail
+
+        self._invite()
+        request = RequestFactory().get("/")
+        request.user = self.admin
+        model_admin = admin.site._registry[OutboundEmail]
+        self.assertNotIn("body", model_admin.get_fields(request, OutboundEmail.objects.get()))
+        self.assertNotIn("body", model_admin.get_form(request).base_fields)
+
+    def test_failed_send_is_retried_with_backoff(self):
+        from unittest import mock
+
+        from django.core import mail
+        from django.utils import timezone
+
+        from .models import OutboundEmail, OutboundEmailStatus
+        from .outbox import claim_emails, send_claimed
+
+        self._invite()
+        with mock.patch("django.core.mail.backends.locmem.EmailBackend.send_messages", side_effect=OSError("down")):
+            send_claimed(claim_emails(limit=10, worker="test"))
+
+        email = OutboundEmail.objects.get()
+        self.assertEqual((email.status, email.attempts), (OutboundEmailStatus.PENDING, 1))
+        self.assertIn("down", email.last_error)
+        self.assertGreater(email.next_attempt_at, timezone.now())
+        self.assertEqual(claim_emails(limit=10, worker="test"), [])
+
+        OutboundEmail.objects.update(next_attempt_at=timezone.now())
+        send_claimed(claim_emails(limit=10, worker="test"))
+        self.assertEqual(OutboundEmail.objects.get().status, OutboundEmailStatus.SENT)
+        self.assertEqual(len(mail.outbox), 1)
+
+
+class LoginAttemptTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        from rest_framework.test import APIClient
+
+        cache.clear()
+        self.branch = Branch.objects.create(
+            name="Main", code="MAIN", region="East", phone="123", address="Addr"
+        )
+        self.user = User.objects.create_user(
+            username="teller", email="teller@example.com", password="right-pass", role="CASHIER", branch=self.branch
+        )
+        self.client = APIClient()
+
+    def _login(self, password, ip="10.0.0.1"):
+        return self.client.post(
+            "/api/auth/login/", {"username": "teller", "password": password}, format="json", REMOTE_ADDR=ip
+        )
+
+    def test_failures_are_counted_without_writing_the_user_row(self):
+        from .views import MAX_LOGIN_ATTEMPTS
+
+        # as with Redis/Memcached as LOGIN_ATTEMPT_CACHE_ALIAS
+        with mock.patch("accounts.login_attempts._counts_in_cache", return_value=True):
+            for _ in range(MAX_LOGIN_ATTEMPTS - 1):
+                with self.assertNumQueries(1):  # the user lookup, no UPDATE
+                    self.assertEqual(self._login("wrong").status_code, 400)
+            self.user.refresh_from_db()
+            self.assertEqual((self.user.is_active, self.user.failed_login_attempts), (True, 0))
+
+            self.assertEqual(self._login("wrong").status_code, 403)
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.is_active, self.user.failed_login_attempts), (False, MAX_LOGIN_ATTEMPTS))
+
+    def test_per_process_cache_counts_on_the_user_row(self):
+        from django.core.cache import cache
+        from .views import MAX_LOGIN_ATTEMPTS
+
+        for _ in range(MAX_LOGIN_ATTEMPTS - 1):
+            self.assertEqual(self._login("wrong").status_code, 400)
+            # the next attempt may reach a worker with an empty LocMem cache
+            cache.clear()
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.failed_login_attempts, MAX_LOGIN_ATTEMPTS - 1)
+        self.assertEqual(self._login("wrong").status_code, 403)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+
+    def test_success_resets_the_count(self):
+        from .views import MAX_LOGIN_ATTEMPTS
+
+        for _ in range(MAX_LOGIN_ATTEMPTS - 1):
+            self._login("wrong")
+        self.assertEqual(self._login("right-pass").status_code, 200)
+        self.assertIn("3 login attempts left", self._login("wrong").json()["detail"])
+
+    def test_ip_is_throttled_on_failed_logins_only(self):
+        with self.settings(LOGIN_IP_MAX_ATTEMPTS=2):
+            for _ in range(3):
+                self.assertEqual(self._login("right-pass").status_code, 200)
+            self.assertEqual(self._login("wrong").status_code, 400)
+            self.assertEqual(self._login("wrong").status_code, 400)
+            resp = self._login("right-pass")
+            self.assertEqual(resp.status_code, 429)
+            self.assertTrue(int(resp["Retry-After"]) >= 1)
+            self.assertEqual(self._login("right-pass", ip="10.0.0.2").status_code, 200)
+
+    def test_forwarded_for_cannot_dodge_the_ip_throttle(self):
+        from django.core.cache import cache
+
+        def login(forwarded):
+            return self.client.post(
+                "/api/auth/login/", {"username": "nobody", "password": "wrong"}, format="json",
+                REMOTE_ADDR="10.0.0.9", HTTP_X_FORWARDED_FOR=forwarded,
+            )
+
+        with self.settings(LOGIN_IP_MAX_ATTEMPTS=2):
+            login("1.1.1.1")
+            login("2.2.2.2")
+            self.assertEqual(login("3.3.3.3").status_code, 429)
+
+        cache.clear()
+        # behind one proxy: the entry it appended counts, not the client-supplied ones
+        with self.settings(LOGIN_IP_MAX_ATTEMPTS=2, LOGIN_TRUSTED_PROXY_COUNT=1):
+            login("1.1.1.1, 203.0.113.5")
+            login("2.2.2.2, 203.0.113.5")
+            self.assertEqual(login("3.3.3.3, 203.0.113.5").status_code, 429)
+            self.assertEqual(login("203.0.113.6").status_code, 400)
+
+
+class ClaimsAuthenticationTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        from rest_framework.test import APIClient
+
+        cache.clear()
+        self.branch = Branch.objects.create(
+            name="Main", code="MAIN", region="East", phone="123", address="Addr"
+        )
+        self.user = User.objects.create_user(
+            username="mgr", email="mgr@example.com", password="pass", role="BRANCH_MANAGER", branch=self.branch
+        )
+        self.client = APIClient()
+        resp = self.client.post("/api/auth/login/", {"username": "mgr", "password": "pass"}, format="json")
+        self.tokens = resp.json()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.tokens['access']}")
+
+    def test_request_user_comes_from_claims(self):
+        from rest_framework.test import APIRequestFactory
+
+        from .authentication import ClaimsJWTAuthentication
+
+        request = APIRequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {self.tokens['access']}")
+        # per-process cache: only the revocation lookup
+        with self.assertNumQueries(1):
+            user, _ = ClaimsJWTAuthentication().authenticate(request)
+            self.assertEqual((user.pk, user.role, user.branch_id), (self.user.pk, "BRANCH_MANAGER", self.branch.pk))
+            self.assertEqual(user.branch, self.branch)
+        with mock.patch("accounts.authentication.cache_is_shared", return_value=True):
+            ClaimsJWTAuthentication().authenticate(request)  # warms the revocation cache
+            with self.assertNumQueries(0):
+                ClaimsJWTAuthentication().authenticate(request)
+
+        resp = self.client.get("/api/auth/me/")
+        self.assertEqual((resp.status_code, resp.data["email"]), (200, "mgr@example.com"))
+
+    def test_revoked_tokens_are_rejected(self):
+        from .authentication import revoke_tokens
+
+        self.assertEqual(self.client.get("/api/auth/me/").status_code, 200)
+        revoke_tokens(self.user)
+        self.assertEqual(self.client.get("/api/auth/me/").status_code, 401)
+        resp = self.client.post("/api/auth/refresh/", {"refresh": self.tokens["refresh"]}, format="json")
+        self.assertEqual(resp.status_code, 401)
+
+    def test_revocation_by_another_worker_is_seen_at_once(self):
+        from django.db.models import F
+
+        self.assertEqual(self.client.get("/api/auth/me/").status_code, 200)
+        # revoke_tokens() in another process: this process's LocMem entry is not cleared
+        User.objects.filter(pk=self.user.pk).update(token_version=F("token_version") + 1)
+        self.assertEqual(self.client.get("/api/auth/me/").status_code, 401)
+
+
+class PasswordPoolTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="root", email="root@example.com", password="pass", role="SUPER_ADMIN"
+        )
+
+    def test_login_reports_hash_metrics(self):
+        from rest_framework.test import APIClient
+
+        from .passwords import metrics
+
+        metrics.reset()
+        resp = self.client.post("/api/auth/login-email/", {"email": "root@example.com", "password": "pass"}, content_type="application/json")
+        self.assertEqual(resp.status_code, 200)
+
+        api = APIClient()
+        api.force_authenticate(self.user)
+        data = api.get("/api/admin/login-metrics/").data
+        self.assertEqual(data["verifications"], 1)
+        self.assertEqual(sum(data["histogram"].values()), 1)
+
+    def test_busy_pool_answers_503(self):
+        with self.settings(LOGIN_HASH_MAX_PENDING=0):
+            resp = self.client.post("/api/auth/login/", {"username": "root", "password": "pass"}, content_type="application/json")
+        self.assertEqual(resp.status_code, 503)
+        self.assertEqual(resp["Retry-After"], "1")
+
+    def test_outdated_hash_is_replaced(self):
+        from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+        from .passwords import needs_rehash, rehash_password
+
+        hasher = PBKDF2PasswordHasher()
+        old = hasher.encode("pass", hasher.salt(), iterations=1000)
+        User.objects.filter(pk=self.user.pk).update(password=old)
+        self.assertTrue(needs_rehash(old))
+        self.assertTrue(rehash_password(self.user.pk, old, "pass"))
+        self.user.refresh_from_db()
+        self.assertFalse(needs_rehash(self.user.password))
+        self.assertTrue(self.user.check_password("pass"))
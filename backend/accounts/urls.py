@@ -6,6 +6,7 @@ from .views import (
     refresh_token,
     get_user_profile,
     invite_set_password,
+    login_metrics,
     BranchViewSet,
     UserViewSet,
     AuditLogViewSet
@@ -22,5 +23,6 @@ urlpatterns = [
     path('auth/refresh/', refresh_token, name='refresh'),
     path('auth/me/', get_user_profile, name='user-profile'),
     path('auth/invite-set-password/', invite_set_password, name='invite-set-password'),
+    path('admin/login-metrics/', login_metrics, name='login-metrics'),
     path('', include(router.urls)),
 ]
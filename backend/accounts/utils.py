@@ -1,11 +1,11 @@
 from django.conf import settings
-from django.core.mail import send_mail
 from django.contrib.auth.tokens import PasswordResetTokenGenerator
 from django.utils.http import urlsafe_base64_encode
 from django.utils.encoding import force_bytes
 from email.utils import formataddr
 
-from .models import AuditLog
+from .audit import record_audit
+from .outbox import enqueue_email
 
 
 def get_client_ip(request):
@@ -15,14 +15,40 @@ def get_client_ip(request):
     return request.META.get("REMOTE_ADDR")
 
 
+# Cache backends that live inside one process (or store nothing): with several
+# workers, a value written or deleted in one is invisible to the others.
+PROCESS_LOCAL_CACHES = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+# Backends whose incr() is atomic across processes.
+ATOMIC_COUNTER_CACHES = (
+    "django.core.cache.backends.redis.RedisCache",
+    "django.core.cache.backends.memcached.PyMemcacheCache",
+    "django.core.cache.backends.memcached.PyLibMCCache",
+)
+
+
+def cache_is_shared(alias, atomic=False):
+    """
+    True if cache `alias` is shared by every worker (and, with atomic=True,
+    counts atomically across them); False for per-process backends.
+    """
+    backend = settings.CACHES.get(alias, {}).get("BACKEND", "")
+    if atomic:
+        return backend in ATOMIC_COUNTER_CACHES
+    return bool(backend) and backend not in PROCESS_LOCAL_CACHES
+
+
 def create_audit_log(actor, action, target_type, target_id, summary, ip_address=None):
-    AuditLog.objects.create(
+    # batched: written after commit, once per request (see accounts.audit)
+    record_audit(
         actor=actor,
         action=action,
         target_type=target_type,
-        target_id=str(target_id),
+        target_id=target_id,
         summary=summary,
-        ip_address=ip_address
+        ip_address=ip_address,
     )
 
 
@@ -48,8 +74,9 @@ def generate_set_password_link(user):
 
 def send_invite_email(user):
     """
-    Sends an invite email with a set-password link:
+    Queues an invite email with a set-password link:
     {FRONTEND_URL}/set-password?uid=<uid>&token=<token>
+    Delivered by `manage.py run_email_worker` (accounts.outbox).
     """
     invite_link = generate_set_password_link(user)
 
@@ -65,18 +92,18 @@ def send_invite_email(user):
 
     from_email = _build_from_email()
 
-    send_mail(
+    enqueue_email(
+        kind="INVITE",
         subject=subject,
-        message=message,
+        body=message,
         from_email=from_email,
-        recipient_list=[user.email],
-        fail_silently=False,
+        to=[user.email],
     )
 
 
 def send_password_reset_email(user):
     """
-    Sends a password reset email reusing the same set-password link generation.
+    Queues a password reset email reusing the same set-password link generation.
     """
     reset_link = generate_set_password_link(user)
 
@@ -92,10 +119,10 @@ def send_password_reset_email(user):
 
     from_email = _build_from_email()
 
-    send_mail(
+    enqueue_email(
+        kind="PASSWORD_RESET",
         subject=subject,
-        message=message,
+        body=message,
         from_email=from_email,
-        recipient_list=[user.email],
-        fail_silently=False,
+        to=[user.email],
     )
@@ -1,20 +1,50 @@
+from dataclasses import dataclass
 from decimal import Decimal
 from django.core.exceptions import ValidationError
 from accounts.models import Branch
 from .services import get_active_session_for_cashier, post_cash_entry
-from .models import CashEventType, CashDirection
+from .models import CashEventType, CashDirection, TellerSession
 
 
-def require_active_cash_session(*, request_user):
+# Attribute on the request user object that caches the resolved context. DRF
+# builds a fresh user object per request, so the cache is request-scoped.
+_CONTEXT_ATTR = "_cash_context"
+
+
+@dataclass
+class CashContext:
+    branch: Branch
+    session: TellerSession
+
+
+def get_cash_context(*, request_user, refresh=False) -> CashContext:
+    """
+    Resolve the cashier's branch and ACTIVE teller session once per request
+    (one query, branch joined in) and reuse it for every cash hook that
+    follows. A missing session is not cached so a retry can pick up a
+    session opened in the meantime. post_cash_entry re-checks the session
+    under a row lock, so a cached context can never post to a closed drawer.
+    """
+    ctx = getattr(request_user, _CONTEXT_ATTR, None)
+    if ctx is not None and not refresh:
+        return ctx
+
     branch_id = getattr(request_user, "branch_id", None)
     if not branch_id:
         raise ValidationError("User must belong to a branch.")
 
-    branch = Branch.objects.get(id=branch_id)
-    session = get_active_session_for_cashier(branch=branch, cashier=request_user)
+    session = get_active_session_for_cashier(branch=branch_id, cashier=request_user)
     if not session:
         raise ValidationError("No ACTIVE teller session. Start session first.")
-    return branch, session
+
+    ctx = CashContext(branch=session.branch, session=session)
+    setattr(request_user, _CONTEXT_ATTR, ctx)
+    return ctx
+
+
+def require_active_cash_session(*, request_user):
+    ctx = get_cash_context(request_user=request_user)
+    return ctx.branch, ctx.session
 
 
 def record_cash_savings_deposit(*, request_user, amount: Decimal, savings_tx_id):
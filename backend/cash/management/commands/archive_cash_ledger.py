@@ -0,0 +1,190 @@
+import gzip
+import json
+import os
+from datetime import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.utils import timezone
+
+from cash.models import CashLedgerEntry, TellerSession, TellerSessionStatus
+from cash.partitioning import (
+    LEDGER_TABLE,
+    add_months,
+    detach_month_partition,
+    drop_table,
+    is_partitioned,
+    list_month_partitions,
+    month_start,
+    partition_name,
+)
+
+
+ARCHIVE_FIELDS = [
+    "id",
+    "branch_id",
+    "session_id",
+    "event_type",
+    "direction",
+    "amount",
+    "narration",
+    "reference_type",
+    "reference_id",
+    "created_by_id",
+    "created_at",
+    "reverses_entry_id",
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Move closed, reviewed months of CashLedgerEntry out of the hot table. "
+        "Each month is written to a gzip-compressed JSONL file (default) or, on a "
+        "partitioned PostgreSQL ledger, its partition is detached into an archive schema."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--before",
+            help="Archive months strictly before YYYY-MM (default: the current month). "
+                 "The current month is never archived.",
+        )
+        parser.add_argument(
+            "--mode",
+            choices=["jsonl", "schema"],
+            default="jsonl",
+            help="jsonl: export to CASH_LEDGER_ARCHIVE_DIR then remove rows. "
+                 "schema: detach the month partition into CASH_LEDGER_ARCHIVE_SCHEMA (PostgreSQL only).",
+        )
+        parser.add_argument("--output-dir", help="Override CASH_LEDGER_ARCHIVE_DIR for jsonl mode.")
+        parser.add_argument("--dry-run", action="store_true", help="Only report what would be archived.")
+
+    def handle(self, *args, **options):
+        current = month_start(timezone.localdate())
+        cutoff = current
+        if options.get("before"):
+            try:
+                cutoff = month_start(datetime.strptime(options["before"], "%Y-%m").date())
+            except ValueError:
+                raise CommandError("--before must be in YYYY-MM format.")
+            cutoff = min(cutoff, current)
+
+        mode = options["mode"]
+        partitioned = is_partitioned()
+        if mode == "schema" and not partitioned:
+            raise CommandError("--mode schema requires the partitioned PostgreSQL ledger.")
+
+        months = self._candidate_months(cutoff, partitioned)
+        if not months:
+            self.stdout.write(self.style.SUCCESS("Nothing to archive."))
+            return
+
+        output_dir = options.get("output_dir") or str(settings.CASH_LEDGER_ARCHIVE_DIR)
+        archived = 0
+        for month in months:
+            start, end = self._window(month)
+            label = month.strftime("%Y-%m")
+
+            blocking = self._blocking_sessions(start, end)
+            if blocking:
+                self.stdout.write(self.style.WARNING(
+                    f"- {label}: skipped, {len(blocking)} session(s) not CLOSED and reviewed "
+                    f"(e.g. #{', #'.join(str(i) for i in blocking[:5])})"
+                ))
+                continue
+
+            rows = CashLedgerEntry.objects.filter(created_at__gte=start, created_at__lt=end)
+            count = rows.count()
+            if options["dry_run"]:
+                self.stdout.write(f"- {label}: would archive {count} row(s) ({mode})")
+                continue
+
+            if mode == "schema":
+                if partition_name(month) not in {name for name, _ in list_month_partitions()}:
+                    self.stdout.write(self.style.WARNING(f"- {label}: skipped, no monthly partition to detach"))
+                    continue
+                self._archive_to_schema(month)
+            else:
+                path = self._export_jsonl(rows, output_dir, month, count)
+                self._remove_month(month, start, end, partitioned)
+                self.stdout.write(f"  wrote {path}")
+
+            archived += 1
+            self.stdout.write(f"- {label}: archived {count} row(s) ({mode})")
+
+        self.stdout.write(self.style.SUCCESS(f"Done. Archived {archived} month(s)."))
+
+    # ---- helpers ----
+
+    def _window(self, month):
+        start = timezone.make_aware(datetime(month.year, month.month, 1))
+        nxt = add_months(month, 1)
+        end = timezone.make_aware(datetime(nxt.year, nxt.month, 1))
+        return start, end
+
+    def _candidate_months(self, cutoff, partitioned):
+        if partitioned:
+            months = {m for _, m in list_month_partitions() if m < cutoff}
+        else:
+            months = set()
+        oldest = CashLedgerEntry.objects.order_by("created_at").values_list("created_at", flat=True).first()
+        if oldest is not None:
+            month = month_start(timezone.localtime(oldest).date())
+            while month < cutoff:
+                months.add(month)
+                month = add_months(month, 1)
+        return sorted(months)
+
+    def _blocking_sessions(self, start, end):
+        return list(
+            TellerSession.objects.filter(ledger_entries__created_at__gte=start, ledger_entries__created_at__lt=end)
+            .exclude(status=TellerSessionStatus.CLOSED, reviewed_at__isnull=False)
+            .values_list("id", flat=True)
+            .distinct()
+            .order_by("id")
+        )
+
+    def _export_jsonl(self, rows, output_dir, month, expected):
+        os.makedirs(output_dir, exist_ok=True)
+        path = os.path.join(output_dir, f"cash_ledger_{month.year:04d}{month.month:02d}.jsonl.gz")
+        tmp_path = f"{path}.tmp"
+
+        written = 0
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as fh:
+            for row in rows.order_by("id").values(*ARCHIVE_FIELDS).iterator(chunk_size=2000):
+                fh.write(json.dumps(row, cls=DjangoJSONEncoder))
+                fh.write("\n")
+                written += 1
+
+        if written != expected:
+            os.remove(tmp_path)
+            raise CommandError(
+                f"Row count changed while exporting {month:%Y-%m} ({expected} -> {written}); aborting."
+            )
+        os.replace(tmp_path, path)
+        return path
+
+    @transaction.atomic
+    def _remove_month(self, month, start, end, partitioned):
+        # Raw SQL on purpose: QuerySet.delete() would SET_NULL reverses_entry on
+        # later reversal rows, i.e. update append-only entries.
+        if partitioned and partition_name(month) in {name for name, _ in list_month_partitions()}:
+            drop_table(detach_month_partition(month))
+            return
+        qn = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {qn(LEDGER_TABLE)} WHERE created_at >= %s AND created_at < %s",
+                [start, end],
+            )
+
+    @transaction.atomic
+    def _archive_to_schema(self, month):
+        schema = getattr(settings, "CASH_LEDGER_ARCHIVE_SCHEMA", "cash_archive")
+        qn = connection.ops.quote_name
+        name = detach_month_partition(month)
+        with connection.cursor() as cursor:
+            cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {qn(schema)}")
+            cursor.execute(f"ALTER TABLE {qn(name)} SET SCHEMA {qn(schema)}")
@@ -0,0 +1,48 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from cash.partitioning import (
+    add_months,
+    ensure_month_partition,
+    is_partitioned,
+    month_start,
+    partition_name,
+    supports_partitioning,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Create monthly CashLedgerEntry partitions for the current month and the next N months "
+        "(idempotent; PostgreSQL only). Schedule it daily or monthly via cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--months-ahead",
+            type=int,
+            default=getattr(settings, "CASH_LEDGER_PARTITION_MONTHS_AHEAD", 3),
+            help="How many future months to pre-create (default: CASH_LEDGER_PARTITION_MONTHS_AHEAD).",
+        )
+
+    def handle(self, *args, **options):
+        if not supports_partitioning():
+            self.stdout.write(self.style.WARNING("Database is not PostgreSQL; ledger partitioning is disabled."))
+            return
+        if not is_partitioned():
+            raise CommandError("cash_cashledgerentry is not partitioned. Run `manage.py migrate cash` first.")
+
+        months_ahead = options["months_ahead"]
+        if months_ahead < 0:
+            raise CommandError("--months-ahead cannot be negative.")
+
+        current = month_start(timezone.localdate())
+        created = 0
+        for offset in range(months_ahead + 1):
+            month = add_months(current, offset)
+            if ensure_month_partition(month):
+                created += 1
+                self.stdout.write(f"- created {partition_name(month)}")
+
+        self.stdout.write(self.style.SUCCESS(f"Done. Created {created} partition(s)."))
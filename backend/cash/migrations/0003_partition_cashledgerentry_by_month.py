@@ -0,0 +1,120 @@
+"""
+Convert cash_cashledgerentry into a table range-partitioned by month on
+created_at (PostgreSQL only; other vendors only get the AlterField).
+
+PostgreSQL requires the partition key to be part of every unique constraint,
+so the primary key becomes (id, created_at) and the self-referencing
+reverses_entry FK can no longer be enforced by the database. The application
+already guards reversal chains in cash.services.reverse_cash_entry.
+"""
+from datetime import date
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+TABLE = "cash_cashledgerentry"
+LEGACY = "cash_cashledgerentry_legacy"
+
+
+def _month_start(d):
+    return date(d.year, d.month, 1)
+
+
+def _add_months(d, months):
+    index = d.year * 12 + (d.month - 1) + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _capture_indexes_and_fks(cursor, table):
+    cursor.execute(
+        "SELECT i.indexdef FROM pg_indexes i "
+        "WHERE i.tablename = %s AND i.schemaname = current_schema() "
+        "AND i.indexname NOT IN ("
+        "  SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'p'"
+        ")",
+        [table, table],
+    )
+    index_defs = [r[0] for r in cursor.fetchall()]
+
+    cursor.execute(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = %s::regclass AND contype = 'f'",
+        [table],
+    )
+    fk_defs = cursor.fetchall()
+    return index_defs, fk_defs
+
+
+def _swap_table(schema_editor, partitioned):
+    qn = schema_editor.quote_name
+    with schema_editor.connection.cursor() as cursor:
+        index_defs, fk_defs = _capture_indexes_and_fks(cursor, TABLE)
+
+        cursor.execute(f"ALTER TABLE {qn(TABLE)} RENAME TO {qn(LEGACY)}")
+        cursor.execute(f"ALTER TABLE {qn(LEGACY)} RENAME CONSTRAINT {qn(TABLE + '_pkey')} TO {qn(LEGACY + '_pkey')}")
+        suffix = " PARTITION BY RANGE (created_at)" if partitioned else ""
+        cursor.execute(
+            f"CREATE TABLE {qn(TABLE)} (LIKE {qn(LEGACY)} "
+            f"INCLUDING DEFAULTS INCLUDING IDENTITY INCLUDING CONSTRAINTS){suffix}"
+        )
+        pk = "(id, created_at)" if partitioned else "(id)"
+        cursor.execute(f"ALTER TABLE {qn(TABLE)} ADD CONSTRAINT {qn(TABLE + '_pkey')} PRIMARY KEY {pk}")
+
+        if partitioned:
+            cursor.execute(f"SELECT MIN(created_at) FROM {qn(LEGACY)}")
+            oldest = cursor.fetchone()[0]
+            today = date.today()
+            month = _month_start(oldest.date() if oldest else today)
+            last = _add_months(_month_start(today), getattr(settings, "CASH_LEDGER_PARTITION_MONTHS_AHEAD", 3))
+            while month <= last:
+                nxt = _add_months(month, 1)
+                name = f"{TABLE}_p{month.year:04d}{month.month:02d}"
+                cursor.execute(
+                    f"CREATE TABLE {qn(name)} PARTITION OF {qn(TABLE)} FOR VALUES FROM (%s) TO (%s)",
+                    [month.isoformat(), nxt.isoformat()],
+                )
+                month = nxt
+            cursor.execute(f"CREATE TABLE {qn(TABLE + '_default')} PARTITION OF {qn(TABLE)} DEFAULT")
+
+        cursor.execute(f"INSERT INTO {qn(TABLE)} SELECT * FROM {qn(LEGACY)}")
+        cursor.execute(
+            f"SELECT setval(pg_get_serial_sequence(%s, 'id'), COALESCE((SELECT MAX(id) FROM {qn(TABLE)}), 0) + 1, false)",
+            [TABLE],
+        )
+
+        # Dropping the legacy table frees the index/constraint names for reuse.
+        cursor.execute(f"DROP TABLE {qn(LEGACY)}")
+        for index_def in index_defs:
+            cursor.execute(index_def)
+        for name, definition in fk_defs:
+            cursor.execute(f"ALTER TABLE {qn(TABLE)} ADD CONSTRAINT {qn(name)} {definition}")
+
+
+def partition_ledger(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    _swap_table(schema_editor, partitioned=True)
+
+
+def unpartition_ledger(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    _swap_table(schema_editor, partitioned=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cash', '0002_rename_cash_ledger_branch_created_at_idx_cash_cashle_branch__d026fd_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='cashledgerentry',
+            name='reverses_entry',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reversed_by_entries', to='cash.cashledgerentry'),
+        ),
+        migrations.RunPython(partition_ledger, unpartition_ledger),
+    ]
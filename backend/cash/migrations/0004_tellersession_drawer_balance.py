@@ -0,0 +1,35 @@
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def backfill_drawer_balance(apps, schema_editor):
+    TellerSession = apps.get_model("cash", "TellerSession")
+    CashLedgerEntry = apps.get_model("cash", "CashLedgerEntry")
+
+    for session in TellerSession.objects.filter(status="ACTIVE").iterator():
+        entries = CashLedgerEntry.objects.filter(session_id=session.id).exclude(event_type="REVERSAL")
+        inflows = (
+            entries.filter(direction="INFLOW").exclude(event_type="VAULT_TO_DRAWER").aggregate(s=Sum("amount"))["s"]
+            or Decimal("0.00")
+        )
+        outflows = entries.filter(direction="OUTFLOW").aggregate(s=Sum("amount"))["s"] or Decimal("0.00")
+        opening = session.confirmed_opening_amount or Decimal("0.00")
+        TellerSession.objects.filter(pk=session.pk).update(drawer_balance=opening + inflows - outflows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cash', '0003_partition_cashledgerentry_by_month'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tellersession',
+            name='drawer_balance',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14),
+        ),
+        migrations.RunPython(backfill_drawer_balance, migrations.RunPython.noop),
+    ]
@@ -73,6 +73,11 @@ class TellerSession(models.Model):
     confirmed_at = models.DateTimeField(null=True, blank=True)
     confirmed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="confirmed_sessions")
 
+    # Running drawer balance, maintained by cash.services.post_cash_entry under a
+    # row lock. Same rules as compute_expected_drawer_balance (which stays the
+    # source of truth for reconciliation at close).
+    drawer_balance = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+
     # Close/reconciliation
     counted_closing_amount = models.DecimalField(max_digits=14, decimal_places=2, null=True, blank=True)
     expected_closing_amount = models.DecimalField(max_digits=14, decimal_places=2, null=True, blank=True)
@@ -113,6 +118,10 @@ class CashLedgerEntry(models.Model):
     """
     Append-only cash ledger. Never delete/update entries.
     Corrections happen via reversal entries (REVERSAL) referencing reverses_entry.
+
+    On PostgreSQL the table is range-partitioned by month on created_at
+    (see cash.partitioning); closed, reviewed months can be moved out with
+    `manage.py archive_cash_ledger`.
     """
     branch = models.ForeignKey(Branch, on_delete=models.CASCADE, related_name="cash_ledger_entries")
     session = models.ForeignKey(TellerSession, on_delete=models.SET_NULL, null=True, blank=True, related_name="ledger_entries")
@@ -131,7 +140,11 @@ class CashLedgerEntry(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     # reversal chain
-    reverses_entry = models.ForeignKey("self", on_delete=models.SET_NULL, null=True, blank=True, related_name="reversed_by_entries")
+    # db_constraint=False: the table is range-partitioned by created_at on PostgreSQL,
+    # so (id) alone cannot back a foreign key. reverse_cash_entry guards the chain.
+    reverses_entry = models.ForeignKey(
+        "self", on_delete=models.SET_NULL, null=True, blank=True, related_name="reversed_by_entries", db_constraint=False
+    )
 
     class Meta:
         ordering = ["-created_at"]
@@ -0,0 +1,140 @@
+"""
+Monthly range partitioning helpers for the cash ledger (PostgreSQL only).
+
+The parent table keeps Django's name (cash_cashledgerentry) so the ORM is
+unchanged; each month lives in a child table named
+cash_cashledgerentry_pYYYYMM. Rows that do not fit any monthly partition land
+in cash_cashledgerentry_default until `create_cash_ledger_partitions` moves
+them into a proper month.
+
+On other database vendors every helper here is a no-op.
+"""
+from datetime import date
+
+from django.db import connection, transaction
+
+from .models import CashLedgerEntry
+
+
+LEDGER_TABLE = CashLedgerEntry._meta.db_table
+DEFAULT_PARTITION = f"{LEDGER_TABLE}_default"
+
+
+def month_start(day: date) -> date:
+    return date(day.year, day.month, 1)
+
+
+def add_months(day: date, months: int) -> date:
+    index = day.year * 12 + (day.month - 1) + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(day: date) -> str:
+    return f"{LEDGER_TABLE}_p{day.year:04d}{day.month:02d}"
+
+
+def supports_partitioning(conn=None) -> bool:
+    conn = conn or connection
+    return conn.vendor == "postgresql"
+
+
+def is_partitioned(conn=None) -> bool:
+    conn = conn or connection
+    if not supports_partitioning(conn):
+        return False
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relkind FROM pg_class c "
+            "JOIN pg_namespace n ON n.oid = c.relnamespace "
+            "WHERE c.relname = %s AND n.nspname = current_schema()",
+            [LEDGER_TABLE],
+        )
+        row = cursor.fetchone()
+    # 'p' = partitioned table, 'r' = ordinary table
+    return bool(row and row[0] == "p")
+
+
+def list_month_partitions(conn=None):
+    """
+    Return [(partition_name, month_start_date), ...] for attached monthly
+    partitions, oldest first. The DEFAULT partition is not included.
+    """
+    conn = conn or connection
+    if not is_partitioned(conn):
+        return []
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits i "
+            "JOIN pg_class parent ON parent.oid = i.inhparent "
+            "JOIN pg_class child ON child.oid = i.inhrelid "
+            "WHERE parent.relname = %s",
+            [LEDGER_TABLE],
+        )
+        names = [r[0] for r in cursor.fetchall()]
+
+    prefix = f"{LEDGER_TABLE}_p"
+    out = []
+    for name in names:
+        suffix = name[len(prefix):] if name.startswith(prefix) else ""
+        if len(suffix) == 6 and suffix.isdigit():
+            out.append((name, date(int(suffix[:4]), int(suffix[4:]), 1)))
+    return sorted(out, key=lambda x: x[1])
+
+
+def ensure_month_partition(day: date, conn=None) -> bool:
+    """
+    Create the partition holding `day`'s month if it does not exist yet.
+    Rows for that month already sitting in the DEFAULT partition are moved
+    into the new partition in the same transaction (PostgreSQL refuses to
+    attach a range that overlaps rows in DEFAULT).
+
+    Returns True when a partition was created.
+    """
+    conn = conn or connection
+    if not is_partitioned(conn):
+        return False
+
+    start = month_start(day)
+    end = add_months(start, 1)
+    name = partition_name(start)
+    qn = conn.ops.quote_name
+
+    with transaction.atomic(using=conn.alias), conn.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s)", [name])
+        if cursor.fetchone()[0] is not None:
+            return False
+
+        cursor.execute(
+            f"CREATE TABLE {qn(name)} (LIKE {qn(LEDGER_TABLE)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        )
+        cursor.execute(
+            f"WITH moved AS ("
+            f"  DELETE FROM {qn(DEFAULT_PARTITION)} WHERE created_at >= %s AND created_at < %s RETURNING *"
+            f") INSERT INTO {qn(name)} SELECT * FROM moved",
+            [start.isoformat(), end.isoformat()],
+        )
+        cursor.execute(
+            f"ALTER TABLE {qn(LEDGER_TABLE)} ATTACH PARTITION {qn(name)} "
+            f"FOR VALUES FROM (%s) TO (%s)",
+            [start.isoformat(), end.isoformat()],
+        )
+    return True
+
+
+def detach_month_partition(day: date, conn=None) -> str:
+    """
+    Detach the partition for `day`'s month and return its table name.
+    The detached table keeps its data until the caller drops it.
+    """
+    conn = conn or connection
+    name = partition_name(month_start(day))
+    qn = conn.ops.quote_name
+    with conn.cursor() as cursor:
+        cursor.execute(f"ALTER TABLE {qn(LEDGER_TABLE)} DETACH PARTITION {qn(name)}")
+    return name
+
+
+def drop_table(name: str, conn=None):
+    conn = conn or connection
+    with conn.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {conn.ops.quote_name(name)}")
@@ -35,6 +35,7 @@ class TellerSessionSerializer(serializers.ModelSerializer):
             "confirmed_opening_amount",
             "confirmed_at",
             "confirmed_by",
+            "drawer_balance",
             "opened_at",
             "counted_closing_amount",
             "expected_closing_amount",
@@ -54,6 +55,7 @@ class TellerSessionSerializer(serializers.ModelSerializer):
             "opened_at",
             "closed_at",
             "reviewed_at",
+            "drawer_balance",
             "expected_closing_amount",
             "variance_amount",
             "expected_drawer_balance",
@@ -106,6 +108,28 @@ class TellerSessionCloseSerializer(serializers.Serializer):
     variance_note = serializers.CharField(required=False, allow_blank=True, default="")
 
 
+class BranchCloseOutItemSerializer(serializers.Serializer):
+    session_id = serializers.IntegerField()
+    counted_closing_amount = serializers.DecimalField(max_digits=14, decimal_places=2)
+    variance_note = serializers.CharField(required=False, allow_blank=True, default="")
+
+    def validate_counted_closing_amount(self, v: Decimal):
+        if v < 0:
+            raise serializers.ValidationError("counted_closing_amount cannot be negative.")
+        return v
+
+
+class BranchCloseOutSerializer(serializers.Serializer):
+    sessions = BranchCloseOutItemSerializer(many=True, allow_empty=False)
+    return_to_vault = serializers.BooleanField(default=True)
+
+    def validate_sessions(self, items):
+        ids = [i["session_id"] for i in items]
+        if len(ids) != len(set(ids)):
+            raise serializers.ValidationError("Each session may only be listed once.")
+        return items
+
+
 class TellerSessionReviewSerializer(serializers.Serializer):
     review_note = serializers.CharField(required=False, allow_blank=True, default="")
     reviewed = serializers.BooleanField(default=True)
@@ -1,8 +1,10 @@
 from decimal import Decimal
-from django.db import transaction
+from django.conf import settings
+from django.db import transaction, connection, OperationalError
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 
+from .signals import cash_activity
 from .models import (
     TellerSession,
     TellerSessionStatus,
@@ -13,13 +15,27 @@ from .models import (
 
 
 def get_active_session_for_cashier(branch, cashier):
-    return TellerSession.objects.filter(
+    return TellerSession.objects.select_related("branch").filter(
         branch=branch,
         cashier=cashier,
         status=TellerSessionStatus.ACTIVE,
     ).order_by("-opened_at", "-id").first()
 
 
+def session_ledger(session: TellerSession):
+    """
+    Ledger entries for one session.
+
+    Entries are always created after the session was allocated, so bounding
+    created_at by allocated_at lets PostgreSQL prune the monthly ledger
+    partitions down to the session's month instead of scanning all of them.
+    """
+    qs = CashLedgerEntry.objects.filter(session=session)
+    if session.allocated_at is not None:
+        qs = qs.filter(created_at__gte=session.allocated_at)
+    return qs
+
+
 def compute_expected_drawer_balance(session: TellerSession) -> Decimal:
     """
     Expected = confirmed opening + inflows - outflows.
@@ -42,8 +58,7 @@ def compute_expected_drawer_balance(session: TellerSession) -> Decimal:
 
     # exclude vault allocations from inflows so opening amount isn't double-counted
     inflows = (
-        CashLedgerEntry.objects.filter(
-            session=session,
+        session_ledger(session).filter(
             direction=CashDirection.INFLOW,
         )
         .exclude(event_type__in=[
@@ -53,8 +68,7 @@ def compute_expected_drawer_balance(session: TellerSession) -> Decimal:
         .aggregate_total()
     )
 
-    outflows = CashLedgerEntry.objects.filter(
-        session=session,
+    outflows = session_ledger(session).filter(
         direction=CashDirection.OUTFLOW,
     ).exclude(event_type=CashEventType.REVERSAL).aggregate_total()
 
@@ -62,7 +76,7 @@ def compute_expected_drawer_balance(session: TellerSession) -> Decimal:
 
 
 # ---- queryset helper ----
-from django.db.models import Sum
+from django.db.models import Sum, Q
 from django.db.models.query import QuerySet
 
 
@@ -74,6 +88,42 @@ def _aggregate_total(qs: QuerySet) -> Decimal:
 QuerySet.aggregate_total = _aggregate_total  # simple helper
 
 
+def drawer_delta(*, event_type: str, direction: str, amount: Decimal) -> Decimal:
+    """
+    How one ledger entry moves the drawer balance, using the same rules as
+    compute_expected_drawer_balance: reversals and the opening vault
+    allocation do not count.
+    """
+    if event_type == CashEventType.REVERSAL:
+        return Decimal("0.00")
+    if direction == CashDirection.INFLOW:
+        if event_type == CashEventType.VAULT_TO_DRAWER:
+            return Decimal("0.00")
+        return amount
+    return -amount
+
+
+def _set_lock_timeout():
+    timeout_ms = int(getattr(settings, "CASH_SESSION_LOCK_TIMEOUT_MS", 5000))
+    if connection.vendor == "postgresql" and timeout_ms > 0:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT set_config('lock_timeout', %s, true)", [f"{timeout_ms}ms"])
+
+
+def lock_session(session: TellerSession) -> TellerSession:
+    """
+    Re-read the session row with SELECT ... FOR UPDATE (must run inside a
+    transaction). On PostgreSQL the wait is bounded by
+    CASH_SESSION_LOCK_TIMEOUT_MS so a stuck drawer surfaces as a retryable
+    error instead of hanging the request.
+    """
+    _set_lock_timeout()
+    try:
+        return TellerSession.objects.select_for_update().get(pk=session.pk)
+    except OperationalError:
+        raise ValidationError("Teller drawer is busy with another transaction. Please retry.")
+
+
 @transaction.atomic
 def post_cash_entry(
     *,
@@ -94,18 +144,26 @@ def post_cash_entry(
         # allowed for vault-only operations, but most of your flows should include a session
         pass
     else:
-        if session.status != TellerSessionStatus.ACTIVE:
+        # Lock the drawer row so concurrent OUTFLOWs on the same session are
+        # serialized; every check below uses the locked, current row.
+        locked = lock_session(session)
+        if locked.status != TellerSessionStatus.ACTIVE:
             raise ValidationError("Teller session is not ACTIVE.")
-        if session.branch_id != branch.id:
+        if locked.branch_id != branch.id:
             raise ValidationError("Session and branch mismatch.")
 
+        delta = drawer_delta(event_type=event_type, direction=direction, amount=amount)
+
         # Enforce drawer cannot go negative for OUTFLOW
-        if direction == CashDirection.OUTFLOW:
-            expected = compute_expected_drawer_balance(session)
-            if expected - amount < 0:
-                raise ValidationError("Insufficient drawer cash for this OUTFLOW transaction.")
+        if direction == CashDirection.OUTFLOW and locked.drawer_balance + delta < 0:
+            raise ValidationError("Insufficient drawer cash for this OUTFLOW transaction.")
 
-    CashLedgerEntry.objects.create(
+        if delta:
+            locked.drawer_balance += delta
+            locked.save(update_fields=["drawer_balance"])
+        session.drawer_balance = locked.drawer_balance
+
+    return CashLedgerEntry.objects.create(
         branch=branch,
         session=session,
         event_type=event_type,
@@ -126,7 +184,8 @@ def reverse_cash_entry(*, entry: CashLedgerEntry, created_by, reason: str = ""):
     if entry.reverses_entry_id is not None:
         raise ValidationError("This entry is already a reversal entry.")
 
-    if CashLedgerEntry.objects.filter(reverses_entry=entry).exists():
+    # a reversal is always newer than its original entry (partition pruning)
+    if CashLedgerEntry.objects.filter(reverses_entry=entry, created_at__gte=entry.created_at).exists():
         raise ValidationError("This entry has already been reversed.")
 
     opposite = CashDirection.INFLOW if entry.direction == CashDirection.OUTFLOW else CashDirection.OUTFLOW
@@ -165,6 +224,7 @@ def confirm_session_opening(*, session: TellerSession, cashier, counted_amount:
         )
 
     session.confirmed_opening_amount = counted_amount
+    session.drawer_balance = counted_amount
     session.confirmed_at = timezone.now()
     session.confirmed_by = cashier
     session.opened_at = timezone.now()
@@ -196,9 +256,15 @@ def close_session(*, session: TellerSession, cashier, counted_closing_amount: De
     if counted_closing_amount < 0:
         raise ValidationError("Counted closing amount cannot be negative.")
 
+    # no cash may be posted to the drawer while it is being closed
+    locked = lock_session(session)
+    if locked.status != TellerSessionStatus.ACTIVE:
+        raise ValidationError("Only ACTIVE sessions can be closed.")
+
     expected = compute_expected_drawer_balance(session)
     variance = counted_closing_amount - expected
 
+    session.drawer_balance = locked.drawer_balance
     session.counted_closing_amount = counted_closing_amount
     session.expected_closing_amount = expected
     session.variance_amount = variance
@@ -209,4 +275,169 @@ def close_session(*, session: TellerSession, cashier, counted_closing_amount: De
     session.save()
 
     # Note: we do NOT automatically move drawer back to vault unless you want that.
-    # If your business requires end-of-day return to vault, you can post DRAWER_TO_VAULT here.
\ No newline at end of file
+    # If your business requires end-of-day return to vault, you can post DRAWER_TO_VAULT here.
+
+
+def expected_drawer_balances(sessions) -> dict:
+    """
+    compute_expected_drawer_balance for many sessions with one grouped query.
+    Returns {session_id: expected}.
+    """
+    sessions = list(sessions)
+    if not sessions:
+        return {}
+
+    counted = ~Q(event_type=CashEventType.REVERSAL)
+    qs = CashLedgerEntry.objects.filter(session_id__in=[s.id for s in sessions])
+    oldest = min((s.allocated_at for s in sessions if s.allocated_at is not None), default=None)
+    if oldest is not None:
+        qs = qs.filter(created_at__gte=oldest)
+    totals = {
+        row["session_id"]: row
+        for row in qs.values("session_id").annotate(
+            inflows=Sum(
+                "amount",
+                filter=counted & Q(direction=CashDirection.INFLOW) & ~Q(event_type=CashEventType.VAULT_TO_DRAWER),
+            ),
+            outflows=Sum("amount", filter=counted & Q(direction=CashDirection.OUTFLOW)),
+        )
+    }
+
+    result = {}
+    for s in sessions:
+        row = totals.get(s.id, {})
+        opening = s.confirmed_opening_amount if s.confirmed_opening_amount is not None else Decimal("0.00")
+        result[s.id] = opening + (row.get("inflows") or Decimal("0.00")) - (row.get("outflows") or Decimal("0.00"))
+    return result
+
+
+def vault_position(branch) -> dict:
+    """
+    Net vault cash movement for a branch as recorded in the ledger:
+    drawer returns minus allocations out to drawers.
+    """
+    totals = CashLedgerEntry.objects.filter(
+        branch=branch,
+        event_type__in=[CashEventType.VAULT_TO_DRAWER, CashEventType.DRAWER_TO_VAULT],
+    ).aggregate(
+        allocated=Sum("amount", filter=Q(event_type=CashEventType.VAULT_TO_DRAWER)),
+        returned=Sum("amount", filter=Q(event_type=CashEventType.DRAWER_TO_VAULT)),
+    )
+    allocated = totals["allocated"] or Decimal("0.00")
+    returned = totals["returned"] or Decimal("0.00")
+    return {
+        "allocated_to_drawers": allocated,
+        "returned_to_vault": returned,
+        "net_position": returned - allocated,
+    }
+
+
+# DRAWER_TO_VAULT entries with this reference are end-of-day close-out returns
+# (see close_branch_sessions); reports leave them out of the day's expected cash.
+CLOSE_OUT_REFERENCE_TYPE = "teller_session"
+
+
+@transaction.atomic
+def close_branch_sessions(*, branch, closed_by, counts, return_to_vault: bool = True):
+    """
+    End-of-day close-out of every ACTIVE session in a branch.
+
+    `counts` maps session id -> (counted_closing_amount, variance_note) and
+    must cover every ACTIVE session. All drawers are locked, expected
+    balances come from one grouped ledger query, sessions are closed with a
+    single bulk_update and (optionally) each counted amount is returned to
+    the vault with one bulk_create of DRAWER_TO_VAULT entries.
+    All-or-nothing.
+
+    Returns (closed_sessions, summary).
+    """
+    _set_lock_timeout()
+    try:
+        sessions = list(
+            TellerSession.objects.select_for_update()
+            .select_related("cashier")
+            .filter(branch=branch, status=TellerSessionStatus.ACTIVE)
+            .order_by("id")
+        )
+    except OperationalError:
+        raise ValidationError("A teller drawer is busy with another transaction. Please retry.")
+
+    if not sessions:
+        raise ValidationError("No ACTIVE sessions to close in this branch.")
+
+    active_ids = {s.id for s in sessions}
+    missing = sorted(active_ids - set(counts))
+    if missing:
+        raise ValidationError(
+            "Counted amounts are required for every ACTIVE session (missing: "
+            + ", ".join(f"#{i}" for i in missing) + ")."
+        )
+    unknown = sorted(set(counts) - active_ids)
+    if unknown:
+        raise ValidationError(
+            "Not ACTIVE sessions of this branch: " + ", ".join(f"#{i}" for i in unknown) + "."
+        )
+    for session_id, (counted, _note) in counts.items():
+        if counted < 0:
+            raise ValidationError(f"Counted closing amount cannot be negative (session #{session_id}).")
+
+    expected = expected_drawer_balances(sessions)
+    now = timezone.now()
+    returns = []
+    for s in sessions:
+        counted, note = counts[s.id]
+        s.expected_closing_amount = expected[s.id]
+        s.counted_closing_amount = counted
+        s.variance_amount = counted - expected[s.id]
+        s.variance_note = note or ""
+        s.closed_at = now
+        s.closed_by = closed_by
+        s.status = TellerSessionStatus.CLOSED
+        if return_to_vault and counted > 0:
+            # same accounting as post_cash_entry; the drawer is emptied into the vault
+            s.drawer_balance += drawer_delta(
+                event_type=CashEventType.DRAWER_TO_VAULT, direction=CashDirection.OUTFLOW, amount=counted
+            )
+            returns.append(CashLedgerEntry(
+                branch=branch,
+                session=s,
+                event_type=CashEventType.DRAWER_TO_VAULT,
+                direction=CashDirection.OUTFLOW,
+                amount=counted,
+                created_by=closed_by,
+                reference_type=CLOSE_OUT_REFERENCE_TYPE,
+                reference_id=str(s.id),
+                narration="End-of-day close-out (drawer returned to vault).",
+            ))
+
+    TellerSession.objects.bulk_update(
+        sessions,
+        [
+            "expected_closing_amount",
+            "counted_closing_amount",
+            "variance_amount",
+            "variance_note",
+            "closed_at",
+            "closed_by",
+            "status",
+            "drawer_balance",
+        ],
+    )
+    if returns:
+        CashLedgerEntry.objects.bulk_create(returns)
+    # bulk_update / bulk_create skip post_save
+    cash_activity.send(
+        sender=TellerSession,
+        branch_id=branch.id,
+        days={timezone.localdate()} | {timezone.localtime(s.allocated_at).date() for s in sessions},
+    )
+
+    summary = {
+        "sessions_closed": len(sessions),
+        "total_expected": sum((s.expected_closing_amount for s in sessions), Decimal("0.00")),
+        "total_counted": sum((s.counted_closing_amount for s in sessions), Decimal("0.00")),
+        "total_variance": sum((s.variance_amount for s in sessions), Decimal("0.00")),
+        "returned_at_close": sum((e.amount for e in returns), Decimal("0.00")),
+        "vault": vault_position(branch),
+    }
+    return sessions, summary
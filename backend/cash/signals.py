@@ -0,0 +1,6 @@
+from django.dispatch import Signal
+
+
+# Sent by cash.services after bulk writes (bulk_create / bulk_update), which
+# bypass the model save signals. Kwargs: branch_id, days (iterable of dates).
+cash_activity = Signal()
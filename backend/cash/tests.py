@@ -1,6 +1,6 @@
 from decimal import Decimal
 
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
 from django.core.exceptions import ValidationError
 
 from accounts.models import Branch, User
@@ -123,3 +123,316 @@ class TellerSessionServiceTests(TestCase):
         close_session(session=session, cashier=self.cashier, counted_closing_amount=Decimal("600.00"))
         session.refresh_from_db()
         self.assertEqual(session.expected_closing_amount, Decimal("600.00"))
+
+
+class CashLedgerArchiveCommandTests(TestCase):
+    def setUp(self):
+        self.branch = Branch.objects.create(
+            name="Main", code="MAIN", region="East", phone="123", address="Addr"
+        )
+        self.manager = User.objects.create_user(
+            username="mgr", email="mgr@example.com", password="x", role="BRANCH_MANAGER", branch=self.branch
+        )
+        self.cashier = User.objects.create_user(
+            username="cash", email="cash@example.com", password="x", role="CASHIER", branch=self.branch
+        )
+
+    def _session_with_entry(self, when, reviewed=True):
+        from django.utils import timezone
+
+        session = TellerSession.objects.create(
+            branch=self.branch,
+            cashier=self.cashier,
+            status=TellerSessionStatus.CLOSED,
+            opening_amount=Decimal("100.00"),
+            counted_closing_amount=Decimal("100.00"),
+            expected_closing_amount=Decimal("100.00"),
+            reviewed_at=timezone.now() if reviewed else None,
+        )
+        entry = CashLedgerEntry.objects.create(
+            branch=self.branch,
+            session=session,
+            event_type=CashEventType.SAVINGS_DEPOSIT_CASH,
+            direction=CashDirection.INFLOW,
+            amount=Decimal("10.00"),
+        )
+        # created_at is auto_now_add; backdate through a queryset update
+        CashLedgerEntry.objects.filter(pk=entry.pk).update(created_at=when)
+        return session
+
+    def test_archives_reviewed_month_to_jsonl_and_skips_unreviewed(self):
+        import gzip
+        import json
+        import tempfile
+        from datetime import datetime
+        from io import StringIO
+
+        from django.core.management import call_command
+        from django.utils import timezone
+
+        reviewed_when = timezone.make_aware(datetime(2020, 1, 15, 10, 0))
+        pending_when = timezone.make_aware(datetime(2020, 2, 15, 10, 0))
+        self._session_with_entry(reviewed_when, reviewed=True)
+        self._session_with_entry(pending_when, reviewed=False)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            out = StringIO()
+            call_command("archive_cash_ledger", "--before", "2020-03", "--output-dir", tmp, stdout=out)
+
+            with gzip.open(f"{tmp}/cash_ledger_202001.jsonl.gz", "rt") as fh:
+                rows = [json.loads(line) for line in fh]
+
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["amount"], "10.00")
+        self.assertIn("2020-02: skipped", out.getvalue())
+        # January rows left the hot table; February is still there
+        self.assertEqual(CashLedgerEntry.objects.filter(created_at__lt=pending_when).count(), 0)
+        self.assertEqual(CashLedgerEntry.objects.filter(created_at=pending_when).count(), 1)
+
+
+@skipUnlessDBFeature("has_select_for_update")
+class ConcurrentDrawerOutflowTests(TransactionTestCase):
+    """
+    Hammer one ACTIVE session with parallel OUTFLOWs from several threads
+    (each thread has its own DB connection). The row lock in post_cash_entry
+    must keep the drawer from going negative.
+    """
+
+    def setUp(self):
+        self.branch = Branch.objects.create(
+            name="Main", code="MAIN", region="East", phone="123", address="Addr"
+        )
+        self.manager = User.objects.create_user(
+            username="mgr", email="mgr@example.com", password="x", role="BRANCH_MANAGER", branch=self.branch
+        )
+        self.cashier = User.objects.create_user(
+            username="cash", email="cash@example.com", password="x", role="CASHIER", branch=self.branch
+        )
+        self.session = TellerSession.objects.create(
+            branch=self.branch,
+            cashier=self.cashier,
+            status=TellerSessionStatus.ALLOCATED,
+            opening_amount=Decimal("100.00"),
+            allocated_by=self.manager,
+        )
+        confirm_session_opening(session=self.session, cashier=self.cashier, counted_amount=Decimal("100.00"))
+
+    def test_parallel_outflows_never_overdraw_drawer(self):
+        import threading
+        from django.db import connection
+
+        workers = 20
+        barrier = threading.Barrier(workers)
+        results = []
+        lock = threading.Lock()
+
+        def withdraw():
+            try:
+                session = TellerSession.objects.get(pk=self.session.pk)
+                barrier.wait()
+                try:
+                    post_cash_entry(
+                        branch=self.branch,
+                        session=session,
+                        event_type=CashEventType.SAVINGS_WITHDRAWAL_CASH,
+                        direction=CashDirection.OUTFLOW,
+                        amount=Decimal("10.00"),
+                        created_by=self.cashier,
+                    )
+                    outcome = "ok"
+                except ValidationError:
+                    outcome = "rejected"
+                with lock:
+                    results.append(outcome)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=withdraw) for _ in range(workers)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(results.count("ok"), 10)
+        self.assertEqual(results.count("rejected"), 10)
+
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.drawer_balance, Decimal("0.00"))
+        self.assertEqual(compute_expected_drawer_balance(self.session), Decimal("0.00"))
+
+
+class CashHookContextTests(TestCase):
+    def setUp(self):
+        self.branch = Branch.objects.create(
+            name="Main", code="MAIN", region="East", phone="123", address="Addr"
+        )
+        self.manager = User.objects.create_user(
+            username="mgr", email="mgr@example.com", password="x", role="BRANCH_MANAGER", branch=self.branch
+        )
+        self.cashier = User.objects.create_user(
+            username="cash", email="cash@example.com", password="x", role="CASHIER", branch=self.branch
+        )
+        self.session = TellerSession.objects.create(
+            branch=self.branch,
+            cashier=self.cashier,
+            status=TellerSessionStatus.ALLOCATED,
+            opening_amount=Decimal("100.00"),
+            allocated_by=self.manager,
+        )
+        confirm_session_opening(session=self.session, cashier=self.cashier, counted_amount=Decimal("100.00"))
+
+    def test_session_resolved_once_per_request_user(self):
+        from unittest import mock
+        from . import hooks
+
+        with mock.patch.object(
+            hooks, "get_active_session_for_cashier", wraps=hooks.get_active_session_for_cashier
+        ) as lookup:
+            hooks.record_cash_savings_deposit(request_user=self.cashier, amount=Decimal("50.00"), savings_tx_id=1)
+            hooks.record_cash_savings_withdrawal(request_user=self.cashier, amount=Decimal("30.00"), savings_tx_id=2)
+            hooks.record_cash_loan_repayment(request_user=self.cashier, amount=Decimal("5.00"), repayment_tx_id=3)
+
+        self.assertEqual(lookup.call_count, 1)
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.drawer_balance, Decimal("125.00"))
+        self.assertEqual(compute_expected_drawer_balance(self.session), Decimal("125.00"))
+
+
+class BranchCloseOutTests(TestCase):
+    def setUp(self):
+        self.branch = Branch.objects.create(
+            name="Main", code="MAIN", region="East", phone="123", address="Addr"
+        )
+        self.manager = User.objects.create_user(
+            username="mgr", email="mgr@example.com", password="x", role="BRANCH_MANAGER", branch=self.branch
+        )
+        self.sessions = []
+        for i, opening in enumerate([Decimal("100.00"), Decimal("200.00")]):
+            cashier = User.objects.create_user(
+                username=f"cash{i}", email=f"cash{i}@example.com", password="x", role="CASHIER", branch=self.branch
+            )
+            session = TellerSession.objects.create(
+                branch=self.branch,
+                cashier=cashier,
+                status=TellerSessionStatus.ALLOCATED,
+                opening_amount=opening,
+                allocated_by=self.manager,
+            )
+            confirm_session_opening(session=session, cashier=cashier, counted_amount=opening)
+            self.sessions.append(session)
+        post_cash_entry(
+            branch=self.branch,
+            session=self.sessions[0],
+            event_type=CashEventType.SAVINGS_DEPOSIT_CASH,
+            direction=CashDirection.INFLOW,
+            amount=Decimal("40.00"),
+            created_by=self.sessions[0].cashier,
+        )
+
+    def test_requires_every_active_session(self):
+        from .services import close_branch_sessions
+
+        with self.assertRaises(ValidationError):
+            close_branch_sessions(
+                branch=self.branch,
+                closed_by=self.manager,
+                counts={self.sessions[0].id: (Decimal("140.00"), "")},
+            )
+        self.assertEqual(TellerSession.objects.filter(status=TellerSessionStatus.ACTIVE).count(), 2)
+
+    def test_closes_all_sessions_and_returns_cash_to_vault(self):
+        from .services import close_branch_sessions
+
+        a, b = self.sessions
+        expected = {a.id: compute_expected_drawer_balance(a), b.id: compute_expected_drawer_balance(b)}
+        closed, summary = close_branch_sessions(
+            branch=self.branch,
+            closed_by=self.manager,
+            counts={a.id: (Decimal("140.00"), ""), b.id: (Decimal("195.00"), "short 5")},
+        )
+
+        self.assertEqual(summary["sessions_closed"], 2)
+        for s in TellerSession.objects.filter(id__in=[a.id, b.id]):
+            self.assertEqual(s.status, TellerSessionStatus.CLOSED)
+            self.assertEqual(s.expected_closing_amount, expected[s.id])
+        b.refresh_from_db()
+        self.assertEqual(b.variance_amount, Decimal("-5.00"))
+
+        returns = CashLedgerEntry.objects.filter(event_type=CashEventType.DRAWER_TO_VAULT)
+        self.assertEqual(returns.count(), 2)
+        self.assertEqual(summary["returned_at_close"], Decimal("335.00"))
+        self.assertEqual(summary["total_variance"], Decimal("-5.00"))
+        # allocated 300 out of the vault, 335 came back
+        self.assertEqual(summary["vault"]["net_position"], Decimal("35.00"))
+
+
+class CashLedgerExportTests(TestCase):
+    def setUp(self):
+        self.branch = Branch.objects.create(
+            name="Main", code="MAIN", region="East", phone="123", address="Addr"
+        )
+        self.manager = User.objects.create_user(
+            username="mgr", email="mgr@example.com", password="x", role="BRANCH_MANAGER", branch=self.branch
+        )
+        self.cashier = User.objects.create_user(
+            username="cash", email="cash@example.com", password="x", role="CASHIER", branch=self.branch
+        )
+        session = TellerSession.objects.create(
+            branch=self.branch,
+            cashier=self.cashier,
+            status=TellerSessionStatus.ALLOCATED,
+            opening_amount=Decimal("100.00"),
+            allocated_by=self.manager,
+        )
+        confirm_session_opening(session=session, cashier=self.cashier, counted_amount=Decimal("100.00"))
+
+    def test_export_streams_csv(self):
+        import csv
+        import io
+        from rest_framework.test import APIClient
+
+        client = APIClient()
+        client.force_authenticate(self.manager)
+        resp = client.get("/api/cash/ledger/export/")
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.streaming)
+        rows = list(csv.reader(io.StringIO(b"".join(resp.streaming_content).decode("utf-8"))))
+        self.assertEqual(rows[0][:3], ["id", "created_at", "branch_id"])
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[1][rows[0].index("created_by")], "cash")
+
+    def test_export_neutralises_formulas_in_text(self):
+        import csv
+        import io
+        from openpyxl import load_workbook
+        from rest_framework.test import APIClient
+
+        CashLedgerEntry.objects.update(narration="=HYPERLINK(\"http://evil\")")
+        client = APIClient()
+        client.force_authenticate(self.manager)
+
+        resp = client.get("/api/cash/ledger/export/")
+        rows = list(csv.reader(io.StringIO(b"".join(resp.streaming_content).decode("utf-8"))))
+        self.assertEqual(rows[1][rows[0].index("narration")], "'=HYPERLINK(\"http://evil\")")
+
+        resp = client.get("/api/cash/ledger/export/", {"file_format": "xlsx"})
+        sheet = load_workbook(io.BytesIO(b"".join(resp.streaming_content))).active
+        header = [c.value for c in sheet[1]]
+        self.assertEqual(sheet.cell(row=2, column=header.index("narration") + 1).value, "'=HYPERLINK(\"http://evil\")")
+
+    def test_date_filters_are_validated_and_date_to_is_inclusive(self):
+        from django.utils import timezone
+        from rest_framework.test import APIClient
+
+        client = APIClient()
+        client.force_authenticate(self.manager)
+        today = timezone.localdate().isoformat()
+        resp = client.get("/api/cash/ledger/export/", {"date_from": today, "date_to": today})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(b"".join(resp.streaming_content).decode("utf-8").splitlines()), 2)
+
+        for params in ({"date_from": "2026-13-01"}, {"date_to": "yesterday"}):
+            resp = client.get("/api/cash/ledger/", params)
+            self.assertEqual(resp.status_code, 400)
+            self.assertIn("detail", resp.data)
+            self.assertEqual(client.get("/api/cash/ledger/export/", params).status_code, 400)
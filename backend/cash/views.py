@@ -1,13 +1,16 @@
+from datetime import datetime, timedelta
 from decimal import Decimal
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.core.exceptions import ValidationError
 from django.contrib.auth import get_user_model
 
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ParseError
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 
-from accounts.models import Branch
 from .models import BranchVault, TellerSession, CashLedgerEntry, TellerSessionStatus
 from .serializers import (
     BranchVaultSerializer,
@@ -16,6 +19,7 @@ from .serializers import (
     TellerSessionConfirmSerializer,
     TellerSessionCloseSerializer,
     TellerSessionReviewSerializer,
+    BranchCloseOutSerializer,
     CashLedgerEntrySerializer,
 )
 from .permissions import IsBranchManager, IsCashier, IsCashierOrBranchManager
@@ -23,10 +27,13 @@ from .services import (
     get_active_session_for_cashier,
     confirm_session_opening,
     close_session,
+    close_branch_sessions,
     compute_expected_drawer_balance,
     reverse_cash_entry,
 )
 
+from reports.exports import export_response, iter_rows
+
 # audit utility from accounts
 from accounts.utils import create_audit_log
 
@@ -73,6 +80,7 @@ class TellerSessionViewSet(viewsets.ModelViewSet):
       - confirm_opening (cashier)
       - close (cashier)
       - review (branch manager)
+      - close_out (branch manager, end of day for all ACTIVE sessions)
     """
     permission_classes = [IsAuthenticated, IsCashierOrBranchManager]
     serializer_class = TellerSessionSerializer
@@ -142,7 +150,7 @@ class TellerSessionViewSet(viewsets.ModelViewSet):
         if not branch_id:
             return Response({"detail": "User must belong to a branch."}, status=400)
 
-        session = get_active_session_for_cashier(branch=Branch.objects.get(id=branch_id), cashier=request.user)
+        session = get_active_session_for_cashier(branch=branch_id, cashier=request.user)
         if not session:
             return Response({"detail": "No active session."}, status=404)
 
@@ -188,6 +196,73 @@ class TellerSessionViewSet(viewsets.ModelViewSet):
 
         return Response(TellerSessionSerializer(session).data)
 
+    @action(detail=False, methods=["post"], permission_classes=[IsAuthenticated, IsBranchManager])
+    def close_out(self, request):
+        """
+        End-of-day close-out: closes every ACTIVE session of the manager's
+        branch in one transaction and returns the drawers to the vault.
+        Body: {"sessions": [{"session_id", "counted_closing_amount", "variance_note"}, ...],
+               "return_to_vault": true}
+        """
+        branch_id = getattr(request.user, "branch_id", None)
+        if not branch_id:
+            return Response({"detail": "Manager must belong to a branch."}, status=400)
+
+        serializer = BranchCloseOutSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        counts = {
+            item["session_id"]: (item["counted_closing_amount"], item.get("variance_note", ""))
+            for item in serializer.validated_data["sessions"]
+        }
+
+        try:
+            sessions, summary = close_branch_sessions(
+                branch=request.user.branch,
+                closed_by=request.user,
+                counts=counts,
+                return_to_vault=serializer.validated_data["return_to_vault"],
+            )
+        except ValidationError as e:
+            return Response({"detail": e.messages[0] if e.messages else str(e)}, status=400)
+
+        # audit: one row per closed session plus the close-out itself
+        # (buffered by accounts.audit into a single INSERT)
+        ip = get_client_ip(request)
+        for s in sessions:
+            create_audit_log(
+                actor=request.user,
+                action='SESSION_CLOSED',
+                target_type='TellerSession',
+                target_id=s.id,
+                summary=(
+                    f"Closed session #{s.id} at branch close-out: expected {s.expected_closing_amount} "
+                    f"counted {s.counted_closing_amount} variance {s.variance_amount}"
+                ),
+                ip_address=ip,
+            )
+        create_audit_log(
+            actor=request.user,
+            action='BRANCH_CLOSE_OUT',
+            target_type='Branch',
+            target_id=branch_id,
+            summary=(
+                f"Closed {summary['sessions_closed']} session(s): counted {summary['total_counted']} "
+                f"variance {summary['total_variance']} returned {summary['returned_at_close']}"
+            ),
+            ip_address=ip,
+        )
+
+        vault = summary["vault"]
+        return Response({
+            "sessions": TellerSessionSerializer(sessions, many=True).data,
+            "sessions_closed": summary["sessions_closed"],
+            "total_expected": str(summary["total_expected"]),
+            "total_counted": str(summary["total_counted"]),
+            "total_variance": str(summary["total_variance"]),
+            "returned_at_close": str(summary["returned_at_close"]),
+            "vault": {k: str(v) for k, v in vault.items()},
+        })
+
     @action(detail=True, methods=["post"], permission_classes=[IsAuthenticated, IsBranchManager])
     def review(self, request, pk=None):
         session = self.get_object()
@@ -197,7 +272,8 @@ class TellerSessionViewSet(viewsets.ModelViewSet):
         session.reviewed_at = timezone.now()
         session.reviewed_by = request.user
         session.review_note = serializer.validated_data.get("review_note", "")
-        session.save()
+        # update_fields: never overwrite drawer_balance maintained by cash posting
+        session.save(update_fields=["reviewed_at", "reviewed_by", "review_note"])
 
         return Response(TellerSessionSerializer(session).data)
 
@@ -230,11 +306,81 @@ class CashLedgerViewSet(viewsets.ReadOnlyModelViewSet):
         if ref_type and ref_id:
             qs = qs.filter(reference_type=ref_type, reference_id=ref_id)
 
+        # created_at bounds let PostgreSQL prune the monthly ledger partitions;
+        # date_to is inclusive, so a plain date covers that whole business day
+        date_from = self._parse_bound("date_from")
+        date_to = self._parse_bound("date_to", end=True)
+        if date_from:
+            qs = qs.filter(created_at__gte=date_from)
+        if date_to:
+            qs = qs.filter(created_at__lt=date_to)
+
         return qs.order_by("-created_at")
 
+    def _parse_bound(self, name, end=False):
+        """
+        ?date_from / ?date_to as an aware datetime: YYYY-MM-DD (start of that
+        day, or of the next one for end=True) or an ISO datetime. 400 if malformed.
+        """
+        value = self.request.query_params.get(name)
+        if not value:
+            return None
+        try:
+            day = parse_date(value)
+            moment = None if day else parse_datetime(value)
+        except ValueError:
+            day = moment = None
+        if day:
+            if end:
+                day += timedelta(days=1)
+            return timezone.make_aware(datetime(day.year, day.month, day.day))
+        if moment is None:
+            raise ParseError(f"{name} must be a date (YYYY-MM-DD) or an ISO datetime.")
+        if timezone.is_naive(moment):
+            moment = timezone.make_aware(moment)
+        # an exact end time stays inclusive
+        return moment + timedelta(microseconds=1) if end else moment
+
     @action(detail=True, methods=["post"], permission_classes=[IsAuthenticated, IsBranchManager])
     def reverse(self, request, pk=None):
         entry = self.get_object()
         reason = request.data.get("reason", "")
         reverse_cash_entry(entry=entry, created_by=request.user, reason=reason)
-        return Response({"detail": "Reversal posted."}, status=200)
\ No newline at end of file
+        return Response({"detail": "Reversal posted."}, status=200)
+
+    @action(detail=False, methods=["get"])
+    def export(self, request):
+        """
+        Stream the (filtered) ledger as CSV, or XLSX with ?file_format=xlsx.
+        Accepts the same filters as the list endpoint.
+        """
+        fields = [
+            "id",
+            "created_at",
+            "branch_id",
+            "session_id",
+            "event_type",
+            "direction",
+            "amount",
+            "narration",
+            "reference_type",
+            "reference_id",
+            "created_by__username",
+            "reverses_entry_id",
+        ]
+        header = [
+            "id",
+            "created_at",
+            "branch_id",
+            "session_id",
+            "event_type",
+            "direction",
+            "amount",
+            "narration",
+            "reference_type",
+            "reference_id",
+            "created_by",
+            "reverses_entry_id",
+        ]
+        qs = self.get_queryset().order_by("created_at", "id")
+        return export_response(request, "cash_ledger", header, iter_rows(qs, fields))
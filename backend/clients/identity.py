@@ -0,0 +1,113 @@
+"""
+Duplicate-client detection on normalized identity keys.
+
+Client.save() derives one key per identifying field:
+  phone_key               E.164 ("+2376..."), national numbers get
+                          CLIENT_PHONE_COUNTRY_CODE
+  national_id_normalized  upper-case letters and digits (see clients.search)
+  email_key               trimmed, lower-cased
+
+Each key has a plain B-tree index, so a duplicate check is an equality
+lookup per key (a BitmapOr on PostgreSQL) instead of the iexact scans over
+the raw columns. find_duplicates() checks many candidate rows, such as an
+import file, with a single query.
+"""
+from django.conf import settings
+from django.db.models import Q
+
+from .search import normalize_national_id, normalize_phone
+
+
+def phone_key(value) -> str:
+    raw = (value or "").strip()
+    digits = normalize_phone(raw)
+    if not digits:
+        return ""
+    if raw.startswith("+"):
+        return f"+{digits}"
+    if digits.startswith("00"):
+        return f"+{digits[2:]}"
+    country_code = str(getattr(settings, "CLIENT_PHONE_COUNTRY_CODE", "237"))
+    national_digits = int(getattr(settings, "CLIENT_PHONE_NATIONAL_DIGITS", 9))
+    if digits.startswith(country_code) and len(digits) > national_digits:
+        return f"+{digits}"
+    return f"+{country_code}{digits.lstrip('0')}"
+
+
+def email_key(value) -> str:
+    return (value or "").strip().lower()
+
+
+def identity_keys(national_id=None, phone=None, email=None) -> dict:
+    """{field: key} for the non-empty identity keys of one candidate client."""
+    keys = {
+        "national_id_normalized": normalize_national_id(national_id),
+        "phone_key": phone_key(phone),
+        "email_key": email_key(email),
+    }
+    return {field: key for field, key in keys.items() if key}
+
+
+def _keys_condition(keys_by_field):
+    condition = Q()
+    for field, keys in keys_by_field.items():
+        if keys:
+            condition |= Q(**{f"{field}__in": sorted(keys)})
+    return condition
+
+
+def find_duplicate(*, national_id=None, phone=None, email=None, exclude_pk=None):
+    """The first existing client sharing any identity key, or None."""
+    keys = identity_keys(national_id, phone, email)
+    if not keys:
+        return None
+    from .models import Client
+
+    qs = Client.objects.filter(_keys_condition({field: [key] for field, key in keys.items()}))
+    if exclude_pk is not None:
+        qs = qs.exclude(pk=exclude_pk)
+    return qs.only("id", "client_number", "full_name").first()
+
+
+def find_duplicates(rows, seen=None):
+    """
+    Check a batch of candidate rows (dicts with national_id / phone / email,
+    optionally "row" for the reported row number) in one query. Returns
+    {row index: reason} for every row that matches an existing client, or an
+    earlier row. Pass the same `seen` dict across calls to also catch
+    repeats between batches of one file.
+    """
+    from .models import Client
+
+    row_keys = [identity_keys(r.get("national_id"), r.get("phone"), r.get("email")) for r in rows]
+    wanted = {}
+    for keys in row_keys:
+        for field, key in keys.items():
+            wanted.setdefault(field, set()).add(key)
+    condition = _keys_condition(wanted)
+
+    existing = {}
+    if condition:
+        fields = list(wanted)
+        for match in Client.objects.filter(condition).values("id", *fields):
+            for field in fields:
+                if match[field]:
+                    existing.setdefault((field, match[field]), match["id"])
+
+    duplicates = {}
+    seen = {} if seen is None else seen
+    for index, keys in enumerate(row_keys):
+        for field, key in keys.items():
+            if (field, key) in existing:
+                duplicates[index] = f"matches client {existing[(field, key)]} on {_label(field)}"
+                break
+            if (field, key) in seen:
+                duplicates[index] = f"same {_label(field)} as row {seen[(field, key)]}"
+                break
+        for field, key in keys.items():
+            seen.setdefault((field, key), rows[index].get("row", index + 1))
+    return duplicates
+
+
+def _label(field):
+    return {"national_id_normalized": "national ID", "phone_key": "phone", "email_key": "email"}[field]
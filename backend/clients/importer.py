@@ -0,0 +1,197 @@
+"""
+Bulk client import from CSV or XLSX (POST /clients/import/ and
+`manage.py import_clients`).
+
+The file is read row by row (csv.reader / openpyxl read-only mode), so
+memory stays flat whatever its size. Rows are handled in chunks of
+CLIENT_IMPORT_CHUNK_SIZE; each chunk costs one duplicate-check query
+(clients.identity.find_duplicates), one bulk_create of the new clients and
+one bulk write of their CLIENT_CREATED audit rows, inside its own
+transaction. A bad row never stops the import: it is skipped and listed in
+the report with its file row number (the header is row 1). Blank rows
+are ignored.
+"""
+import csv
+import io
+import os
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.audit import write_batch
+from accounts.models import AuditLog
+from .identity import find_duplicates
+from .models import Client
+
+
+IMPORT_COLUMNS = ["full_name", "national_id", "phone", "email", "address"]
+IMPORT_FORMATS = (".csv", ".xlsx")
+
+
+def _column(name):
+    return "_".join(str(name or "").strip().lower().split())
+
+
+def _cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        # spreadsheet numbers: phones / ids typed as numbers
+        value = int(value)
+    return str(value).strip()
+
+
+def _check_header(header):
+    columns = [_column(h) for h in header]
+    if "full_name" not in columns:
+        raise ValidationError("The file must have a full_name column.")
+    return columns
+
+
+def iter_csv_rows(binary_file):
+    text = io.TextIOWrapper(binary_file, encoding="utf-8-sig", newline="")
+    try:
+        reader = csv.reader(text)
+        header = next(reader, None)
+        if header is None:
+            raise ValidationError("The file is empty.")
+        columns = _check_header(header)
+        for values in reader:
+            yield dict(zip(columns, (_cell(v) for v in values)))
+    finally:
+        # leave the caller's file open
+        text.detach()
+
+
+def iter_xlsx_rows(binary_file):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ValidationError("XLSX import requires openpyxl to be installed.")
+
+    wb = load_workbook(binary_file, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            raise ValidationError("The file is empty.")
+        columns = _check_header(header)
+        for values in rows:
+            yield dict(zip(columns, (_cell(v) for v in values)))
+    finally:
+        wb.close()
+
+
+def iter_rows(binary_file, filename):
+    ext = os.path.splitext(filename or "")[1].lower()
+    if ext == ".csv":
+        return iter_csv_rows(binary_file)
+    if ext == ".xlsx":
+        return iter_xlsx_rows(binary_file)
+    raise ValidationError(f"Unsupported file type; use one of: {', '.join(IMPORT_FORMATS)}.")
+
+
+def _row_errors(row):
+    errors = []
+    if not row["full_name"]:
+        errors.append("full_name is required.")
+    for field in ("full_name", "national_id", "phone", "email"):
+        limit = Client._meta.get_field(field).max_length
+        if len(row[field]) > limit:
+            errors.append(f"{field} is longer than {limit} characters.")
+    if row["email"]:
+        try:
+            validate_email(row["email"])
+        except ValidationError:
+            errors.append("email is not a valid email address.")
+    return errors
+
+
+def import_clients(rows, *, branch, actor=None, ip_address=None, dry_run=False, chunk_size=None):
+    """
+    Create clients in `branch` from `rows` (dicts keyed by IMPORT_COLUMNS).
+    Returns {"total", "created", "failed", "errors": [{"row", "errors"}]}.
+    With dry_run nothing is written; the report shows what would fail.
+    """
+    chunk_size = chunk_size or int(getattr(settings, "CLIENT_IMPORT_CHUNK_SIZE", 1000))
+    created_by = actor if getattr(actor, "pk", None) else None
+    report = {"total": 0, "created": 0, "failed": 0, "errors": []}
+    seen = {}
+
+    def flush(chunk):
+        duplicates = find_duplicates(chunk, seen=seen)
+        accepted = []
+        for index, row in enumerate(chunk):
+            if index in duplicates:
+                report["errors"].append({"row": row["row"], "errors": [f"Duplicate client: {duplicates[index]}."]})
+            else:
+                accepted.append(row)
+        report["failed"] += len(chunk) - len(accepted)
+        if dry_run or not accepted:
+            return
+
+        clients = []
+        for row in accepted:
+            client = Client(
+                full_name=row["full_name"],
+                national_id=row["national_id"] or None,
+                phone=row["phone"] or None,
+                email=row["email"] or None,
+                address=row["address"] or None,
+                branch=branch,
+                created_by=created_by,
+            )
+            # bulk_create skips save(), which derives these
+            client.normalize_search_fields()
+            clients.append(client)
+
+        with transaction.atomic():
+            Client.objects.bulk_create(clients, batch_size=500)
+            now = timezone.now()
+            entries = [
+                AuditLog(
+                    actor=created_by,
+                    action="CLIENT_CREATED",
+                    target_type="Client",
+                    target_id=str(client.client_number),
+                    summary=f"Client {client.full_name} created by {actor} (bulk import)",
+                    ip_address=ip_address or None,
+                    created_at=now,
+                )
+                for client in clients
+            ]
+            transaction.on_commit(lambda: write_batch(entries))
+        report["created"] += len(clients)
+
+    chunk = []
+    for number, raw in enumerate(rows, start=2):
+        row = {column: raw.get(column, "") for column in IMPORT_COLUMNS}
+        if not any(row.values()):
+            continue
+        report["total"] += 1
+        row["row"] = number
+        errors = _row_errors(row)
+        if errors:
+            report["failed"] += 1
+            report["errors"].append({"row": number, "errors": errors})
+            continue
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            flush(chunk)
+            chunk = []
+    if chunk:
+        flush(chunk)
+    report["errors"].sort(key=lambda item: item["row"])
+    return report
+
+
+def write_error_report(report, fileobj):
+    """The per-row errors of an import report as CSV (row, error)."""
+    writer = csv.writer(fileobj)
+    writer.writerow(["row", "error"])
+    for item in report["errors"]:
+        for error in item["errors"]:
+            writer.writerow([item["row"], error])
@@ -43,13 +43,9 @@ class Command(BaseCommand):
                 self.stdout.write(f"- KYC={kyc_id} TYPE={doc_type}: keeping id={keep.id}, deleting {len(to_delete)}")
 
                 for d in to_delete:
-                    # delete stored file first (if exists)
-                    try:
-                        if d.file:
-                            d.file.delete(save=False)
-                            total_deleted_files += 1
-                    except Exception:
-                        pass
+                    # the post_delete receiver releases the stored file
+                    if d.file:
+                        total_deleted_files += 1
 
                     d.delete()
                     total_deleted_rows += 1
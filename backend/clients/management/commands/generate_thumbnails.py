@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from clients.models import Client, KYCDocument
+from clients.thumbnails import generate_thumbnails_quietly, has_thumbnails
+
+
+class Command(BaseCommand):
+    help = (
+        "Create missing thumbnails for client and KYC photos (photos stored before "
+        "thumbnails existed, or whose generation failed at upload time)."
+    )
+
+    def handle(self, *args, **options):
+        photos = [
+            client.photo
+            for client in Client.objects.exclude(photo="").only("id", "photo").iterator(chunk_size=500)
+        ] + [
+            document.file
+            for document in KYCDocument.objects.filter(document_type="PHOTO").exclude(file="")
+            .only("id", "file").iterator(chunk_size=500)
+        ]
+
+        created = failed = 0
+        for photo in photos:
+            if has_thumbnails(photo):
+                continue
+            if generate_thumbnails_quietly(photo):
+                created += 1
+            else:
+                failed += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created thumbnails for {created} photo(s); {failed} could not be read."
+        ))
@@ -0,0 +1,59 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import Branch, User
+from clients.importer import import_clients, iter_rows, write_error_report
+
+
+class Command(BaseCommand):
+    help = "Bulk-create clients in a branch from a CSV or XLSX file (see clients.importer)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV or XLSX file with a full_name column")
+        parser.add_argument("--branch", required=True, help="Branch code or id")
+        parser.add_argument("--created-by", help="Username recorded as creator and audit actor")
+        parser.add_argument("--chunk-size", type=int, default=None)
+        parser.add_argument("--dry-run", action="store_true", help="Validate only; create nothing")
+        parser.add_argument("--errors-out", help="Write the per-row error report to this CSV file")
+
+    def handle(self, *args, **options):
+        branch_ref = options["branch"]
+        branch = Branch.objects.filter(code=branch_ref).first()
+        if branch is None and branch_ref.isdigit():
+            branch = Branch.objects.filter(pk=int(branch_ref)).first()
+        if branch is None:
+            raise CommandError(f"Branch {branch_ref!r} not found.")
+
+        actor = None
+        if options["created_by"]:
+            actor = User.objects.filter(username=options["created_by"]).first()
+            if actor is None:
+                raise CommandError(f"User {options['created_by']!r} not found.")
+
+        try:
+            with open(options["path"], "rb") as fh:
+                report = import_clients(
+                    iter_rows(fh, options["path"]),
+                    branch=branch,
+                    actor=actor,
+                    dry_run=options["dry_run"],
+                    chunk_size=options["chunk_size"],
+                )
+        except (OSError, ValidationError) as e:
+            raise CommandError(e.messages[0] if isinstance(e, ValidationError) else str(e))
+
+        if options["errors_out"]:
+            with open(options["errors_out"], "w", newline="", encoding="utf-8") as out:
+                write_error_report(report, out)
+
+        if options["dry_run"]:
+            summary = f"Would create {report['total'] - report['failed']}"
+        else:
+            summary = f"Created {report['created']}"
+        self.stdout.write(
+            self.style.SUCCESS(f"{summary} client(s) from {report['total']} row(s); {report['failed']} failed.")
+        )
+        for item in report["errors"][:20]:
+            self.stdout.write(f"  row {item['row']}: {'; '.join(item['errors'])}")
+        if len(report["errors"]) > 20:
+            self.stdout.write(f"  ... {len(report['errors']) - 20} more (use --errors-out for the full report)")
@@ -0,0 +1,40 @@
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from clients.models import ChunkedUpload
+from clients.uploads import session_dir
+
+
+class Command(BaseCommand):
+    help = "Remove resumable document uploads that were abandoned, with their partial files."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--hours", type=int, default=settings.DOCUMENT_UPLOAD_SESSION_HOURS,
+            help="Remove uploads idle for longer than this (default: DOCUMENT_UPLOAD_SESSION_HOURS)",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options["hours"])
+        removed = 0
+        for upload in ChunkedUpload.objects.filter(updated_at__lt=cutoff).iterator():
+            upload.delete()
+            removed += 1
+
+        # partial files whose session row is gone (e.g. a crash between the two)
+        orphans = 0
+        directory = session_dir()
+        if os.path.isdir(directory):
+            live = {str(pk) for pk in ChunkedUpload.objects.values_list("pk", flat=True)}
+            for filename in os.listdir(directory):
+                stem, ext = os.path.splitext(filename)
+                path = os.path.join(directory, filename)
+                if ext == ".part" and stem not in live and os.path.getmtime(path) < cutoff.timestamp():
+                    os.remove(path)
+                    orphans += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Removed {removed} upload(s) and {orphans} orphaned file(s)."))
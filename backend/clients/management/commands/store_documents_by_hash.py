@@ -0,0 +1,51 @@
+import os
+
+from django.core.files.storage import FileSystemStorage
+from django.core.management.base import BaseCommand
+
+from clients.models import Client, KYCDocument
+from clients.storage import BLOB_PREFIX, document_storage
+from loans.models import LoanDocument
+
+
+class Command(BaseCommand):
+    help = (
+        "Move KYC and loan documents stored under name-based paths into the "
+        "content-addressed document storage (one blob per distinct file)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Only count the documents that would move")
+
+    def handle(self, *args, **options):
+        storage = document_storage()
+        # the pre-existing files live on the same root, under their old names
+        legacy = FileSystemStorage(location=storage.location, base_url=storage.base_url)
+
+        moved = missing = 0
+        for model, field in ((KYCDocument, "file"), (LoanDocument, "document_file")):
+            pending = model.objects.exclude(**{f"{field}__startswith": f"{BLOB_PREFIX}/"}).exclude(**{field: ""})
+            columns = ["id", field, "original_filename"] + (["kyc_id", "document_type"] if model is KYCDocument else [])
+            for doc in pending.only(*columns).iterator(chunk_size=500):
+                old_name = getattr(doc, field).name
+                if not legacy.exists(old_name):
+                    missing += 1
+                    self.stdout.write(self.style.WARNING(f"- {model.__name__} {doc.id}: {old_name} is missing, skipped"))
+                    continue
+                if options["dry_run"]:
+                    moved += 1
+                    continue
+
+                with legacy.open(old_name, "rb") as fh:
+                    new_name = storage.save(old_name, fh)
+                model.objects.filter(pk=doc.pk).update(
+                    **{field: new_name, "original_filename": doc.original_filename or os.path.basename(old_name)[:255]}
+                )
+                if model is KYCDocument and doc.document_type == "PHOTO":
+                    # Client.photo_path mirrors the photo document's file name
+                    Client.objects.filter(kyc__id=doc.kyc_id, photo_path=old_name).update(photo_path=new_name)
+                legacy.delete(old_name)
+                moved += 1
+
+        verb = "Would move" if options["dry_run"] else "Moved"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {moved} document(s); {missing} missing file(s) skipped."))
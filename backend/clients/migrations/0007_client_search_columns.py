@@ -0,0 +1,102 @@
+# Generated by Django 6.0.2 on 2026-10-19 02:10
+"""
+Normalized search columns on Client, backfilled in Python (the same
+normalization as clients.search), plus pg_trgm GIN indexes on PostgreSQL.
+Other vendors only get the columns. Non-atomic so the backfill commits in
+batches and the indexes can be built CONCURRENTLY.
+"""
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+TABLE = "clients_client"
+INDEXES = {
+    "client_name_trgm": "name_normalized",
+    "client_phone_trgm": "phone_normalized",
+    "client_national_id_trgm": "national_id_normalized",
+}
+
+
+def backfill(apps, schema_editor):
+    from clients.search import normalize_name, normalize_national_id, normalize_phone
+
+    Client = apps.get_model("clients", "Client")
+    last_id = 0
+    while True:
+        batch = list(
+            Client.objects.filter(id__gt=last_id).order_by("id").only("id", "full_name", "phone", "national_id")[:2000]
+        )
+        if not batch:
+            break
+        for client in batch:
+            client.name_normalized = normalize_name(client.full_name)
+            client.phone_normalized = normalize_phone(client.phone)
+            client.national_id_normalized = normalize_national_id(client.national_id)
+        Client.objects.bulk_update(batch, ["name_normalized", "phone_normalized", "national_id_normalized"])
+        last_id = batch[-1].id
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for name, column in INDEXES.items():
+            cursor.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {TABLE} USING gin ({column} gin_trgm_ops)"
+            )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for name in INDEXES:
+            cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('clients', '0006_client_photo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='client',
+            name='name_normalized',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='client',
+            name='national_id_normalized',
+            field=models.CharField(blank=True, default='', editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='client',
+            name='phone_normalized',
+            field=models.CharField(blank=True, default='', editable=False, max_length=50),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='client',
+                    index=django.contrib.postgres.indexes.GinIndex(fields=['name_normalized'], name='client_name_trgm', opclasses=['gin_trgm_ops']),
+                ),
+                migrations.AddIndex(
+                    model_name='client',
+                    index=django.contrib.postgres.indexes.GinIndex(fields=['phone_normalized'], name='client_phone_trgm', opclasses=['gin_trgm_ops']),
+                ),
+                migrations.AddIndex(
+                    model_name='client',
+                    index=django.contrib.postgres.indexes.GinIndex(fields=['national_id_normalized'], name='client_national_id_trgm', opclasses=['gin_trgm_ops']),
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+            ],
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 6.0.2 on 2026-10-19 02:30
+"""
+Identity keys for duplicate detection (see clients.identity): E.164 phone
+and lower-cased email columns, backfilled in batches, plus B-tree indexes on
+them and on national_id_normalized.
+"""
+from django.db import migrations, models
+
+
+def backfill(apps, schema_editor):
+    from clients.identity import email_key, phone_key
+
+    Client = apps.get_model("clients", "Client")
+    last_id = 0
+    while True:
+        batch = list(Client.objects.filter(id__gt=last_id).order_by("id").only("id", "phone", "email")[:2000])
+        if not batch:
+            break
+        for client in batch:
+            client.phone_key = phone_key(client.phone)
+            client.email_key = email_key(client.email)
+        Client.objects.bulk_update(batch, ["phone_key", "email_key"])
+        last_id = batch[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0007_client_search_columns'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='client',
+            name='email_key',
+            field=models.CharField(blank=True, default='', editable=False, max_length=254),
+        ),
+        migrations.AddField(
+            model_name='client',
+            name='phone_key',
+            field=models.CharField(blank=True, default='', editable=False, max_length=50),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['national_id_normalized'], name='client_national_id_key_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['phone_key'], name='client_phone_key_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['email_key'], name='client_email_key_idx'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 6.0.2 on 2026-10-19 02:50
+"""
+Denormalized KYC status and KYC photo path on Client, backfilled from KYC
+and KYCDocument with one UPDATE each.
+"""
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill(apps, schema_editor):
+    Client = apps.get_model("clients", "Client")
+    KYC = apps.get_model("clients", "KYC")
+    KYCDocument = apps.get_model("clients", "KYCDocument")
+
+    Client.objects.update(
+        kyc_status=Subquery(KYC.objects.filter(client=OuterRef("pk")).values("status")[:1])
+    )
+    photos = KYCDocument.objects.filter(kyc__client=OuterRef("pk"), document_type="PHOTO").order_by("-created_at")
+    Client.objects.update(
+        photo_path=Coalesce(Subquery(photos.values("file")[:1]), Value(""))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0008_client_identity_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='client',
+            name='kyc_status',
+            field=models.CharField(blank=True, editable=False, max_length=20, null=True),
+        ),
+        migrations.AddField(
+            model_name='client',
+            name='photo_path',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['branch', 'kyc_status'], name='client_branch_kyc_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 6.0.2 on 2026-10-19 03:10
+
+import clients.models
+import clients.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0009_client_kyc_status_photo_path'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentBlob',
+            fields=[
+                ('sha256', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=255)),
+                ('size', models.BigIntegerField()),
+                ('ref_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='kycdocument',
+            name='original_filename',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='kycdocument',
+            name='file',
+            field=models.FileField(storage=clients.storage.document_storage, upload_to=clients.models.kyc_document_upload_path),
+        ),
+    ]
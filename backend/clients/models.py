@@ -3,6 +3,10 @@ import os
 import re
 from django.db import models
 from django.conf import settings
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.contrib.postgres.indexes import GinIndex
+from .storage import document_storage, release_document_file
 from .validators import validate_photo_format, validate_photo_size
 
 
@@ -64,12 +68,69 @@ class Client(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # search columns, derived in save() (see clients.search)
+    name_normalized = models.CharField(max_length=255, blank=True, default='', editable=False)
+    phone_normalized = models.CharField(max_length=50, blank=True, default='', editable=False)
+    national_id_normalized = models.CharField(max_length=100, blank=True, default='', editable=False)
+    # denormalized from KYC / its PHOTO document (kept in sync by their save()
+    # and delete()), so client-bearing serializers need no KYC queries
+    kyc_status = models.CharField(max_length=20, null=True, blank=True, editable=False)
+    photo_path = models.CharField(max_length=255, blank=True, default='', editable=False)
+
+    # identity keys for duplicate detection, derived in save() (see clients.identity)
+    phone_key = models.CharField(max_length=50, blank=True, default='', editable=False)
+    email_key = models.CharField(max_length=254, blank=True, default='', editable=False)
+
+    NORMALIZED_FIELDS = {
+        'full_name': ['name_normalized'],
+        'phone': ['phone_normalized', 'phone_key'],
+        'national_id': ['national_id_normalized'],
+        'email': ['email_key'],
+    }
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # pg_trgm, PostgreSQL only (created by migration 0007)
+            GinIndex(fields=['name_normalized'], name='client_name_trgm', opclasses=['gin_trgm_ops']),
+            GinIndex(fields=['phone_normalized'], name='client_phone_trgm', opclasses=['gin_trgm_ops']),
+            GinIndex(fields=['national_id_normalized'], name='client_national_id_trgm', opclasses=['gin_trgm_ops']),
+            # duplicate checks (equality lookups)
+            models.Index(fields=['national_id_normalized'], name='client_national_id_key_idx'),
+            models.Index(fields=['phone_key'], name='client_phone_key_idx'),
+            models.Index(fields=['email_key'], name='client_email_key_idx'),
+            models.Index(fields=['branch', 'kyc_status'], name='client_branch_kyc_idx'),
+        ]
 
     def __str__(self):
         return f"{self.full_name} ({self.client_number})"
 
+    @property
+    def kyc_photo(self):
+        """File of the current KYC photo document, built from photo_path (no query)."""
+        if not self.photo_path:
+            return None
+        field = KYCDocument._meta.get_field('file')
+        return field.attr_class(self, field, self.photo_path)
+
+    def normalize_search_fields(self):
+        from .identity import email_key, phone_key
+        from .search import normalize_name, normalize_national_id, normalize_phone
+
+        self.name_normalized = normalize_name(self.full_name)
+        self.phone_normalized = normalize_phone(self.phone)
+        self.national_id_normalized = normalize_national_id(self.national_id)
+        self.phone_key = phone_key(self.phone)
+        self.email_key = email_key(self.email)
+
+    def save(self, *args, **kwargs):
+        self.normalize_search_fields()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            derived = {d for f in update_fields for d in self.NORMALIZED_FIELDS.get(f, [])}
+            kwargs['update_fields'] = set(update_fields) | derived
+        super().save(*args, **kwargs)
+
 
 class KYC(models.Model):
     STATUS_CHOICES = [
@@ -112,6 +173,18 @@ class KYC(models.Model):
     def __str__(self):
         return f"KYC for {self.client.full_name} - {self.status}"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        Client.objects.filter(pk=self.client_id).update(kyc_status=self.status)
+        if 'client' in self._state.fields_cache:
+            self.client.kyc_status = self.status
+
+    def delete(self, *args, **kwargs):
+        client_id = self.client_id
+        result = super().delete(*args, **kwargs)
+        Client.objects.filter(pk=client_id).update(kyc_status=None, photo_path='')
+        return result
+
 
 class KYCDocument(models.Model):
     DOCUMENT_TYPE_CHOICES = [
@@ -130,7 +203,9 @@ class KYCDocument(models.Model):
         max_length=50,
         choices=DOCUMENT_TYPE_CHOICES
     )
-    file = models.FileField(upload_to=kyc_document_upload_path)
+    # stored once per content hash, see clients.storage
+    file = models.FileField(upload_to=kyc_document_upload_path, storage=document_storage)
+    original_filename = models.CharField(max_length=255, blank=True, default='')
     uploaded_by = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.SET_NULL,
@@ -152,15 +227,80 @@ class KYCDocument(models.Model):
         return f"{self.get_document_type_display()} for {self.kyc.client.full_name}"
 
     def filename(self):
-        return os.path.basename(self.file.name)
+        return self.original_filename or os.path.basename(self.file.name)
 
     def save(self, *args, **kwargs):
         """
-        If the same KYCDocument row is updated with a new file, delete the old file first.
+        If the same KYCDocument row is updated with a new file, release the old file
+        once the new one is stored (the storage deletes it with its last reference).
         This prevents multiple copies from being kept in storage.
         """
+        replaced = None
+        if self.file and not self.file._committed:
+            self.original_filename = os.path.basename(self.file.name)[:255]
         if self.pk:
             old = KYCDocument.objects.filter(pk=self.pk).only("file").first()
-            if old and old.file and self.file and old.file.name != self.file.name:
-                old.file.delete(save=False)
+            if old and old.file and self.file and (old.file.name != self.file.name or not self.file._committed):
+                replaced = old.file
         super().save(*args, **kwargs)
+        if replaced:
+            replaced.delete(save=False)
+        if self.document_type == 'PHOTO':
+            Client.objects.filter(kyc__id=self.kyc_id).update(photo_path=self.file.name or '')
+
+
+
+@receiver(post_delete, sender=KYCDocument)
+def release_kyc_document(sender, instance, **kwargs):
+    """Runs for queryset and cascade deletes too, which skip Model.delete()."""
+    if instance.document_type == 'PHOTO':
+        Client.objects.filter(kyc__id=instance.kyc_id, photo_path=instance.file.name).update(photo_path='')
+    release_document_file(instance.file)
+
+
+class DocumentBlob(models.Model):
+    """One stored document file, shared by every row whose content hashes to it (see clients.storage)."""
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    name = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} ref)"
+
+
+class ChunkedUpload(models.Model):
+    """A resumable document upload in progress (see clients.uploads)."""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='chunked_uploads'
+    )
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    received = models.BigIntegerField(default=0)
+    sha256 = models.CharField(max_length=64, blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def complete(self):
+        return self.received >= self.size
+
+    @property
+    def part_path(self):
+        from .uploads import session_dir
+        return os.path.join(session_dir(), f"{self.id}.part")
+
+    def delete(self, *args, **kwargs):
+        path = self.part_path
+        result = super().delete(*args, **kwargs)
+        # already gone when the storage moved the finished file into place
+        if os.path.exists(path):
+            os.remove(path)
+        return result
+
+    def __str__(self):
+        return f"{self.filename} ({self.received}/{self.size})"
@@ -0,0 +1,83 @@
+"""
+Client lookup on normalized columns.
+
+Client.save() keeps three search columns in step with the raw fields:
+  name_normalized         accents stripped, case-folded, punctuation removed
+  phone_normalized        digits only
+  national_id_normalized  upper-case letters and digits only
+
+On PostgreSQL each has a pg_trgm GIN index (migration 0007), so substring
+matches (LIKE '%...%') and fuzzy name matches (word_similarity, `%>`) are
+index scans instead of a sequential scan over full_name. search_clients()
+ranks name hits by trigram word similarity; exact phone / national id hits
+rank first. Other databases get the same filters without the fuzzy match.
+"""
+import re
+import unicodedata
+
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db import connection
+from django.db.models import Case, FloatField, Q, Value, When
+from django.db.models.functions import Greatest
+
+
+def normalize_name(value) -> str:
+    value = unicodedata.normalize("NFKD", value or "")
+    value = "".join(c for c in value if not unicodedata.combining(c)).casefold()
+    value = re.sub(r"[^\w\s]", " ", value)
+    return " ".join(value.split())
+
+
+def normalize_phone(value) -> str:
+    return re.sub(r"\D", "", value or "")
+
+
+def normalize_national_id(value) -> str:
+    return re.sub(r"[^A-Za-z0-9]", "", value or "").upper()
+
+
+def filter_by_name(queryset, term):
+    """Substring match on the normalized name (the `name` list filter)."""
+    name = normalize_name(term)
+    if not name:
+        return queryset
+    return queryset.filter(name_normalized__contains=name)
+
+
+def search_clients(queryset, term):
+    """
+    Typeahead search: matches name, phone or national id; returns the
+    queryset annotated with search_rank and ordered best first.
+    """
+    name = normalize_name(term)
+    digits = normalize_phone(term)
+    national_id = normalize_national_id(term)
+    if not (name or digits or national_id):
+        return queryset.none()
+
+    postgres = connection.vendor == "postgresql"
+    condition = Q(name_normalized__contains=name) if name else Q()
+    if name and postgres:
+        condition |= Q(name_normalized__trigram_word_similar=name)
+    if len(digits) >= 3:
+        condition |= Q(phone_normalized__contains=digits)
+    if len(national_id) >= 3:
+        condition |= Q(national_id_normalized__startswith=national_id)
+    if not condition:
+        return queryset.none()
+
+    exact = Q()
+    if digits:
+        exact |= Q(phone_normalized=digits)
+    if national_id:
+        exact |= Q(national_id_normalized=national_id)
+    exact_rank = Case(When(exact, then=Value(1.0)), default=Value(0.0), output_field=FloatField()) if exact else Value(0.0)
+
+    if name and postgres:
+        name_rank = TrigramWordSimilarity(name, "name_normalized")
+    elif name:
+        name_rank = Case(When(name_normalized__startswith=name, then=Value(0.9)), default=Value(0.5), output_field=FloatField())
+    else:
+        name_rank = Value(0.0)
+    rank = Greatest(exact_rank, name_rank, output_field=FloatField())
+    return queryset.filter(condition).annotate(search_rank=rank).order_by("-search_rank", "full_name", "id")
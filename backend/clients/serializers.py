@@ -1,25 +1,13 @@
 from rest_framework import serializers
-from .models import Client, KYC, KYCDocument
-
-
-def _get_client_photo_url(client, request=None):
-    """Return absolute URL of the client's KYC photo if available, else None."""
-    try:
-        # access through related_name (kyc.documents) to avoid extra query when possible
-        kyc = client.kyc
-        photo = kyc.documents.filter(document_type='PHOTO').only('file').first()
-        if photo and photo.file:
-            if request:
-                return request.build_absolute_uri(photo.file.url)
-            return photo.file.url
-    except (KYC.DoesNotExist, AttributeError):
-        pass
-    return None
+from .identity import find_duplicate
+from .thumbnails import thumbnail_url
+from .models import ChunkedUpload, Client, KYC, KYCDocument
 
 
 class ClientSerializer(serializers.ModelSerializer):
     branch_display = serializers.SerializerMethodField(read_only=True)
     photo_url = serializers.SerializerMethodField(read_only=True)
+    photo_thumb_url = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
         model = Client
@@ -33,6 +21,7 @@ class ClientSerializer(serializers.ModelSerializer):
             'address',
             'photo',
             'photo_url',
+            'photo_thumb_url',
             'status',
             'branch',
             'branch_display',
@@ -41,7 +30,7 @@ class ClientSerializer(serializers.ModelSerializer):
             'updated_at',
         ]
         # branch is now read-only so cashier can't set it manually
-        read_only_fields = ('client_number', 'created_by', 'branch', 'photo_url', 'created_at', 'updated_at')
+        read_only_fields = ('client_number', 'created_by', 'branch', 'photo_url', 'photo_thumb_url', 'created_at', 'updated_at')
 
     def get_branch_display(self, obj):
         """
@@ -52,39 +41,38 @@ class ClientSerializer(serializers.ModelSerializer):
             return None
         return str(obj.branch)
 
+    @staticmethod
+    def _photo(obj):
+        # the direct photo, else the KYC photo: photo_url and photo_thumb_url show the same image
+        return obj.photo or obj.kyc_photo
+
     def get_photo_url(self, obj):
-        """Return absolute URL to client photo if available"""
-        if obj.photo:
-            request = self.context.get('request')
-            if request:
-                return request.build_absolute_uri(obj.photo.url)
-            return obj.photo.url
-        # Fallback to KYC photo if no direct photo
+        """Return absolute URL to client photo (or, failing that, the KYC photo) if available"""
+        photo = self._photo(obj)
+        if not photo:
+            return None
         request = self.context.get('request')
-        return _get_client_photo_url(obj, request)
+        if request:
+            return request.build_absolute_uri(photo.url)
+        return photo.url
+
+    def get_photo_thumb_url(self, obj):
+        """URL of a small derivative of the same photo as photo_url; None until generated (see clients.thumbnails)"""
+        return thumbnail_url(self._photo(obj), self.context.get('request'))
 
     def validate(self, data):
         """
-        Duplicate detection: national_id OR phone OR email.
+        Duplicate detection: national_id OR phone OR email, compared on the
+        indexed identity keys (see clients.identity).
         (Improved to exclude current instance on update so edits don't false-trigger.)
         """
-        national_id = data.get('national_id')
-        phone = data.get('phone')
-        email = data.get('email')
-
-        duplicates = Client.objects.none()
-        if national_id:
-            duplicates = duplicates | Client.objects.filter(national_id__iexact=national_id)
-        if phone:
-            duplicates = duplicates | Client.objects.filter(phone__iexact=phone)
-        if email:
-            duplicates = duplicates | Client.objects.filter(email__iexact=email)
-
-        # Exclude self on update
-        if self.instance and self.instance.pk:
-            duplicates = duplicates.exclude(pk=self.instance.pk)
-
-        if duplicates.exists():
+        duplicate = find_duplicate(
+            national_id=data.get('national_id'),
+            phone=data.get('phone'),
+            email=data.get('email'),
+            exclude_pk=self.instance.pk if self.instance else None,
+        )
+        if duplicate is not None:
             raise serializers.ValidationError({'detail': 'A client with the same national ID, phone, or email already exists.'})
 
         return data
@@ -112,12 +100,8 @@ class ClientSerializer(serializers.ModelSerializer):
 
     def to_representation(self, instance):
         representation = super().to_representation(instance)
-        # Add KYC status if KYC exists
-        try:
-            kyc = instance.kyc
-            representation['kyc_status'] = kyc.status
-        except KYC.DoesNotExist:
-            representation['kyc_status'] = None
+        # KYC status (None if no KYC), denormalized on Client
+        representation['kyc_status'] = instance.kyc_status
         return representation
 
 
@@ -188,3 +172,13 @@ class ApproveKYCSerializer(serializers.Serializer):
 class RejectKYCSerializer(serializers.Serializer):
     """Serializer for rejecting KYC"""
     rejection_reason = serializers.CharField(required=True, allow_blank=False)
+
+
+class ChunkedUploadSerializer(serializers.ModelSerializer):
+    offset = serializers.IntegerField(source='received', read_only=True)
+    complete = serializers.BooleanField(read_only=True)
+
+    class Meta:
+        model = ChunkedUpload
+        fields = ['id', 'filename', 'size', 'offset', 'complete', 'created_at']
+        read_only_fields = ['id', 'created_at']
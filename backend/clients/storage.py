@@ -0,0 +1,147 @@
+"""
+Content-addressed storage for KYC and loan documents.
+
+ContentAddressedStorage (the "documents" entry of STORAGES, used by
+KYCDocument.file and LoanDocument.document_file) ignores the name that
+upload_to proposes except for its extension and stores each upload under
+the SHA-256 of its bytes:
+
+    documents/3f/a4/3fa4...c2.pdf
+
+The hash is computed over the upload's chunks (or taken from
+`content.sha256` when the upload handler already computed it; see
+clients.uploads). Uploads already on disk are moved into place. If a blob
+with that hash exists, nothing is written and the existing name is
+returned, so re-uploading the same national ID or payslip costs one read
+and no disk space.
+
+Every stored name is reference-counted in DocumentBlob: save() adds a
+reference, delete() drops one, and the blob file is removed only when the
+last reference goes (after the transaction commits). Deleted document rows
+drop theirs through post_delete receivers (release_document_file), so
+queryset and cascade deletes free blobs too. Names outside
+documents/ (files stored before this backend) are handled like plain
+FileSystemStorage files.
+
+The original filename is kept on the document rows (original_filename).
+"""
+import hashlib
+import os
+import posixpath
+import re
+import uuid
+
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage, storages
+from django.db import transaction
+from django.db.models import F
+
+
+BLOB_PREFIX = "documents"
+BLOB_NAME = re.compile(rf"^{BLOB_PREFIX}/[0-9a-f]{{2}}/[0-9a-f]{{2}}/(?P<sha256>[0-9a-f]{{64}})(\.[a-z0-9]{{1,10}})?$")
+
+
+def document_storage():
+    """Storage for document FileFields (callable, so STORAGES can be changed per environment)."""
+    return storages["documents"]
+
+
+def hash_content(content) -> str:
+    digest = getattr(content, "sha256", None)
+    if digest:
+        return digest
+    sha = hashlib.sha256()
+    if hasattr(content, "seek"):
+        content.seek(0)
+    for chunk in content.chunks():
+        sha.update(chunk)
+    return sha.hexdigest()
+
+
+def blob_name(digest, original_name) -> str:
+    ext = os.path.splitext(original_name or "")[1].lower()
+    if not re.fullmatch(r"\.[a-z0-9]{1,10}", ext):
+        ext = ""
+    return posixpath.join(BLOB_PREFIX, digest[:2], digest[2:4], f"{digest}{ext}")
+
+
+def blob_digest(name):
+    match = BLOB_NAME.match(name or "")
+    return match.group("sha256") if match else None
+
+
+def release_document_file(fieldfile):
+    """Drop a deleted document row's reference to its stored file."""
+    if fieldfile:
+        fieldfile.storage.delete(fieldfile.name)
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def get_available_name(self, name, max_length=None):
+        # names are chosen in _save(); an existing name is a hit, not a clash
+        return name
+
+    @property
+    def derivative_storage(self):
+        """Plain storage on the same root for files derived from blobs (thumbnails)."""
+        return FileSystemStorage(location=self.location, base_url=self.base_url)
+
+    def _save(self, name, content):
+        from .models import DocumentBlob
+
+        digest = hash_content(content)
+        with transaction.atomic():
+            blob, _ = DocumentBlob.objects.select_for_update().get_or_create(
+                sha256=digest,
+                defaults={"name": blob_name(digest, name), "size": content.size, "ref_count": 0},
+            )
+            if not self.exists(blob.name):
+                self._write(blob.name, content)
+            DocumentBlob.objects.filter(pk=digest).update(ref_count=F("ref_count") + 1)
+        return blob.name
+
+    def _write(self, name, content):
+        path = self.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True, mode=self.directory_permissions_mode or 0o777)
+        # write aside and rename: concurrent uploads of the same bytes never see a partial blob
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        if hasattr(content, "seek"):
+            content.seek(0)
+        try:
+            if hasattr(content, "temporary_file_path"):
+                # already on disk (streamed or resumable upload): a rename, not a copy
+                file_move_safe(content.temporary_file_path(), tmp_path)
+            else:
+                with open(tmp_path, "wb") as fh:
+                    for chunk in content.chunks():
+                        fh.write(chunk)
+            if self.file_permissions_mode is not None:
+                os.chmod(tmp_path, self.file_permissions_mode)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def delete(self, name):
+        from .models import DocumentBlob
+
+        digest = blob_digest(name)
+        if digest is None:
+            return super().delete(name)
+
+        with transaction.atomic():
+            blob = DocumentBlob.objects.select_for_update().filter(pk=digest).first()
+            if blob is not None and blob.ref_count > 1:
+                DocumentBlob.objects.filter(pk=digest).update(ref_count=F("ref_count") - 1)
+                return
+            if blob is not None:
+                blob.delete()
+            transaction.on_commit(lambda: self._remove_unreferenced(digest, name))
+
+    def _remove_unreferenced(self, digest, name):
+        from .models import DocumentBlob
+
+        # re-uploaded since the last reference went away: keep the file
+        if not DocumentBlob.objects.filter(pk=digest).exists():
+            super().delete(name)
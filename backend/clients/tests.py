@@ -0,0 +1,456 @@
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from accounts.models import AuditLog, Branch, User
+from .identity import find_duplicates, phone_key
+from .models import ChunkedUpload, Client, DocumentBlob, KYC, KYCDocument
+
+
+class ClientSearchTests(TestCase):
+    def setUp(self):
+        self.branch = Branch.objects.create(name="Main", code="MAIN", region="East", phone="123", address="Addr")
+        self.cashier = User.objects.create_user(
+            username="cash", email="cash@example.com", password="x", role="CASHIER", branch=self.branch
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.cashier)
+
+    def _client(self, full_name, **kwargs):
+        return Client.objects.create(full_name=full_name, branch=self.branch, **kwargs)
+
+    def test_save_maintains_normalized_columns(self):
+        client = self._client("  Amélie  N'Diaye ", phone="+237 (6) 70-12-34", national_id="ab-123 45")
+        self.assertEqual(client.name_normalized, "amelie n diaye")
+        self.assertEqual(client.phone_normalized, "2376701234")
+        self.assertEqual(client.national_id_normalized, "AB12345")
+
+        client.full_name = "Zoë Mbarga"
+        client.save(update_fields=["full_name"])
+        client.refresh_from_db()
+        self.assertEqual(client.name_normalized, "zoe mbarga")
+
+    def test_name_filter_ignores_accents_and_case(self):
+        self._client("Hélène Fotso")
+        self._client("Paul Biya")
+        response = self.client.get("/api/clients/", {"name": "HELENE"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([c["full_name"] for c in response.data], ["Hélène Fotso"])
+
+    def test_search_ranks_exact_phone_first(self):
+        self._client("Anne 670", phone="670111222")
+        exact = self._client("Bruno Ekane", phone="+237 670 111 222")
+        self._client("Carla Nji", phone="670111")
+        response = self.client.get("/api/clients/", {"search": "237670111222"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]["id"], exact.id)
+
+        response = self.client.get("/api/clients/", {"search": "670111", "limit": 1})
+        self.assertEqual(len(response.data), 1)
+
+    def test_trigram_lookup_comes_from_contrib_postgres(self):
+        from django.contrib.postgres.lookups import TrigramWordSimilar
+
+        self.assertIs(Client._meta.get_field("name_normalized").get_lookup("trigram_word_similar"), TrigramWordSimilar)
+
+
+class DuplicateClientTests(TestCase):
+    def setUp(self):
+        self.branch = Branch.objects.create(name="Main", code="MAIN", region="East", phone="123", address="Addr")
+        self.cashier = User.objects.create_user(
+            username="cash", email="cash@example.com", password="x", role="CASHIER", branch=self.branch
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.cashier)
+        self.existing = Client.objects.create(
+            full_name="Jean Mballa", phone="670 11 22 33", email="Jean.Mballa@Example.com",
+            national_id="cm-1234", branch=self.branch,
+        )
+
+    def test_phone_key_is_e164(self):
+        for raw in ("670112233", "+237 670 11 22 33", "00237670112233", "237670112233"):
+            self.assertEqual(phone_key(raw), "+237670112233")
+        self.assertEqual(phone_key(""), "")
+
+    def test_create_rejects_differently_formatted_duplicate(self):
+        response = self.client.post(
+            "/api/clients/", {"full_name": "Other", "email": " jean.mballa@example.COM "}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.patch(
+            f"/api/clients/{self.existing.id}/", {"phone": "+237670112233"}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_find_duplicates_checks_batch_in_one_query(self):
+        rows = [
+            {"national_id": "CM1234"},
+            {"phone": "699000000"},
+            {"phone": "+237 699 000 000"},
+            {"email": "new@example.com"},
+        ]
+        with self.assertNumQueries(1):
+            duplicates = find_duplicates(rows)
+        self.assertEqual(set(duplicates), {0, 2})
+        self.assertIn(str(self.existing.id), duplicates[0])
+
+
+class ClientImportTests(TestCase):
+    def setUp(self):
+        self.branch = Branch.objects.create(name="Main", code="MAIN", region="East", phone="123", address="Addr")
+        self.cashier = User.objects.create_user(
+            username="cash", email="cash@example.com", password="x", role="CASHIER", branch=self.branch
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.cashier)
+        Client.objects.create(full_name="Existing", phone="670000001", branch=self.branch)
+
+    def _upload(self, content, name="clients.csv", **data):
+        upload = SimpleUploadedFile(name, content.encode("utf-8"), content_type="text/csv")
+        return self.client.post("/api/clients/import/", {"file": upload, **data}, format="multipart")
+
+    def test_csv_import_creates_valid_rows_and_reports_the_rest(self):
+        content = (
+            "Full Name,Phone,Email,National ID\n"
+            "Alice Ngo,699000001,alice@example.com,ID1\n"
+            ",699000002,,\n"
+            "Bob Eto,+237 670 000 001,,\n"
+            "Carl Abe,699000003,not-an-email,\n"
+            "Dora Fon,699 000 001,,\n"
+            ",,,\n"
+            "Eve Oyono,,,id-2\n"
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self._upload(content)
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual((response.data["total"], response.data["created"], response.data["failed"]), (6, 2, 4))
+        self.assertEqual([e["row"] for e in response.data["errors"]], [3, 4, 5, 6])
+
+        alice = Client.objects.get(full_name="Alice Ngo")
+        self.assertEqual((alice.branch, alice.created_by, alice.phone_key), (self.branch, self.cashier, "+237699000001"))
+        self.assertEqual(Client.objects.filter(name_normalized="eve oyono", national_id_normalized="ID2").count(), 1)
+        self.assertEqual(AuditLog.objects.filter(action="CLIENT_CREATED").count(), 2)
+
+    def test_dry_run_and_bad_files_create_nothing(self):
+        response = self._upload("full_name,phone\nZed,699111111\n", dry_run="1")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data["total"], response.data["failed"]), (1, 0))
+        self.assertEqual(self._upload("name,phone\nZed,1\n").status_code, 400)
+        self.assertEqual(self._upload("full_name\nZed\n", name="clients.txt").status_code, 400)
+        self.assertFalse(Client.objects.filter(full_name="Zed").exists())
+
+    def test_xlsx_rows_are_read(self):
+        from openpyxl import Workbook
+        from .importer import iter_rows
+
+        wb = Workbook()
+        wb.active.append(["full_name", "phone"])
+        wb.active.append(["Xena Tabi", 699222333])
+        buffer = io.BytesIO()
+        wb.save(buffer)
+        buffer.seek(0)
+        rows = list(iter_rows(buffer, "clients.xlsx"))
+        self.assertEqual(rows, [{"full_name": "Xena Tabi", "phone": "699222333"}])
+
+
+class PhotoThumbnailTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media, THUMBNAIL_FORMAT="JPEG")
+        override.enable()
+        self.addCleanup(override.disable)
+        cache.clear()
+
+        self.branch = Branch.objects.create(name="Main", code="MAIN", region="East", phone="123", address="Addr")
+        self.cashier = User.objects.create_user(
+            username="cash", email="cash@example.com", password="x", role="CASHIER", branch=self.branch
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.cashier)
+        self.record = Client.objects.create(full_name="Jane Doe", branch=self.branch)
+
+    def _png(self, color, name="jane.png"):
+        from PIL import Image
+
+        buffer = io.BytesIO()
+        Image.new("RGB", (1200, 800), color).save(buffer, "PNG")
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/png")
+
+    def _upload(self, color):
+        response = self.client.post(
+            f"/api/clients/{self.record.id}/upload-photo/", {"photo": self._png(color)}, format="multipart"
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data["client"]
+
+    def test_upload_creates_content_named_thumbnails(self):
+        from PIL import Image
+
+        data = self._upload("red")
+        thumb_url = data["photo_thumb_url"]
+        self.assertRegex(thumb_url, r"/thumbs/jane-thumb-[0-9a-f]{16}\.jpg$")
+        thumbs_dir = os.path.join(self.media, os.path.dirname(Client.objects.get().photo.name), "thumbs")
+        self.assertEqual(len(os.listdir(thumbs_dir)), 2)
+        name = thumb_url.split("/media/", 1)[1]
+        with Image.open(os.path.join(self.media, name)) as img:
+            self.assertEqual(img.size, (128, 85))
+
+        # a new photo replaces the old derivatives
+        new_thumb_url = self._upload("blue")["photo_thumb_url"]
+        self.assertRegex(new_thumb_url, r"/thumbs/jane(_\w+)?-thumb-[0-9a-f]{16}\.jpg$")
+        self.assertNotEqual(new_thumb_url, thumb_url)
+        self.assertFalse(os.path.exists(os.path.join(self.media, name)))
+
+    def test_existing_photos_get_thumbnails_from_the_backfill_command(self):
+        from .thumbnails import thumbnail_url
+
+        self.record.photo = self._png("green")
+        self.record.save()
+        # serializing never reads the original: no thumbnail until one is generated
+        self.assertIsNone(thumbnail_url(self.record.photo))
+        self.assertIsNone(self.client.get(f"/api/clients/{self.record.id}/").data["photo_thumb_url"])
+
+        cache.clear()
+        call_command("generate_thumbnails", stdout=io.StringIO())
+        url = thumbnail_url(self.record.photo)
+        self.assertIn("/thumbs/", url)
+        self.assertEqual(thumbnail_url(self.record.photo), url)
+        data = self.client.get(f"/api/clients/{self.record.id}/").data
+        self.assertTrue(data["photo_thumb_url"].endswith(url))
+        self.assertTrue(data["photo_url"].endswith(self.record.photo.url))
+
+
+class DenormalizedKycTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media)
+        override.enable()
+        self.addCleanup(override.disable)
+        cache.clear()
+
+        self.branch = Branch.objects.create(name="Main", code="MAIN", region="East", phone="123", address="Addr")
+        self.cashier = User.objects.create_user(
+            username="cash", email="cash@example.com", password="x", role="CASHIER", branch=self.branch
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.cashier)
+
+    def _photo(self):
+        from PIL import Image
+
+        buffer = io.BytesIO()
+        Image.new("RGB", (40, 40), "red").save(buffer, "PNG")
+        return SimpleUploadedFile("face.png", buffer.getvalue(), content_type="image/png")
+
+    def test_kyc_and_photo_changes_are_mirrored_on_client(self):
+        record = Client.objects.create(full_name="Jane Doe", branch=self.branch)
+        kyc = KYC.objects.create(client=record, initiated_by=self.cashier)
+        document = KYCDocument.objects.create(kyc=kyc, document_type="PHOTO", file=self._photo())
+        kyc.status = "APPROVED"
+        kyc.save()
+
+        record.refresh_from_db()
+        self.assertEqual((record.kyc_status, record.photo_path), ("APPROVED", document.file.name))
+
+        document.delete()
+        record.refresh_from_db()
+        self.assertEqual(record.photo_path, "")
+
+    def test_client_list_needs_no_kyc_queries(self):
+        for i in range(3):
+            record = Client.objects.create(full_name=f"Client {i}", branch=self.branch)
+            kyc = KYC.objects.create(client=record, initiated_by=self.cashier, status="SUBMITTED")
+            KYCDocument.objects.create(kyc=kyc, document_type="PHOTO", file=self._photo())
+        call_command("generate_thumbnails", stdout=io.StringIO())
+
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/clients/")
+        self.assertEqual({c["kyc_status"] for c in response.data}, {"SUBMITTED"})
+        self.assertTrue(all(c["photo_url"] and c["photo_thumb_url"] for c in response.data))
+
+
+class DocumentStorageTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.branch = Branch.objects.create(name="Main", code="MAIN", region="East", phone="123", address="Addr")
+        self.kycs = [
+            KYC.objects.create(client=Client.objects.create(full_name=f"Client {i}", branch=self.branch))
+            for i in range(2)
+        ]
+
+    def _document(self, kyc, content, name="national_id.pdf"):
+        return KYCDocument.objects.create(
+            kyc=kyc, document_type="NATIONAL_ID", file=SimpleUploadedFile(name, content)
+        )
+
+    def _blob_files(self):
+        return [f for _, _, files in os.walk(os.path.join(self.media, "documents")) for f in files]
+
+    def test_identical_uploads_share_one_refcounted_blob(self):
+        first = self._document(self.kycs[0], b"same bytes")
+        second = self._document(self.kycs[1], b"same bytes", name="scan.PDF")
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertRegex(first.file.name, r"^documents/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.pdf$")
+        self.assertEqual((first.filename(), second.filename()), ("national_id.pdf", "scan.PDF"))
+        self.assertEqual(len(self._blob_files()), 1)
+        self.assertEqual(DocumentBlob.objects.get().ref_count, 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.file.delete(save=False)
+        self.assertEqual(len(self._blob_files()), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            second.file.delete(save=False)
+        self.assertEqual(self._blob_files(), [])
+        self.assertFalse(DocumentBlob.objects.exists())
+
+    def test_replacing_a_document_releases_the_old_blob(self):
+        document = self._document(self.kycs[0], b"old scan")
+        with self.captureOnCommitCallbacks(execute=True):
+            document.file = SimpleUploadedFile("rescan.pdf", b"old scan")
+            document.save()
+        self.assertEqual(DocumentBlob.objects.get().ref_count, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            document.file = SimpleUploadedFile("new.pdf", b"new scan")
+            document.save()
+        self.assertEqual(list(DocumentBlob.objects.values_list("ref_count", flat=True)), [1])
+        self.assertEqual(len(self._blob_files()), 1)
+        with document.file.open("rb") as fh:
+            self.assertEqual(fh.read(), b"new scan")
+
+    def test_cascade_delete_releases_blobs(self):
+        self._document(self.kycs[0], b"shared scan")
+        self._document(self.kycs[1], b"shared scan")
+        with self.captureOnCommitCallbacks(execute=True):
+            KYC.objects.filter(pk=self.kycs[0].pk).delete()
+        self.assertEqual(DocumentBlob.objects.get().ref_count, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            Client.objects.filter(pk=self.kycs[1].client_id).delete()
+        self.assertFalse(DocumentBlob.objects.exists())
+        self.assertEqual(self._blob_files(), [])
+
+    def test_moving_a_legacy_photo_updates_client_photo_path(self):
+        legacy_name = "kyc_documents/Client_0/face.png"
+        os.makedirs(os.path.join(self.media, "kyc_documents", "Client_0"))
+        with open(os.path.join(self.media, legacy_name), "wb") as fh:
+            fh.write(b"\x89PNG legacy photo")
+        document = KYCDocument.objects.create(kyc=self.kycs[0], document_type="PHOTO", file=legacy_name)
+        self.assertEqual(Client.objects.get(pk=self.kycs[0].client_id).photo_path, legacy_name)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("store_documents_by_hash", stdout=io.StringIO())
+
+        document.refresh_from_db()
+        self.assertTrue(document.file.name.startswith("documents/"))
+        record = Client.objects.get(pk=self.kycs[0].client_id)
+        self.assertEqual(record.photo_path, document.file.name)
+        self.assertTrue(os.path.exists(os.path.join(self.media, record.photo_path)))
+        self.assertFalse(os.path.exists(os.path.join(self.media, legacy_name)))
+
+
+class DocumentUploadTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        override = override_settings(
+            MEDIA_ROOT=self.media, DOCUMENT_UPLOAD_SESSION_DIR=os.path.join(self.media, "sessions"),
+            DOCUMENT_UPLOAD_MAX_BYTES=4096, DOCUMENT_UPLOAD_CHUNK_BYTES=1024,
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.branch = Branch.objects.create(name="Main", code="MAIN", region="East", phone="123", address="Addr")
+        self.cashier = User.objects.create_user(
+            username="cash", email="cash@example.com", password="x", role="CASHIER", branch=self.branch
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.cashier)
+        self.record = Client.objects.create(full_name="Jane Doe", branch=self.branch)
+        KYC.objects.create(client=self.record)
+        self.url = f"/api/clients/{self.record.id}/kyc/upload-documents/"
+
+    def test_streamed_upload_rejects_bad_files_and_stores_the_rest(self):
+        pdf = b"%PDF-1.4 national id scan"
+        response = self.client.post(self.url, {
+            "national_id": SimpleUploadedFile("id.pdf", pdf),
+            "proof_of_address": SimpleUploadedFile("bill.pdf", b"MZ not really a pdf"),
+            "other": SimpleUploadedFile("big.pdf", b"%PDF-" + b"x" * 5000),
+        }, format="multipart")
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual([d["document_type"] for d in response.data["documents"]], ["NATIONAL_ID"])
+        self.assertEqual(
+            sorted(next(iter(e)) for e in response.data["errors"]), ["other", "proof_of_address"]
+        )
+        document = KYCDocument.objects.get()
+        self.assertEqual(document.file.name, DocumentBlob.objects.get().name)
+        self.assertIn(hashlib.sha256(pdf).hexdigest(), document.file.name)
+        with document.file.open("rb") as fh:
+            self.assertEqual(fh.read(), pdf)
+
+    def test_rejected_file_after_an_accepted_one_keeps_the_accepted_file(self):
+        pdf = b"%PDF-1.4 national id scan"
+        response = self.client.post(self.url, {
+            "national_id": SimpleUploadedFile("id.pdf", pdf),
+            "proof_of_address": SimpleUploadedFile("p.exe", b"MZ"),
+            "other": SimpleUploadedFile("tiny.pdf", b"MZ"),
+        }, format="multipart")
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(
+            sorted(next(iter(e)) for e in response.data["errors"]), ["other", "proof_of_address"]
+        )
+        with KYCDocument.objects.get().file.open("rb") as fh:
+            self.assertEqual(fh.read(), pdf)
+
+    def test_resumable_upload_resumes_from_server_offset(self):
+        data = b"%PDF-1.4 " + b"a" * 1500
+        response = self.client.post("/api/clients/uploads/", {"filename": "payslip.pdf", "size": len(data)})
+        self.assertEqual(response.status_code, 201, response.data)
+        upload_url = f"/api/clients/uploads/{response.data['id']}/"
+
+        def send(offset, chunk):
+            return self.client.patch(
+                upload_url, chunk, content_type="application/octet-stream", HTTP_UPLOAD_OFFSET=str(offset)
+            )
+
+        self.assertEqual(send(0, data[:1000]).data["offset"], 1000)
+        # a client that lost the acknowledgement retries the first chunk
+        conflict = send(0, data[:1000])
+        self.assertEqual((conflict.status_code, conflict["Upload-Offset"]), (409, "1000"))
+        self.assertEqual(self.client.get(upload_url).data["offset"], 1000)
+        done = send(1000, data[1000:])
+        self.assertEqual((done.data["offset"], done.data["complete"]), (len(data), True))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                self.url, {"proof_of_address_upload": done.data["id"]}, format="multipart"
+            )
+        self.assertEqual(response.status_code, 201, response.data)
+        with KYCDocument.objects.get().file.open("rb") as fh:
+            self.assertEqual(fh.read(), data)
+        self.assertFalse(ChunkedUpload.objects.exists())
+        self.assertEqual(os.listdir(os.path.join(self.media, "sessions")), [])
+
+    def test_resumable_upload_checks_the_first_bytes(self):
+        response = self.client.post("/api/clients/uploads/", {"filename": "id.png", "size": 10})
+        response = self.client.patch(
+            f"/api/clients/uploads/{response.data['id']}/", b"GIF89a....",
+            content_type="application/octet-stream", HTTP_UPLOAD_OFFSET="0",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.post("/api/clients/uploads/", {"filename": "id.exe", "size": 10}).status_code, 400)
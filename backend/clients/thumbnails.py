@@ -0,0 +1,167 @@
+"""
+Thumbnails for client and KYC photos.
+
+Uploaded photos may be up to 5 MB; list pages only need an avatar. For each
+photo we derive one image per THUMBNAIL_SIZES entry (longest side in px),
+encoded as THUMBNAIL_FORMAT (WebP, or JPEG where Pillow lacks WebP), and
+store it beside the original:
+
+    client_photos/12_Jane_Doe/thumbs/jane-thumb-<content hash>.webp
+
+The hash is taken from the original's bytes, so a derivative URL never
+changes meaning and can be cached forever by browsers and proxies.
+
+Derivatives are generated when a photo is uploaded; photos stored before
+that (or whose generation failed) are backfilled by the generate_thumbnails
+command. thumbnail_url() never reads an original: it finds an existing
+derivative by name, or returns None so callers fall back to the full-size
+URL. The original -> derivative name mapping is kept in the default cache.
+"""
+import hashlib
+import io
+import logging
+import posixpath
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+
+
+logger = logging.getLogger(__name__)
+
+THUMB_DIR = "thumbs"
+EXTENSIONS = {"WEBP": "webp", "JPEG": "jpg"}
+
+
+def _sizes():
+    return dict(getattr(settings, "THUMBNAIL_SIZES", {"thumb": 128, "medium": 512}))
+
+
+def _format():
+    from PIL import features
+
+    fmt = str(getattr(settings, "THUMBNAIL_FORMAT", "WEBP")).upper()
+    if fmt == "WEBP" and not features.check("webp"):
+        return "JPEG"
+    return fmt if fmt in EXTENSIONS else "JPEG"
+
+
+def _cache_key(name, size):
+    return f"thumb:{hashlib.blake2b(name.encode(), digest_size=16).hexdigest()}:{size}"
+
+
+def thumbnail_name(original_name, digest, size, fmt) -> str:
+    folder, filename = posixpath.split(original_name)
+    stem = posixpath.splitext(filename)[0]
+    return posixpath.join(folder, THUMB_DIR, f"{stem}-{size}-{digest}.{EXTENSIONS[fmt]}")
+
+
+def render_thumbnail(data, max_px, fmt) -> bytes:
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(data)) as img:
+        # JPEG: let the decoder downscale (much faster than decoding full size)
+        img.draft("RGB", (max_px, max_px))
+        img = ImageOps.exif_transpose(img)
+        has_alpha = img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info)
+        if has_alpha and fmt == "WEBP":
+            img = img.convert("RGBA")
+        elif has_alpha:
+            background = Image.new("RGB", img.size, "white")
+            background.paste(img.convert("RGBA"), mask=img.convert("RGBA").getchannel("A"))
+            img = background
+        else:
+            img = img.convert("RGB")
+        img.thumbnail((max_px, max_px), Image.LANCZOS)
+        out = io.BytesIO()
+        img.save(out, fmt, quality=int(getattr(settings, "THUMBNAIL_QUALITY", 80)))
+    return out.getvalue()
+
+
+def _derivative_storage(fieldfile):
+    # content-addressed document storage keeps derivatives as plain files
+    return getattr(fieldfile.storage, "derivative_storage", fieldfile.storage)
+
+
+def generate_thumbnails(fieldfile) -> dict:
+    """Create any missing derivatives of `fieldfile`; returns {size: storage name}."""
+    with fieldfile.storage.open(fieldfile.name, "rb") as fh:
+        data = fh.read()
+    storage = _derivative_storage(fieldfile)
+    digest = hashlib.blake2b(data, digest_size=8).hexdigest()
+    fmt = _format()
+    ttl = int(getattr(settings, "THUMBNAIL_CACHE_SECONDS", 86400))
+
+    names = {}
+    for size, max_px in _sizes().items():
+        name = thumbnail_name(fieldfile.name, digest, size, fmt)
+        if not storage.exists(name):
+            name = storage.save(name, ContentFile(render_thumbnail(data, max_px, fmt)))
+        names[size] = name
+        cache.set(_cache_key(fieldfile.name, size), name, ttl)
+    return names
+
+
+def generate_thumbnails_quietly(fieldfile):
+    """generate_thumbnails() for upload paths: a bad image must not fail the upload."""
+    try:
+        return generate_thumbnails(fieldfile)
+    except Exception as e:
+        logger.warning("Could not create thumbnails for %s: %s", fieldfile.name, e)
+        return {}
+
+
+def _thumbnail_files(fieldfile):
+    """(storage, thumbs folder, names of the derivatives of `fieldfile` there)."""
+    storage = _derivative_storage(fieldfile)
+    folder, filename = posixpath.split(fieldfile.name)
+    stem = posixpath.splitext(filename)[0]
+    thumbs = posixpath.join(folder, THUMB_DIR)
+    pattern = re.compile(
+        rf"^{re.escape(stem)}-({'|'.join(map(re.escape, _sizes()))})-[0-9a-f]{{16}}\.({'|'.join(EXTENSIONS.values())})$"
+    )
+    try:
+        _, files = storage.listdir(thumbs)
+    except (FileNotFoundError, NotImplementedError):
+        files = []
+    return storage, thumbs, [name for name in files if pattern.match(name)]
+
+
+def find_thumbnail(fieldfile, size):
+    """Storage name of an existing `size` derivative of `fieldfile`, or None (never reads the original)."""
+    _, thumbs, files = _thumbnail_files(fieldfile)
+    prefix = f"{posixpath.splitext(posixpath.basename(fieldfile.name))[0]}-{size}-"
+    matches = sorted(name for name in files if name.startswith(prefix))
+    return posixpath.join(thumbs, matches[-1]) if matches else None
+
+
+def has_thumbnails(fieldfile) -> bool:
+    """True if every THUMBNAIL_SIZES derivative of `fieldfile` exists."""
+    return all(find_thumbnail(fieldfile, size) for size in _sizes())
+
+
+def thumbnail_url(fieldfile, request=None, size="thumb"):
+    """URL of the `size` derivative of `fieldfile`; None until one has been generated."""
+    if not fieldfile or size not in _sizes():
+        return None
+    key = _cache_key(fieldfile.name, size)
+    name = cache.get(key)
+    if name is None:
+        name = find_thumbnail(fieldfile, size) or ""
+        # a miss is re-checked after 5 minutes (upload time generation sets the key at once)
+        cache.set(key, name, int(getattr(settings, "THUMBNAIL_CACHE_SECONDS", 86400)) if name else 300)
+    if not name:
+        return None
+    url = _derivative_storage(fieldfile).url(name)
+    return request.build_absolute_uri(url) if request else url
+
+
+def delete_thumbnails(fieldfile):
+    """Remove every derivative of `fieldfile` (call when the original is replaced or deleted)."""
+    if not fieldfile:
+        return
+    storage, thumbs, files = _thumbnail_files(fieldfile)
+    for name in files:
+        storage.delete(posixpath.join(thumbs, name))
+    cache.delete_many([_cache_key(fieldfile.name, size) for size in _sizes()])
@@ -0,0 +1,254 @@
+"""
+Streaming and resumable uploads for KYC and loan documents.
+
+DocumentUploadParser replaces DRF's MultiPartParser on the document upload
+actions. Its HashingUploadHandler looks at each file as it arrives:
+
+  - the declared length and the running size are checked against
+    DOCUMENT_UPLOAD_MAX_BYTES, and the file's first bytes against the
+    allowed signatures (PDF, JPEG, PNG), so a bad file is dropped on its
+    first chunk instead of after the whole body has been spooled;
+  - the SHA-256 is computed while the chunks are written to the temporary
+    file, and kept as `upload.sha256`. clients.storage uses it instead of
+    re-reading the file and moves the temporary file into place instead of
+    copying it (keep FILE_UPLOAD_TEMP_DIR on the MEDIA_ROOT filesystem).
+
+Rejected files are skipped, not fatal: the parser records them in
+`request.upload_rejections` ({field: reason}) for the view to report.
+
+Resumable uploads (ChunkedUpload, /api/clients/uploads/) let a slow or
+flaky connection send a large scan in pieces: create a session with the
+file's name and size, PATCH raw chunks with an Upload-Offset header
+(restarting from the offset the server reports after a failure), then
+pass the session id to the KYC or loan upload action in place of the file
+(see claim_upload()).
+"""
+import hashlib
+import os
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile
+from django.db import transaction
+from django.http.multipartparser import MultiPartParser as DjangoMultiPartParser, MultiPartParserError
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import DataAndFiles, MultiPartParser
+
+
+SIGNATURES = {
+    "application/pdf": (b"%PDF-",),
+    "image/jpeg": (b"\xff\xd8\xff",),
+    "image/png": (b"\x89PNG\r\n\x1a\n",),
+}
+EXTENSIONS = {".pdf": "application/pdf", ".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".png": "image/png"}
+SNIFF_BYTES = 8
+
+
+class UploadOffsetMismatch(Exception):
+    def __init__(self, offset):
+        super().__init__(f"Expected offset {offset}.")
+        self.offset = offset
+
+
+def max_upload_bytes():
+    return int(getattr(settings, "DOCUMENT_UPLOAD_MAX_BYTES", 20 * 1024 * 1024))
+
+
+def check_filename(filename):
+    ext = os.path.splitext(filename or "")[1].lower()
+    if ext not in EXTENSIONS:
+        raise ValidationError(f"Unsupported file type; use one of: {', '.join(sorted(EXTENSIONS))}.")
+
+
+def sniff_type(head):
+    """Content type recognised from the first bytes of a file, or None."""
+    for content_type, signatures in SIGNATURES.items():
+        if any(head.startswith(signature) for signature in signatures):
+            return content_type
+    return None
+
+
+class HashedUploadedFile(TemporaryUploadedFile):
+    sha256 = None
+
+
+class HashingUploadHandler(FileUploadHandler):
+    def __init__(self, request=None, rejections=None):
+        super().__init__(request)
+        self.rejections = {} if rejections is None else rejections
+
+    def _reject(self, reason):
+        self.rejections[self.field_name] = reason
+        raise SkipFile(reason)
+
+    def new_file(self, field_name, file_name, content_type, content_length, charset=None, content_type_extra=None):
+        super().new_file(field_name, file_name, content_type, content_length, charset, content_type_extra)
+        self.limit = max_upload_bytes()
+        self.sha = hashlib.sha256()
+        self.head = b""
+        self.sniffed = None
+        # replace the previous (accepted) file first: on SkipFile Django closes
+        # self.file, and closing a TemporaryUploadedFile deletes it
+        self.file = HashedUploadedFile(self.file_name, self.content_type, 0, self.charset, self.content_type_extra)
+        try:
+            check_filename(file_name)
+        except ValidationError as e:
+            self._reject(e.messages[0])
+        if content_length and content_length > self.limit:
+            self._reject(f"File exceeds the {self.limit // (1024 * 1024)}MB limit.")
+
+    def _check_head(self, final=False):
+        if self.sniffed or (len(self.head) < SNIFF_BYTES and not final):
+            return
+        self.sniffed = sniff_type(self.head)
+        if self.sniffed is None:
+            self._reject("File content is not a PDF, JPEG or PNG document.")
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > self.limit:
+            self._reject(f"File exceeds the {self.limit // (1024 * 1024)}MB limit.")
+        if self.sniffed is None:
+            self.head += raw_data[:SNIFF_BYTES]
+            self._check_head()
+        self.sha.update(raw_data)
+        self.file.write(raw_data)
+
+    def file_complete(self, file_size):
+        try:
+            self._check_head(final=True)
+        except SkipFile:
+            # too short to sniff while streaming; SkipFile is not caught here, so drop it quietly
+            self.file.close()
+            return None
+        self.file.seek(0)
+        self.file.size = file_size
+        self.file.sha256 = self.sha.hexdigest()
+        self.file.content_type = self.sniffed
+        return self.file
+
+    def upload_interrupted(self):
+        if getattr(self, "file", None) is not None:
+            self.file.close()
+
+
+class DocumentUploadParser(MultiPartParser):
+    """MultiPartParser that streams files through HashingUploadHandler."""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        request = parser_context["request"]
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        meta = request.META.copy()
+        meta["CONTENT_TYPE"] = media_type
+        request.upload_rejections = {}
+        handlers = [HashingUploadHandler(request, request.upload_rejections)]
+        try:
+            data, files = DjangoMultiPartParser(meta, stream, handlers, encoding).parse()
+            return DataAndFiles(data, files)
+        except MultiPartParserError as exc:
+            raise ParseError(f"Multipart form parse error - {exc}")
+
+
+def upload_rejections(request):
+    """{field: reason} for the files DocumentUploadParser skipped (parses the request if needed)."""
+    request.data  # rejections are only known once the body is parsed
+    return getattr(request, "upload_rejections", {})
+
+
+# ---- resumable uploads ----
+
+def session_dir():
+    return str(getattr(settings, "DOCUMENT_UPLOAD_SESSION_DIR", os.path.join(settings.BASE_DIR, "upload_sessions")))
+
+
+def start_upload(user, filename, size):
+    from .models import ChunkedUpload
+
+    check_filename(filename)
+    if size <= 0:
+        raise ValidationError("size must be a positive number of bytes.")
+    if size > max_upload_bytes():
+        raise ValidationError(f"File exceeds the {max_upload_bytes() // (1024 * 1024)}MB limit.")
+    upload = ChunkedUpload.objects.create(created_by=user, filename=os.path.basename(filename)[:255], size=size)
+    os.makedirs(session_dir(), exist_ok=True)
+    open(upload.part_path, "wb").close()
+    return upload
+
+
+def append_chunk(upload_id, offset, stream, length):
+    """
+    Write `length` bytes from `stream` at `offset` of the upload. Raises
+    UploadOffsetMismatch unless `offset` is where the upload stands.
+    """
+    from .models import ChunkedUpload
+
+    chunk_limit = int(getattr(settings, "DOCUMENT_UPLOAD_CHUNK_BYTES", 1024 * 1024))
+    with transaction.atomic():
+        upload = ChunkedUpload.objects.select_for_update().get(pk=upload_id)
+        if offset != upload.received:
+            raise UploadOffsetMismatch(upload.received)
+        if length <= 0 or length > chunk_limit:
+            raise ValidationError(f"Chunks must be between 1 and {chunk_limit} bytes.")
+        if offset + length > upload.size:
+            raise ValidationError("Chunk runs past the declared file size.")
+
+        written = 0
+        with open(upload.part_path, "r+b") as fh:
+            fh.seek(offset)
+            while written < length:
+                data = stream.read(min(64 * 1024, length - written))
+                if not data:
+                    break
+                if offset == 0 and written == 0 and sniff_type(data[:SNIFF_BYTES]) is None:
+                    raise ValidationError("File content is not a PDF, JPEG or PNG document.")
+                fh.write(data)
+                written += len(data)
+            # drop anything past the acknowledged offset (a retried, longer chunk)
+            fh.truncate(offset + written)
+
+        upload.received = offset + written
+        if upload.complete:
+            sha = hashlib.sha256()
+            with open(upload.part_path, "rb") as fh:
+                for block in iter(lambda: fh.read(1024 * 1024), b""):
+                    sha.update(block)
+            upload.sha256 = sha.hexdigest()
+        upload.save(update_fields=["received", "sha256", "updated_at"])
+    return upload
+
+
+class CompletedUpload(File):
+    """A finished ChunkedUpload as a File; storage moves it instead of copying."""
+
+    def __init__(self, upload):
+        super().__init__(open(upload.part_path, "rb"), name=upload.filename)
+        self.upload = upload
+        self.sha256 = upload.sha256
+
+    def temporary_file_path(self):
+        return self.upload.part_path
+
+    def discard(self):
+        """Close the file and remove its upload session once the transaction commits."""
+        self.close()
+        transaction.on_commit(self.upload.delete)
+
+
+def claim_upload(upload_id, user):
+    """
+    The finished upload `upload_id` of `user` as a File, for saving into a
+    document field. Call discard() on it once the document is saved.
+    """
+    from .models import ChunkedUpload
+
+    try:
+        upload = ChunkedUpload.objects.filter(pk=upload_id, created_by=user).first()
+    except (ValueError, ValidationError):
+        upload = None
+    if upload is None or not os.path.exists(upload.part_path):
+        raise ValidationError("Upload not found.")
+    if not upload.complete:
+        raise ValidationError(f"Upload is incomplete ({upload.received} of {upload.size} bytes received).")
+    return CompletedUpload(upload)
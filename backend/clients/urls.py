@@ -1,8 +1,9 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ClientViewSet
+from .views import ChunkedUploadViewSet, ClientViewSet
 
 router = DefaultRouter()
+router.register(r'uploads', ChunkedUploadViewSet, basename='chunked-upload')
 router.register(r'', ClientViewSet, basename='client')
 
 urlpatterns = [
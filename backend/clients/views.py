@@ -2,16 +2,24 @@ from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from rest_framework.parsers import MultiPartParser, FormParser
+from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.shortcuts import get_object_or_404
 from django.db import transaction
 
-from .models import Client, KYC, KYCDocument
+from .models import ChunkedUpload, Client, KYC, KYCDocument
 from .serializers import (
     ClientSerializer, KYCSerializer, KYCDocumentSerializer,
-    InitiateKYCSerializer, ApproveKYCSerializer, RejectKYCSerializer
+    InitiateKYCSerializer, ApproveKYCSerializer, RejectKYCSerializer, ChunkedUploadSerializer
 )
 from .permissions import IsCashierOrBranchManagerReadOnly
-from accounts.models import AuditLog
+from .importer import import_clients, iter_rows
+from .search import filter_by_name, search_clients
+from .thumbnails import delete_thumbnails, generate_thumbnails_quietly
+from .uploads import (
+    CompletedUpload, DocumentUploadParser, UploadOffsetMismatch, append_chunk, claim_upload, start_upload,
+    upload_rejections,
+)
 from accounts.utils import create_audit_log, get_client_ip
 
 
@@ -22,7 +30,8 @@ class ClientViewSet(viewsets.ModelViewSet):
 
     # ✅ STRICT: branch scoping for operational roles
     def get_queryset(self):
-        qs = super().get_queryset()
+        # branch for branch_display; KYC status / photo are denormalized on Client
+        qs = super().get_queryset().select_related('branch')
         user = self.request.user
         params = self.request.query_params
 
@@ -47,10 +56,30 @@ class ClientViewSet(viewsets.ModelViewSet):
             qs = qs.filter(status__iexact=status_param)
 
         if name:
-            qs = qs.filter(full_name__icontains=name)
+            qs = filter_by_name(qs, name)
 
         return qs
 
+    def list(self, request, *args, **kwargs):
+        """
+        ?search=<text> is the typeahead lookup: name, phone or national id,
+        ranked best first and capped at ?limit= (default CLIENT_SEARCH_LIMIT).
+        """
+        term = (request.query_params.get('search') or '').strip()
+        if not term:
+            return super().list(request, *args, **kwargs)
+
+        default_limit = int(getattr(settings, 'CLIENT_SEARCH_LIMIT', 20))
+        try:
+            limit = int(request.query_params.get('limit', default_limit))
+        except (TypeError, ValueError):
+            limit = default_limit
+        limit = max(1, min(limit, int(getattr(settings, 'CLIENT_SEARCH_MAX_LIMIT', 100))))
+
+        qs = search_clients(self.filter_queryset(self.get_queryset()), term).select_related('branch')[:limit]
+        serializer = self.get_serializer(qs, many=True)
+        return Response(serializer.data)
+
     # ✅ Prevent bypass: /clients/<id>/ from another branch
     def get_object(self):
         obj = get_object_or_404(self.get_queryset(), pk=self.kwargs['pk'])
@@ -61,7 +90,7 @@ class ClientViewSet(viewsets.ModelViewSet):
         client = serializer.save()
         # Audit log
         try:
-            AuditLog.objects.create(
+            create_audit_log(
                 actor=self.request.user,
                 action='CLIENT_CREATED',
                 target_type='Client',
@@ -78,7 +107,7 @@ class ClientViewSet(viewsets.ModelViewSet):
 
         if old_status != client.status:
             try:
-                AuditLog.objects.create(
+                create_audit_log(
                     actor=self.request.user,
                     action='CLIENT_STATUS_CHANGED',
                     target_type='Client',
@@ -147,6 +176,40 @@ class ClientViewSet(viewsets.ModelViewSet):
             status=status.HTTP_200_OK
         )
 
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser, FormParser])
+    def import_file(self, request):
+        """
+        Bulk onboarding: create clients in the caller's branch from a CSV or
+        XLSX file (columns full_name, national_id, phone, email, address).
+        Duplicate and invalid rows are skipped and listed per row in the
+        response; dry_run=1 validates without creating anything.
+        """
+        upload = request.FILES.get('file')
+        if not upload:
+            return Response({'detail': 'Upload the client file as "file".'}, status=status.HTTP_400_BAD_REQUEST)
+
+        branch = getattr(request.user, 'branch', None)
+        if not branch:
+            return Response(
+                {'detail': 'Your account is not assigned to a branch. Contact the super admin.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        dry_run = str(request.data.get('dry_run', '')).lower() in ('1', 'true', 'yes')
+        try:
+            report = import_clients(
+                iter_rows(upload, upload.name),
+                branch=branch,
+                actor=request.user,
+                ip_address=get_client_ip(request),
+                dry_run=dry_run,
+            )
+        except ValidationError as e:
+            return Response({'detail': e.messages[0]}, status=status.HTTP_400_BAD_REQUEST)
+
+        report['dry_run'] = dry_run
+        return Response(report, status=status.HTTP_200_OK if dry_run else status.HTTP_201_CREATED)
+
     @action(detail=True, methods=['post'], url_path='upload-photo', parser_classes=[MultiPartParser, FormParser])
     def upload_photo(self, request, pk=None):
         """
@@ -184,9 +247,12 @@ class ClientViewSet(viewsets.ModelViewSet):
             client.photo = photo_file
             client.save()
 
-            # Delete old photo file if it existed and is different
+            # Delete old photo file (and its thumbnails) if it existed and is different
             if old_photo and old_photo.name != client.photo.name:
-                old_photo.delete(save=False)
+                delete_thumbnails(old_photo)
+                # storage.delete, not old_photo.delete(): that would also blank client.photo
+                old_photo.storage.delete(old_photo.name)
+            generate_thumbnails_quietly(client.photo)
 
             create_audit_log(
                 actor=request.user,
@@ -286,7 +352,7 @@ class ClientViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-    @action(detail=True, methods=['post'], url_path='kyc/upload-documents', parser_classes=[MultiPartParser, FormParser])
+    @action(detail=True, methods=['post'], url_path='kyc/upload-documents', parser_classes=[DocumentUploadParser, FormParser])
     def upload_kyc_documents(self, request, pk=None):
         """Upload multiple documents for KYC (Cashier only)"""
         # ✅ Use get_object() so cross-branch IDs cannot be accessed
@@ -312,7 +378,8 @@ class ClientViewSet(viewsets.ModelViewSet):
             kyc.rejection_reason = None  # Clear rejection reason when resubmitting
             kyc.save()
 
-        # Expected format: files with keys like 'national_id', 'proof_of_address', 'photo', 'other'
+        # Expected format: files with keys like 'national_id', 'proof_of_address', 'photo', 'other',
+        # or '<key>_upload' with the id of a finished resumable upload (clients.uploads)
         document_type_mapping = {
             'national_id': 'NATIONAL_ID',
             'proof_of_address': 'PROOF_OF_ADDRESS',
@@ -321,21 +388,32 @@ class ClientViewSet(viewsets.ModelViewSet):
         }
 
         uploaded_documents = []
-        errors = []
+        errors = [
+            {field_name: [reason]}
+            for field_name, reason in upload_rejections(request).items()
+        ]
 
         for field_name, document_type in document_type_mapping.items():
             files = request.FILES.getlist(field_name)
-            if not files:
+            upload_id = request.data.get(f'{field_name}_upload')
+            if files:
+                file = files[-1]
+            elif upload_id:
+                try:
+                    file = claim_upload(upload_id, request.user)
+                except ValidationError as e:
+                    errors.append({f'{field_name}_upload': e.messages})
+                    continue
+            else:
                 continue
 
-            file = files[-1]
-
             serializer = KYCDocumentSerializer(
                 data={'document_type': document_type, 'file': file},
                 context={'request': request}
             )
             if not serializer.is_valid():
                 errors.append({field_name: serializer.errors})
+                file.close()
                 continue
 
             document, created = KYCDocument.objects.get_or_create(
@@ -352,6 +430,12 @@ class ClientViewSet(viewsets.ModelViewSet):
                 document.file = file
                 document.save()
 
+            if isinstance(file, CompletedUpload):
+                file.discard()
+
+            if document.document_type == 'PHOTO':
+                generate_thumbnails_quietly(document.file)
+
             uploaded_documents.append(document)
 
             create_audit_log(
@@ -505,3 +589,67 @@ class ClientViewSet(viewsets.ModelViewSet):
             },
             status=status.HTTP_405_METHOD_NOT_ALLOWED
         )
+
+
+class ChunkedUploadViewSet(viewsets.ViewSet):
+    """
+    Resumable document uploads (see clients.uploads).
+
+    POST   /api/clients/uploads/       {filename, size}, returns the upload id
+    GET    /api/clients/uploads/<id>/  current offset (where to resume)
+    PATCH  /api/clients/uploads/<id>/  raw bytes with an Upload-Offset header
+    DELETE /api/clients/uploads/<id>/  cancel
+
+    A finished upload is attached by passing its id to kyc/upload-documents
+    ('<key>_upload') or to a loan's upload_documents_bulk ('upload_<type id>').
+    """
+    lookup_value_regex = '[0-9a-f-]{36}'
+
+    def _get_upload(self, request, pk):
+        return get_object_or_404(ChunkedUpload, pk=pk, created_by=request.user)
+
+    def _respond(self, upload, status_code=status.HTTP_200_OK):
+        response = Response(ChunkedUploadSerializer(upload).data, status=status_code)
+        response['Upload-Offset'] = str(upload.received)
+        return response
+
+    def create(self, request):
+        serializer = ChunkedUploadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            upload = start_upload(request.user, **serializer.validated_data)
+        except ValidationError as e:
+            return Response({'detail': e.messages[0]}, status=status.HTTP_400_BAD_REQUEST)
+        return self._respond(upload, status.HTTP_201_CREATED)
+
+    def retrieve(self, request, pk=None):
+        return self._respond(self._get_upload(request, pk))
+
+    def partial_update(self, request, pk=None):
+        upload = self._get_upload(request, pk)
+        try:
+            offset = int(request.META['HTTP_UPLOAD_OFFSET'])
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except (KeyError, ValueError):
+            return Response(
+                {'detail': 'Upload-Offset and Content-Length headers are required.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            # the body is read straight from the request stream, never parsed
+            upload = append_chunk(upload.pk, offset, request.stream, length)
+        except UploadOffsetMismatch as e:
+            response = Response(
+                {'detail': f'Upload is at offset {e.offset}; resume from there.', 'offset': e.offset},
+                status=status.HTTP_409_CONFLICT
+            )
+            response['Upload-Offset'] = str(e.offset)
+            return response
+        except ValidationError as e:
+            return Response({'detail': e.messages[0]}, status=status.HTTP_400_BAD_REQUEST)
+        return self._respond(upload)
+
+    def destroy(self, request, pk=None):
+        self._get_upload(request, pk).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
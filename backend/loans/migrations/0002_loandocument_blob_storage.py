@@ -0,0 +1,26 @@
+# Generated by Django 6.0.2 on 2026-10-19 03:10
+
+import clients.storage
+import loans.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0001_initial'),
+        ('clients', '0010_document_blobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='loandocument',
+            name='original_filename',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='loandocument',
+            name='document_file',
+            field=models.FileField(storage=clients.storage.document_storage, upload_to=loans.models.loan_doc_upload_path),
+        ),
+    ]
@@ -1,7 +1,10 @@
 from django.db import models
 from django.conf import settings
 from django.core.validators import MinValueValidator
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
 from clients.models import Client
+from clients.storage import document_storage, release_document_file
 from accounts.models import Branch, AuditLog
 from django.utils import timezone
 from decimal import Decimal
@@ -148,7 +151,9 @@ class LoanDocument(models.Model):
     """Documents uploaded for a specific loan."""
     loan = models.ForeignKey(Loan, on_delete=models.CASCADE, related_name='documents')
     document_type = models.ForeignKey(LoanDocumentType, on_delete=models.PROTECT, null=False, blank=False)
-    document_file = models.FileField(upload_to=loan_doc_upload_path)
+    # stored once per content hash, see clients.storage
+    document_file = models.FileField(upload_to=loan_doc_upload_path, storage=document_storage)
+    original_filename = models.CharField(max_length=255, blank=True, default='')
     uploaded_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
     
@@ -163,6 +168,25 @@ class LoanDocument(models.Model):
     def __str__(self):
         return f"{self.loan} - {self.document_type}"
 
+    def save(self, *args, **kwargs):
+        """Keep the uploaded filename and release the previous file when it is replaced."""
+        replaced = None
+        if self.document_file and not self.document_file._committed:
+            self.original_filename = os.path.basename(self.document_file.name)[:255]
+            if self.pk:
+                old = LoanDocument.objects.filter(pk=self.pk).only('document_file').first()
+                if old and old.document_file:
+                    replaced = old.document_file
+        super().save(*args, **kwargs)
+        if replaced:
+            replaced.delete(save=False)
+
+
+@receiver(post_delete, sender=LoanDocument)
+def release_loan_document(sender, instance, **kwargs):
+    """Runs for queryset and cascade deletes too, which skip Model.delete()."""
+    release_document_file(instance.document_file)
+
 
 class RepaymentSchedule(models.Model):
     """Loan repayment schedule (auto-generated on disbursement)."""
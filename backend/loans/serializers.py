@@ -5,24 +5,27 @@ from .models import (
 )
 from clients.models import Client, KYC
 from clients.models import KYCDocument
-
-# helper to fetch photo url from client object (duplicate of clients.serializers util)
-def _get_client_photo_url(client, request=None):
-    try:
-        kyc = client.kyc
-        photo = kyc.documents.filter(document_type='PHOTO').only('file').first()
-        if photo and photo.file:
-            if request:
-                return request.build_absolute_uri(photo.file.url)
-            return photo.file.url
-    except (KYC.DoesNotExist, AttributeError):
-        pass
-    return None
+from clients.thumbnails import thumbnail_url
 from django.utils import timezone
 from django.db.utils import ProgrammingError
 from decimal import Decimal
 
 
+# helpers to render the client's KYC photo from the denormalized Client.photo_path
+# (no KYC queries); the thumbnail is of the same image as the photo URL
+def _get_client_photo_url(client, request=None):
+    photo = client.kyc_photo
+    if photo:
+        if request:
+            return request.build_absolute_uri(photo.url)
+        return photo.url
+    return None
+
+
+def _get_client_photo_thumb_url(client, request=None):
+    return thumbnail_url(client.kyc_photo, request)
+
+
 class LoanProductSerializer(serializers.ModelSerializer):
     class Meta:
         model = LoanProduct
@@ -61,7 +64,8 @@ class LoanDocumentSerializer(serializers.ModelSerializer):
     class Meta:
         model = LoanDocument
         fields = ['id', 'document_type', 'document_type_name', 'document_file', 'document_file_url',
-                  'label', 'description', 'uploaded_by_name', 'uploaded_at']
+                  'original_filename', 'label', 'description', 'uploaded_by_name', 'uploaded_at']
+        read_only_fields = ['original_filename']
     
     def get_document_file_url(self, obj):
         if obj.document_file:
@@ -108,11 +112,12 @@ class PenaltyWaiverSerializer(serializers.ModelSerializer):
 class LoanListSerializer(serializers.ModelSerializer):
     client_name = serializers.CharField(source='client.full_name', read_only=True)
     client_photo_url = serializers.SerializerMethodField(read_only=True)
+    client_photo_thumb_url = serializers.SerializerMethodField(read_only=True)
     product_name = serializers.CharField(source='product.name', read_only=True)
     
     class Meta:
         model = Loan
-        fields = ['id', 'client', 'client_name', 'client_photo_url', 'product_name', 'amount', 'purpose', 'term_months', 'status', 
+        fields = ['id', 'client', 'client_name', 'client_photo_url', 'client_photo_thumb_url', 'product_name', 'amount', 'purpose', 'term_months', 'status', 
                   'created_at', 'submitted_at', 'approved_at', 'disbursed_at']
 
     def get_client_photo_url(self, obj):
@@ -120,6 +125,10 @@ class LoanListSerializer(serializers.ModelSerializer):
         request = self.context.get('request')
         return _get_client_photo_url(obj.client, request)
 
+    def get_client_photo_thumb_url(self, obj):
+        """Return a small derivative of the client's photo for list avatars."""
+        return _get_client_photo_thumb_url(obj.client, self.context.get('request'))
+
 
 class LoanDetailSerializer(serializers.ModelSerializer):
     client = serializers.SerializerMethodField()
@@ -139,13 +148,6 @@ class LoanDetailSerializer(serializers.ModelSerializer):
                   'documents', 'schedule', 'repayments']
     
     def get_client(self, obj):
-        kyc_status = None
-        try:
-            kyc = KYC.objects.get(client=obj.client)
-            kyc_status = kyc.status
-        except KYC.DoesNotExist:
-            pass
-        
         return {
             'id': obj.client.id,
             'full_name': obj.client.full_name,
@@ -153,8 +155,9 @@ class LoanDetailSerializer(serializers.ModelSerializer):
             'phone': obj.client.phone,
             'email': obj.client.email,
             'status': obj.client.status,
-            'kyc_status': kyc_status,
+            'kyc_status': obj.client.kyc_status,
             'photo_url': _get_client_photo_url(obj.client, self.context.get('request')),
+            'photo_thumb_url': _get_client_photo_thumb_url(obj.client, self.context.get('request')),
         }
 
     def to_representation(self, instance):
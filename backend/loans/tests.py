@@ -0,0 +1,76 @@
+import shutil
+import tempfile
+from decimal import Decimal
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from accounts.models import Branch, User
+from clients.models import Client, DocumentBlob
+from .models import Loan, LoanDocument, LoanDocumentType, LoanProduct, LoanProductRequiredDocument
+
+
+class BulkDocumentUploadTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        branch = Branch.objects.create(name="Main", code="MAIN", region="East", phone="123", address="Addr")
+        officer = User.objects.create_user(
+            username="officer", email="officer@example.com", password="x", role="LOAN_OFFICER", branch=branch
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(officer)
+        product = LoanProduct.objects.create(
+            name="Salary", product_type="SALARY", min_amount=Decimal("100"), max_amount=Decimal("1000"),
+            interest_rate=Decimal("5"), term_months=6,
+        )
+        self.types = [
+            LoanDocumentType.objects.create(code=code, name=name)
+            for code, name in (("PAYSLIP", "PAYSLIP"), ("BANK", "BANK_STATEMENT"), ("EMPLOYER", "EMPLOYER_ATTESTATION"))
+        ]
+        for doc_type in self.types:
+            LoanProductRequiredDocument.objects.create(product=product, document_type=doc_type)
+        self.loan = Loan.objects.create(
+            client=Client.objects.create(full_name="Jane Doe", branch=branch),
+            product=product, branch=branch, amount=Decimal("500"), term_months=6,
+        )
+        self.url = f"/api/loans/{self.loan.id}/upload_documents_bulk/"
+
+    def _pdf(self, body):
+        return SimpleUploadedFile("scan.pdf", b"%PDF-1.4 " + body)
+
+    def test_upload_inserts_and_replaces_in_one_upsert(self):
+        payslip, bank, employer = self.types
+        LoanDocument.objects.create(loan=self.loan, document_type=payslip, document_file=self._pdf(b"old payslip"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.url, {
+                f"file_{payslip.id}": self._pdf(b"new payslip"),
+                f"file_{bank.id}": self._pdf(b"statement"),
+            }, format="multipart")
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(
+            sorted(doc["document_type_name"] for doc in response.data["uploaded_documents"]),
+            ["BANK_STATEMENT", "PAYSLIP"],
+        )
+        self.assertEqual([doc["code"] for doc in response.data["missing_documents"]], [employer.code])
+
+        self.assertEqual(LoanDocument.objects.filter(loan=self.loan).count(), 2)
+        with LoanDocument.objects.get(document_type=payslip).document_file.open("rb") as fh:
+            self.assertEqual(fh.read(), b"%PDF-1.4 new payslip")
+        # the replaced payslip's blob was released
+        self.assertEqual(sorted(DocumentBlob.objects.values_list("ref_count", flat=True)), [1, 1])
+
+    def test_unknown_document_types_fail_the_whole_request(self):
+        response = self.client.post(self.url, {
+            f"file_{self.types[0].id}": self._pdf(b"payslip"),
+            "file_9999": self._pdf(b"other"),
+        }, format="multipart")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["validation_errors"], ["Document type 9999 does not exist."])
+        self.assertFalse(LoanDocument.objects.exists())
@@ -4,12 +4,14 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.parsers import FormParser, JSONParser
 from django.shortcuts import get_object_or_404
 from django.db.models import Q
 from django.utils import timezone
 from datetime import datetime, timedelta
 from decimal import Decimal
 import logging
+import os
 
 from .models import (
     LoanProduct, LoanDocumentType, LoanProductRequiredDocument,
@@ -19,16 +21,18 @@ from .serializers import (
     LoanProductSerializer, LoanProductDetailSerializer, LoanDocumentTypeSerializer,
     LoanDetailSerializer, LoanListSerializer, LoanCreateUpdateSerializer,
     LoanDocumentUploadSerializer, LoanDocumentSerializer, LoanDisburseSerializer, RepaymentPostSerializer,
-    PenaltyWaiverRequestSerializer
+    PenaltyWaiverRequestSerializer, _get_client_photo_url, _get_client_photo_thumb_url
 )
 from .permissions import IsLoanOfficer, IsBranchManager, IsCashier
 from clients.models import Client, KYC, KYCDocument
-from accounts.models import AuditLog
+from clients.uploads import CompletedUpload, DocumentUploadParser, claim_upload, upload_rejections
+from accounts.utils import create_audit_log
 from django.core.exceptions import ValidationError
 from cash.hooks import (
     record_cash_loan_disbursement,
     record_cash_loan_repayment,
 )
+from reports.exports import export_response, iter_rows
 
 logger = logging.getLogger(__name__)
 
@@ -62,33 +66,21 @@ class LoanOfficerClientListView(viewsets.ViewSet):
             branch=user_branch
         )
         
-        # Filter for approved KYC
-        clients_with_approved_kyc = []
-        for client in clients:
-            try:
-                kyc = KYC.objects.get(client=client)
-                if kyc.status == 'APPROVED':
-                    # compute photo url if available
-                    photo_url = None
-                    try:
-                        photo_doc = client.kyc.documents.filter(document_type='PHOTO').only('file').first()
-                        if photo_doc and photo_doc.file:
-                            photo_url = request.build_absolute_uri(photo_doc.file.url) if request else photo_doc.file.url
-                    except Exception:
-                        photo_url = None
-
-                    clients_with_approved_kyc.append({
-                        'id': client.id,
-                        'full_name': client.full_name,
-                        'national_id': client.national_id,
-                        'phone': client.phone,
-                        'email': client.email,
-                        'status': client.status,
-                        'kyc_status': kyc.status,
-                        'photo_url': photo_url,
-                    })
-            except KYC.DoesNotExist:
-                pass
+        # Filter for approved KYC (kyc_status / photo_path are denormalized on Client)
+        clients_with_approved_kyc = [
+            {
+                'id': client.id,
+                'full_name': client.full_name,
+                'national_id': client.national_id,
+                'phone': client.phone,
+                'email': client.email,
+                'status': client.status,
+                'kyc_status': client.kyc_status,
+                'photo_url': _get_client_photo_url(client, request),
+                'photo_thumb_url': _get_client_photo_thumb_url(client, request),
+            }
+            for client in clients.filter(kyc_status='APPROVED')
+        ]
         
         if debug:
             return Response({
@@ -201,13 +193,7 @@ class LoanContextView(viewsets.ViewSet):
             missing_documents = [d for d in required_documents if not d['uploaded']]
         
         # include client photo if available
-        photo_url = None
-        try:
-            photo_doc = client.kyc.documents.filter(document_type='PHOTO').only('file').first()
-            if photo_doc and photo_doc.file:
-                photo_url = request.build_absolute_uri(photo_doc.file.url) if request else photo_doc.file.url
-        except Exception:
-            photo_url = None
+        photo_url = _get_client_photo_url(client, request)
 
         return Response({
             'client': {
@@ -261,6 +247,10 @@ class LoanViewSet(viewsets.ModelViewSet):
 
         return Loan.objects.none()
     
+    def filter_queryset(self, queryset):
+        # list/detail serializers render client (with its denormalized KYC fields) and product
+        return super().filter_queryset(queryset).select_related('client', 'product')
+
     def get_serializer_class(self):
         if self.action in ['create', 'update', 'partial_update']:
             return LoanCreateUpdateSerializer
@@ -310,9 +300,7 @@ class LoanViewSet(viewsets.ModelViewSet):
             if request is not None:
                 ip = request.META.get('REMOTE_ADDR') or request.META.get('HTTP_X_FORWARDED_FOR')
 
-            from accounts.models import AuditLog as AccountsAuditLog
-
-            AccountsAuditLog.objects.create(
+            create_audit_log(
                 actor=request.user,
                 action='LOAN_CREATED',
                 target_type='LOAN',
@@ -404,7 +392,7 @@ class LoanViewSet(viewsets.ModelViewSet):
         loan.save()
         
         try:
-            AuditLog.objects.create(
+            create_audit_log(
                 actor=request.user,
                 action='LOAN_SUBMITTED',
                 target_type='LOAN',
@@ -490,12 +478,13 @@ class LoanViewSet(viewsets.ModelViewSet):
         serializer = LoanDocumentSerializer(documents, many=True, context={'request': request})
         return Response(serializer.data)
     
-    @action(detail=True, methods=['post'])
+    @action(detail=True, methods=['post'], parser_classes=[DocumentUploadParser, FormParser, JSONParser])
     def upload_documents_bulk(self, request, pk=None):
         """POST /api/loans/<id>/upload_documents_bulk/ - Bulk upload multiple documents in one request.
         
         Expects multipart/form-data with files named: file_<document_type_id>
         Example: file_1, file_2 where 1, 2 are LoanDocumentType IDs
+        Finished resumable uploads (clients.uploads) go in as upload_<document_type_id>=<upload id>.
         
         Uses atomic transaction: all-or-nothing. If any file fails, entire request rolls back.
         """
@@ -511,37 +500,52 @@ class LoanViewSet(viewsets.ModelViewSet):
             )
         
         files = request.FILES
-        if not files:
+        upload_keys = [key for key in request.data if key.startswith('upload_')]
+        rejections = upload_rejections(request)
+        if not files and not upload_keys and not rejections:
             return Response(
                 {'error': 'No files provided.'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # PRE-VALIDATE all file keys and document types BEFORE entering atomic transaction
-        files_to_upload = []
-        validation_errors = []
-        
-        for file_key in files:
-            # Extract document_type_id from file key (e.g., "file_1" -> "1")
-            if not file_key.startswith('file_'):
+        # PRE-VALIDATE all keys BEFORE entering atomic transaction
+        # files the upload handler refused (type or size) while streaming
+        validation_errors = [f"{file_key}: {reason}" for file_key, reason in rejections.items()]
+        requested = []
+        for key in [*files, *upload_keys]:
+            # Extract document_type_id from the key (e.g., "file_1" -> 1, "upload_2" -> 2)
+            prefix = 'file_' if key in files else 'upload_'
+            if not key.startswith(prefix):
                 continue
-            
             try:
-                doc_type_id = int(file_key.replace('file_', ''))
-                file_obj = files[file_key]
-                
-                # Validate document type exists
-                if not LoanDocumentType.objects.filter(id=doc_type_id).exists():
-                    validation_errors.append(f"Document type {doc_type_id} does not exist.")
-                    continue
-                
-                files_to_upload.append((doc_type_id, file_obj, file_key))
-                
+                requested.append((int(key[len(prefix):]), key))
             except ValueError:
-                validation_errors.append(f"Invalid file key {file_key}: not a valid document type ID.")
+                validation_errors.append(f"Invalid {prefix[:-1]} key {key}: not a valid document type ID.")
+        
+        # Validate all document types with one query
+        doc_types = LoanDocumentType.objects.in_bulk({doc_type_id for doc_type_id, _ in requested})
+        files_to_upload = []
+        seen_types = set()
+        for doc_type_id, key in requested:
+            if doc_type_id not in doc_types:
+                validation_errors.append(f"Document type {doc_type_id} does not exist.")
+                continue
+            if doc_type_id in seen_types:
+                validation_errors.append(f"Document type {doc_type_id} is given more than once.")
+                continue
+            seen_types.add(doc_type_id)
+            if key in files:
+                files_to_upload.append((doc_type_id, files[key], key))
+                continue
+            try:
+                files_to_upload.append((doc_type_id, claim_upload(request.data[key], request.user), key))
+            except ValidationError as e:
+                validation_errors.append(f"{key}: {e.messages[0]}")
         
         # Return validation errors if any
         if validation_errors:
+            for _, file_obj, _ in files_to_upload:
+                file_obj.close()
             return Response(
                 {'error': 'Validation failed.', 'validation_errors': validation_errors},
                 status=status.HTTP_400_BAD_REQUEST
@@ -553,33 +557,38 @@ class LoanViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # ATOMIC TRANSACTION: Create all LoanDocument records all-or-nothing
-        uploaded_docs = []
-        
+        # ATOMIC TRANSACTION: upsert all LoanDocument records all-or-nothing
         try:
             with transaction.atomic():
-                for doc_type_id, file_obj, file_key in files_to_upload:
-                    existing_doc = LoanDocument.objects.filter(
+                existing = {
+                    doc.document_type_id: doc
+                    for doc in LoanDocument.objects.filter(loan=loan).only('id', 'document_type_id', 'document_file', 'uploaded_at')
+                }
+                documents = [
+                    LoanDocument(
                         loan=loan,
-                        document_type_id=doc_type_id
-                    ).first()
-
-                    if existing_doc:
-                        existing_doc.document_file = file_obj
-                        existing_doc.uploaded_by = request.user
-                        existing_doc.save()
-                        doc = existing_doc
-                    else:
-                        doc = LoanDocument.objects.create(
-                            loan=loan,
-                            document_type_id=doc_type_id,
-                            document_file=file_obj,
-                            uploaded_by=request.user
-                        )
-
-                    uploaded_docs.append(
-                        LoanDocumentSerializer(doc, context={'request': request}).data
+                        document_type=doc_types[doc_type_id],
+                        document_file=file_obj,
+                        original_filename=os.path.basename(file_obj.name)[:255],
+                        uploaded_by=request.user,
                     )
+                    for doc_type_id, file_obj, _ in files_to_upload
+                ]
+                # one INSERT ... ON CONFLICT (loan, document_type) DO UPDATE; files are stored as rows are built
+                LoanDocument.objects.bulk_create(
+                    documents,
+                    update_conflicts=True,
+                    unique_fields=['loan', 'document_type'],
+                    update_fields=['document_file', 'original_filename', 'uploaded_by'],
+                )
+                for doc in documents:
+                    replaced = existing.get(doc.document_type_id)
+                    if replaced is None:
+                        continue
+                    # bulk_create skips LoanDocument.save(): release the replaced file here
+                    doc.uploaded_at = replaced.uploaded_at
+                    if replaced.document_file:
+                        replaced.document_file.delete(save=False)
         
         except Exception as exc:
             logger.error(f"Transaction error in bulk upload for loan {loan.id}: {str(exc)}", exc_info=True)
@@ -588,17 +597,21 @@ class LoanViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Calculate and return missing documents
-        required_docs = LoanProductRequiredDocument.objects.filter(
-            product=loan.product
-        ).values_list('document_type_id', flat=True)
+        for _, file_obj, _ in files_to_upload:
+            if isinstance(file_obj, CompletedUpload):
+                file_obj.discard()
         
-        uploaded_doc_types = LoanDocument.objects.filter(
-            loan=loan
-        ).values_list('document_type_id', flat=True)
+        uploaded_docs = LoanDocumentSerializer(documents, many=True, context={'request': request}).data
         
-        missing_type_ids = set(required_docs) - set(uploaded_doc_types)
-        missing_docs = LoanDocumentType.objects.filter(id__in=missing_type_ids)
+        # Calculate missing documents from what is now on the loan (no re-query)
+        uploaded_doc_types = set(existing) | {doc.document_type_id for doc in documents}
+        required_docs = LoanProductRequiredDocument.objects.filter(
+            product_id=loan.product_id
+        ).select_related('document_type')
+        missing_docs = sorted(
+            (req.document_type for req in required_docs if req.document_type_id not in uploaded_doc_types),
+            key=lambda doc_type: doc_type.code
+        )
         
         response_data = {
             'uploaded_documents': uploaded_docs,
@@ -688,7 +701,7 @@ class LoanViewSet(viewsets.ModelViewSet):
             loan.save()
 
             try:
-                AuditLog.objects.create(
+                create_audit_log(
                     actor=request.user,
                     action='LOAN_CLOSED',
                     target_type='LOAN',
@@ -699,7 +712,7 @@ class LoanViewSet(viewsets.ModelViewSet):
                 pass
         
         try:
-            AuditLog.objects.create(
+            create_audit_log(
                 actor=request.user,
                 action='REPAYMENT_POSTED',
                 target_type='LOAN',
@@ -754,7 +767,7 @@ class LoanViewSet(viewsets.ModelViewSet):
             schedule.save()
         
         try:
-            AuditLog.objects.create(
+            create_audit_log(
                 actor=request.user,
                 action='PENALTY_WAIVED',
                 target_type='LOAN',
@@ -786,6 +799,34 @@ class BranchManagerLoanViewSet(viewsets.ViewSet):
         serializer = LoanListSerializer(loans, many=True)
         return Response(serializer.data)
     
+    @action(detail=False, methods=['get'], url_path='repayments/export')
+    def repayments_export(self, request):
+        """
+        GET /api/branch-manager/loans/repayments/export/
+        Stream the branch's repayment transactions as CSV (or XLSX with ?file_format=xlsx).
+        Optional filters: date_from, date_to (YYYY-MM-DD, inclusive), payment_method.
+        """
+        qs = RepaymentTransaction.objects.filter(loan__branch=getattr(request.user, 'branch', None))
+        try:
+            if request.query_params.get('date_from'):
+                qs = qs.filter(paid_at__date__gte=datetime.strptime(request.query_params['date_from'], '%Y-%m-%d').date())
+            if request.query_params.get('date_to'):
+                qs = qs.filter(paid_at__date__lte=datetime.strptime(request.query_params['date_to'], '%Y-%m-%d').date())
+        except ValueError:
+            return Response({'error': 'Dates must be YYYY-MM-DD.'}, status=status.HTTP_400_BAD_REQUEST)
+        if request.query_params.get('payment_method'):
+            qs = qs.filter(payment_method=request.query_params['payment_method'])
+
+        fields = [
+            'id', 'paid_at', 'loan_id', 'loan__client__full_name', 'amount',
+            'payment_method', 'payment_reference', 'recorded_by__username', 'notes',
+        ]
+        header = [
+            'id', 'paid_at', 'loan_id', 'client_name', 'amount',
+            'payment_method', 'payment_reference', 'recorded_by', 'notes',
+        ]
+        return export_response(request, 'loan_repayments', header, iter_rows(qs.order_by('paid_at', 'id'), fields))
+
     @action(detail=False, methods=['get'], url_path='(?P<loan_id>[^/.]+)')
     def retrieve(self, request, loan_id=None):
         """GET /api/branch-manager/loans/<id>/ - Retrieve specific loan details for branch manager."""
@@ -815,7 +856,7 @@ class BranchManagerLoanViewSet(viewsets.ViewSet):
         loan.save()
         
         try:
-            AuditLog.objects.create(
+            create_audit_log(
                 actor=request.user,
                 action='LOAN_APPROVED',
                 target_type='LOAN',
@@ -847,7 +888,7 @@ class BranchManagerLoanViewSet(viewsets.ViewSet):
         loan.save()
         
         try:
-            AuditLog.objects.create(
+            create_audit_log(
                 actor=request.user,
                 action='LOAN_REJECTED',
                 target_type='LOAN',
@@ -879,7 +920,7 @@ class BranchManagerLoanViewSet(viewsets.ViewSet):
         loan.save()
         
         try:
-            AuditLog.objects.create(
+            create_audit_log(
                 actor=request.user,
                 action='LOAN_CHANGES_REQUESTED',
                 target_type='LOAN',
@@ -954,7 +995,7 @@ class CashierLoanViewSet(viewsets.ViewSet):
             )
         
         try:
-            AuditLog.objects.create(
+            create_audit_log(
                 actor=request.user,
                 action='LOAN_DISBURSED',
                 target_type='LOAN',
@@ -44,10 +44,15 @@ else:
 FRONTEND_URL = config("FRONTEND_URL", default="http://localhost:3000")
 
 # --- Email (Gmail SMTP) ---
-EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
+# Used by the email outbox worker; e.g. django.core.mail.backends.filebased.EmailBackend
+# (with EMAIL_FILE_PATH) or .console.EmailBackend for local testing.
+EMAIL_BACKEND = config("EMAIL_BACKEND", default="django.core.mail.backends.smtp.EmailBackend")
+EMAIL_FILE_PATH = config("EMAIL_FILE_PATH", default=str(BASE_DIR / "sent_emails"))
 EMAIL_HOST = config("EMAIL_HOST", default="smtp.gmail.com")
 EMAIL_PORT = config("EMAIL_PORT", default=587, cast=int)
 EMAIL_USE_TLS = config("EMAIL_USE_TLS", default=True, cast=bool)
+# Seconds before an SMTP connect/send gives up.
+EMAIL_TIMEOUT = config("EMAIL_TIMEOUT", default=30, cast=int)
 
 EMAIL_HOST_USER = config("EMAIL_HOST_USER", default="")
 EMAIL_HOST_PASSWORD = config("EMAIL_HOST_PASSWORD", default="")
@@ -64,6 +69,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',  # trigram / full-text lookups (clients.search)
     'rest_framework',
     'corsheaders',
     'accounts',
@@ -84,6 +90,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'accounts.audit.AuditBufferMiddleware',
     
 ]
 
@@ -114,6 +121,9 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'mfi.wsgi.application'
+# Serve with an ASGI server (e.g. `uvicorn mfi.asgi:application`) so the async
+# login views hash passwords off the request workers (accounts.passwords).
+ASGI_APPLICATION = 'mfi.asgi.application'
 
 
 # Database
@@ -133,7 +143,8 @@ DATABASES = {
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # simplejwt, with request.user built from token claims (no user/branch query)
+        'accounts.authentication.ClaimsJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -188,4 +199,138 @@ STATIC_URL = 'static/'
 
 # Media files (User uploads)
 MEDIA_URL = '/media/'
-MEDIA_ROOT = BASE_DIR / 'media'
\ No newline at end of file
+MEDIA_ROOT = BASE_DIR / 'media'
+# --- Cash ledger partitioning / archival ---
+# Monthly partitions pre-created ahead of time by `manage.py create_cash_ledger_partitions`.
+CASH_LEDGER_PARTITION_MONTHS_AHEAD = config("CASH_LEDGER_PARTITION_MONTHS_AHEAD", default=3, cast=int)
+# Where `manage.py archive_cash_ledger` writes gzip JSONL month files (--mode jsonl).
+CASH_LEDGER_ARCHIVE_DIR = config("CASH_LEDGER_ARCHIVE_DIR", default=str(BASE_DIR / "archive" / "cash_ledger"))
+# Schema that receives detached month partitions (--mode schema).
+CASH_LEDGER_ARCHIVE_SCHEMA = config("CASH_LEDGER_ARCHIVE_SCHEMA", default="cash_archive")
+
+# --- Cash posting ---
+# Max wait (ms) for the teller session row lock taken by cash.services.post_cash_entry (PostgreSQL).
+CASH_SESSION_LOCK_TIMEOUT_MS = config("CASH_SESSION_LOCK_TIMEOUT_MS", default=5000, cast=int)
+
+# --- Caching ---
+# Use a shared backend in production (e.g. django.core.cache.backends.redis.RedisCache)
+# so report cache invalidation reaches every worker process.
+CACHES = {
+    "default": {
+        "BACKEND": config("CACHE_BACKEND", default="django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": config("CACHE_LOCATION", default="mfi-default"),
+    }
+}
+
+# --- Reports ---
+# Open days are only cached when this alias is shared by all workers (Redis,
+# Memcached, ...); with a per-process cache only closed, reviewed days are.
+REPORT_CACHE_ALIAS = config("REPORT_CACHE_ALIAS", default="default")
+# Lifetime (s) of cached reports for days that are still open; closed, reviewed days never expire.
+REPORT_CACHE_TTL = config("REPORT_CACHE_TTL", default=300, cast=int)
+# Background report jobs (`manage.py run_report_worker`); results go to MEDIA_ROOT/reports/jobs/.
+REPORT_WORKER_PROCESSES = config("REPORT_WORKER_PROCESSES", default=2, cast=int)
+REPORT_WORKER_POLL_SECONDS = config("REPORT_WORKER_POLL_SECONDS", default=2, cast=float)
+REPORT_JOB_TIMEOUT_SECONDS = config("REPORT_JOB_TIMEOUT_SECONDS", default=1800, cast=int)
+REPORT_JOB_MAX_ATTEMPTS = config("REPORT_JOB_MAX_ATTEMPTS", default=3, cast=int)
+# Longest date range (days) accepted by the *_range report endpoints.
+REPORT_MAX_RANGE_DAYS = config("REPORT_MAX_RANGE_DAYS", default=366, cast=int)
+# Longer ranges are queued as ReportJobs (202 + Location) instead of built in the request.
+REPORT_SYNC_MAX_RANGE_DAYS = config("REPORT_SYNC_MAX_RANGE_DAYS", default=7, cast=int)
+
+# --- Audit log writer (accounts.audit) ---
+# True: audit batches are written by a background thread instead of the request thread.
+AUDIT_ASYNC = config("AUDIT_ASYNC", default=False, cast=bool)
+# Bounded queue (batches) for the background writer; overflow spills to disk.
+AUDIT_QUEUE_SIZE = config("AUDIT_QUEUE_SIZE", default=1000, cast=int)
+AUDIT_BATCH_SIZE = config("AUDIT_BATCH_SIZE", default=500, cast=int)
+# Spill files are loaded back with `manage.py replay_audit_spill`.
+AUDIT_SPILL_DIR = config("AUDIT_SPILL_DIR", default=str(BASE_DIR / "audit_spill"))
+
+# --- Audit log archive (accounts.audit_archive) ---
+# `manage.py archive_audit_logs` moves rows older than this out of the table.
+AUDIT_RETENTION_DAYS = config("AUDIT_RETENTION_DAYS", default=365, cast=int)
+AUDIT_ARCHIVE_DIR = config("AUDIT_ARCHIVE_DIR", default=str(BASE_DIR / "archive" / "audit"))
+# Rows per gzip block; a lookup decompresses whole blocks.
+AUDIT_ARCHIVE_BLOCK_ROWS = config("AUDIT_ARCHIVE_BLOCK_ROWS", default=1000, cast=int)
+# Ranked audit log search (PostgreSQL) scores at most this many of the newest matches.
+AUDIT_SEARCH_MAX_CANDIDATES = config("AUDIT_SEARCH_MAX_CANDIDATES", default=5000, cast=int)
+
+# --- Email outbox (accounts.outbox, `manage.py run_email_worker`) ---
+EMAIL_OUTBOX_BATCH_SIZE = config("EMAIL_OUTBOX_BATCH_SIZE", default=50, cast=int)
+EMAIL_OUTBOX_POLL_SECONDS = config("EMAIL_OUTBOX_POLL_SECONDS", default=5, cast=float)
+EMAIL_OUTBOX_MAX_ATTEMPTS = config("EMAIL_OUTBOX_MAX_ATTEMPTS", default=5, cast=int)
+# Retry delay doubles per attempt: 60s, 120s, 240s, ... capped.
+EMAIL_OUTBOX_BACKOFF_SECONDS = config("EMAIL_OUTBOX_BACKOFF_SECONDS", default=60, cast=int)
+EMAIL_OUTBOX_BACKOFF_MAX_SECONDS = config("EMAIL_OUTBOX_BACKOFF_MAX_SECONDS", default=3600, cast=int)
+# Emails claimed longer than this (s) by a worker that died are queued again.
+EMAIL_OUTBOX_CLAIM_TIMEOUT = config("EMAIL_OUTBOX_CLAIM_TIMEOUT", default=300, cast=int)
+
+# --- Login attempts (accounts.login_attempts) ---
+# Failed-login counts use this cache only if it is Redis or Memcached (atomic across
+# workers); with any other backend they are counted on the user row instead.
+LOGIN_ATTEMPT_CACHE_ALIAS = config("LOGIN_ATTEMPT_CACHE_ALIAS", default="default")
+# Failed attempts are forgotten after this long without a lockout or success.
+LOGIN_FAILURE_TTL_SECONDS = config("LOGIN_FAILURE_TTL_SECONDS", default=86400, cast=int)
+# Per client IP: at most LOGIN_IP_MAX_ATTEMPTS failed logins per sliding LOGIN_IP_WINDOW_SECONDS
+# (successful logins are not counted).
+LOGIN_IP_MAX_ATTEMPTS = config("LOGIN_IP_MAX_ATTEMPTS", default=20, cast=int)
+LOGIN_IP_WINDOW_SECONDS = config("LOGIN_IP_WINDOW_SECONDS", default=60, cast=int)
+# Reverse proxies in front of the app that append to X-Forwarded-For. 0 throttles on
+# REMOTE_ADDR; set it to the number of proxies, or clients can pick their own address.
+LOGIN_TRUSTED_PROXY_COUNT = config("LOGIN_TRUSTED_PROXY_COUNT", default=0, cast=int)
+
+# --- JWT claims authentication (accounts.authentication) ---
+# Seconds a user's (token_version, is_active) is cached for revocation checks.
+# Only a cache shared by all workers is used (revoke_tokens() then clears it
+# everywhere); with a per-process backend such as LocMem it is read per request.
+AUTH_STATE_CACHE_ALIAS = config("AUTH_STATE_CACHE_ALIAS", default="default")
+AUTH_STATE_CACHE_TTL = config("AUTH_STATE_CACHE_TTL", default=60, cast=int)
+
+# --- Login password hashing (accounts.passwords) ---
+# Threads per process verifying passwords for the async login views.
+LOGIN_HASH_WORKERS = config("LOGIN_HASH_WORKERS", default=4, cast=int)
+# Verifications queued or running per process before logins get 503 + Retry-After.
+LOGIN_HASH_MAX_PENDING = config("LOGIN_HASH_MAX_PENDING", default=64, cast=int)
+
+# --- Client search (clients.search) ---
+# Typeahead results returned by GET /clients/?search=...; ?limit= may ask for up to the max.
+CLIENT_SEARCH_LIMIT = config("CLIENT_SEARCH_LIMIT", default=20, cast=int)
+CLIENT_SEARCH_MAX_LIMIT = config("CLIENT_SEARCH_MAX_LIMIT", default=100, cast=int)
+
+# --- Client identity keys (clients.identity) ---
+# Phones without an international prefix are stored in E.164 under this country code.
+CLIENT_PHONE_COUNTRY_CODE = config("CLIENT_PHONE_COUNTRY_CODE", default="237")
+CLIENT_PHONE_NATIONAL_DIGITS = config("CLIENT_PHONE_NATIONAL_DIGITS", default=9, cast=int)
+
+# --- Client bulk import (clients.importer) ---
+# Rows per duplicate-check query / bulk_create / audit batch.
+CLIENT_IMPORT_CHUNK_SIZE = config("CLIENT_IMPORT_CHUNK_SIZE", default=1000, cast=int)
+
+# --- Photo thumbnails (clients.thumbnails) ---
+# Derivatives generated per client / KYC photo: name -> longest side in px.
+THUMBNAIL_SIZES = {"thumb": 128, "medium": 512}
+# WEBP (falls back to JPEG if Pillow lacks WebP support) or JPEG.
+THUMBNAIL_FORMAT = config("THUMBNAIL_FORMAT", default="WEBP")
+THUMBNAIL_QUALITY = config("THUMBNAIL_QUALITY", default=80, cast=int)
+# How long the original -> derivative name mapping stays in the cache.
+THUMBNAIL_CACHE_SECONDS = config("THUMBNAIL_CACHE_SECONDS", default=86400, cast=int)
+
+# --- Document storage (clients.storage) ---
+# KYC and loan documents are stored once per SHA-256 under MEDIA_ROOT/documents/.
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+    "documents": {"BACKEND": config("DOCUMENT_STORAGE_BACKEND", default="clients.storage.ContentAddressedStorage")},
+}
+
+# --- Document uploads (clients.uploads) ---
+# Largest KYC / loan document accepted, whether posted whole or in chunks.
+DOCUMENT_UPLOAD_MAX_BYTES = config("DOCUMENT_UPLOAD_MAX_BYTES", default=20 * 1024 * 1024, cast=int)
+# Largest chunk of a resumable upload (stays under DATA_UPLOAD_MAX_MEMORY_SIZE).
+DOCUMENT_UPLOAD_CHUNK_BYTES = config("DOCUMENT_UPLOAD_CHUNK_BYTES", default=1024 * 1024, cast=int)
+# Partial files of resumable uploads. Keep this and FILE_UPLOAD_TEMP_DIR on the
+# MEDIA_ROOT filesystem so finished uploads are renamed into storage, not copied.
+DOCUMENT_UPLOAD_SESSION_DIR = config("DOCUMENT_UPLOAD_SESSION_DIR", default=str(BASE_DIR / "upload_sessions"))
+# Unfinished uploads idle this long are removed by purge_upload_sessions.
+DOCUMENT_UPLOAD_SESSION_HOURS = config("DOCUMENT_UPLOAD_SESSION_HOURS", default=24, cast=int)
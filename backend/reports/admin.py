@@ -1,3 +1,9 @@
 from django.contrib import admin
+from .models import ReportJob
 
-# Register your models here.
+
+@admin.register(ReportJob)
+class ReportJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "report_type", "status", "requested_by", "attempts", "created_at", "finished_at")
+    list_filter = ("report_type", "status")
+    search_fields = ("requested_by__username",)
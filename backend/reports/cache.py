@@ -0,0 +1,119 @@
+"""
+Report response cache keyed by (report, branch, date).
+
+Each (branch, day) has a generation counter that is part of every cache key;
+bumping it (see invalidate_branch_day) orphans all cached reports for that
+branch and day at once. Days whose sessions are all CLOSED and reviewed
+are cached without expiry, open days only for REPORT_CACHE_TTL seconds,
+and only if REPORT_CACHE_ALIAS is shared by all workers (a bump in one
+worker must reach the others).
+Cached entries carry an ETag and Last-Modified so dashboards can
+revalidate with conditional GETs.
+"""
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+from accounts.utils import cache_is_shared
+from cash.models import TellerSession, TellerSessionStatus
+
+
+def _alias():
+    return getattr(settings, "REPORT_CACHE_ALIAS", "default")
+
+
+def _cache():
+    return caches[_alias()]
+
+
+def _generation_key(branch_id, day):
+    return f"reports:gen:{branch_id}:{day.isoformat()}"
+
+
+def _generation(branch_id, day) -> int:
+    cache = _cache()
+    key = _generation_key(branch_id, day)
+    gen = cache.get(key)
+    if gen is None:
+        # time-based start so an evicted counter never reuses an old generation
+        cache.add(key, int(time.time() * 1000), None)
+        gen = cache.get(key)
+    return gen
+
+
+def invalidate_branch_day(branch_id, day):
+    cache = _cache()
+    key = _generation_key(branch_id, day)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, int(time.time() * 1000), None)
+
+
+def is_period_closed(branch_id, day) -> bool:
+    """A past day whose sessions are all CLOSED and reviewed can no longer change."""
+    if day >= timezone.localdate():
+        return False
+    start = timezone.make_aware(timezone.datetime(day.year, day.month, day.day))
+    end = start + timezone.timedelta(days=1)
+    return not (
+        TellerSession.objects.filter(branch_id=branch_id, allocated_at__gte=start, allocated_at__lt=end)
+        .exclude(status=TellerSessionStatus.CLOSED, reviewed_at__isnull=False)
+        .exists()
+    )
+
+
+def _entry(data):
+    body = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True)
+    return {
+        "data": data,
+        "etag": quote_etag(hashlib.sha256(body.encode("utf-8")).hexdigest()),
+        "last_modified": int(time.time()),
+    }
+
+
+def _conditional_response(request, entry):
+    response = get_conditional_response(request, etag=entry["etag"], last_modified=entry["last_modified"])
+    if response is None:
+        response = Response(entry["data"])
+    response["ETag"] = entry["etag"]
+    response["Last-Modified"] = http_date(entry["last_modified"])
+    # clients may keep a copy but must revalidate before reuse
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
+
+def cached_report(request, *, report, branch_id, day, build, variant=""):
+    """
+    Serve `build()` for (report, branch_id, day[, variant]) from the report
+    cache, answering If-None-Match / If-Modified-Since with 304.
+    """
+    if branch_id is None:
+        return Response(build())
+
+    shared = cache_is_shared(_alias())
+    if not shared and not is_period_closed(branch_id, day):
+        # a per-process cache would miss invalidate_branch_day() from other
+        # workers: only days that can no longer change are cached there
+        return _conditional_response(request, _entry(build()))
+
+    cache = _cache()
+    key = f"reports:{report}:{branch_id}:{day.isoformat()}:{variant}:{_generation(branch_id, day)}"
+
+    entry = cache.get(key)
+    if entry is None:
+        entry = _entry(build())
+        # (a per-process cache only gets here for closed days)
+        closed = not shared or is_period_closed(branch_id, day)
+        timeout = None if closed else getattr(settings, "REPORT_CACHE_TTL", 300)
+        cache.set(key, entry, timeout)
+    return _conditional_response(request, entry)
+
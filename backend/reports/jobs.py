@@ -0,0 +1,188 @@
+"""
+DB-backed queue for ReportJob.
+
+The API only inserts PENDING rows (submit_job). `manage.py run_report_worker`
+claims them with a conditional UPDATE, so several workers can share the
+table without handing the same job out twice, and runs run_job in a
+process pool. Results are written gzip-compressed to the default storage
+(MEDIA_ROOT) via ReportJob.result_file.
+"""
+import gzip
+import json
+import traceback
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ReportJob, ReportJobStatus, ReportType
+from .services import (
+    build_branch_daily_pack,
+    branch_liquidity,
+    build_consolidated_daily_pack,
+    summarize_cashbook_range,
+    branch_liquidity_range,
+    iter_transaction_listing_range,
+)
+
+
+BUILDERS = {}
+# run_job() result when another claim of the job took over
+STALE = "STALE"
+
+
+def register(report_type):
+    def decorator(fn):
+        BUILDERS[report_type] = fn
+        return fn
+    return decorator
+
+
+def _date(s):
+    return timezone.datetime.strptime(s, "%Y-%m-%d").date()
+
+
+def _day(params):
+    s = params.get("date")
+    return _date(s) if s else None
+
+
+def _range(params):
+    return _date(params["date_from"]), _date(params["date_to"])
+
+
+def _cashier(params):
+    return int(params["cashier_id"]) if params.get("cashier_id") else None
+
+
+@register(ReportType.BRANCH_DAILY_PACK)
+def _branch_daily_pack(params):
+    return build_branch_daily_pack(int(params["branch_id"]), day=_day(params))
+
+
+@register(ReportType.BRANCH_LIQUIDITY)
+def _branch_liquidity(params):
+    return branch_liquidity(int(params["branch_id"]), day=_day(params))
+
+
+@register(ReportType.CONSOLIDATED_DAILY_PACK)
+def _consolidated_daily_pack(params):
+    return build_consolidated_daily_pack(day=_day(params), include_listings=True)
+
+
+@register(ReportType.CASHBOOK_RANGE)
+def _cashbook_range(params):
+    return summarize_cashbook_range(int(params["branch_id"]), *_range(params), cashier_id=_cashier(params))
+
+
+@register(ReportType.BRANCH_LIQUIDITY_RANGE)
+def _branch_liquidity_range(params):
+    return branch_liquidity_range(int(params["branch_id"]), *_range(params))
+
+
+@register(ReportType.TELLER_LISTING_RANGE)
+def _teller_listing_range(params):
+    return list(iter_transaction_listing_range(int(params["branch_id"]), *_range(params), cashier_id=_cashier(params)))
+
+
+def submit_job(*, report_type, params, requested_by) -> ReportJob:
+    return ReportJob.objects.create(report_type=report_type, params=params, requested_by=requested_by)
+
+
+def claim_jobs(*, limit: int, worker: str) -> list:
+    """Mark up to `limit` PENDING jobs RUNNING for `worker`, oldest first."""
+    if limit <= 0:
+        return []
+    candidates = list(
+        ReportJob.objects.filter(status=ReportJobStatus.PENDING)
+        .order_by("created_at", "id")
+        .values_list("id", flat=True)[: limit * 2]
+    )
+    claimed = []
+    for job_id in candidates:
+        if len(claimed) >= limit:
+            break
+        updated = ReportJob.objects.filter(pk=job_id, status=ReportJobStatus.PENDING).update(
+            status=ReportJobStatus.RUNNING,
+            worker=worker,
+            started_at=timezone.now(),
+            attempts=F("attempts") + 1,
+        )
+        if updated:
+            claimed.append(job_id)
+    return claimed
+
+
+def requeue_stale_jobs() -> int:
+    """
+    Jobs RUNNING longer than REPORT_JOB_TIMEOUT_SECONDS belong to a worker
+    that died; put them back in the queue, or fail them after
+    REPORT_JOB_MAX_ATTEMPTS.
+    """
+    timeout = int(getattr(settings, "REPORT_JOB_TIMEOUT_SECONDS", 1800))
+    max_attempts = int(getattr(settings, "REPORT_JOB_MAX_ATTEMPTS", 3))
+    stale = ReportJob.objects.filter(
+        status=ReportJobStatus.RUNNING,
+        started_at__lt=timezone.now() - timezone.timedelta(seconds=timeout),
+    )
+    failed = stale.filter(attempts__gte=max_attempts).update(
+        status=ReportJobStatus.FAILED,
+        error="Timed out (worker lost).",
+        finished_at=timezone.now(),
+    )
+    requeued = stale.update(status=ReportJobStatus.PENDING, worker="")
+    return failed + requeued
+
+
+def fail_job(job_id, message: str, worker=None):
+    """Fail a RUNNING job; with `worker`, only while that worker still owns it."""
+    jobs = ReportJob.objects.filter(pk=job_id, status=ReportJobStatus.RUNNING)
+    if worker is not None:
+        jobs = jobs.filter(worker=worker)
+    jobs.update(
+        status=ReportJobStatus.FAILED,
+        error=message[:4000],
+        finished_at=timezone.now(),
+    )
+
+
+def run_job(job_id) -> str:
+    """
+    Build one claimed job and store its result. Returns the final status, or
+    STALE when the job was requeued and claimed again meanwhile: only the
+    claim this run started under (worker + started_at) may finish the job.
+    """
+    job = ReportJob.objects.get(pk=job_id)
+    owned = ReportJob.objects.filter(
+        pk=job.id, status=ReportJobStatus.RUNNING, worker=job.worker, started_at=job.started_at
+    )
+    try:
+        builder = BUILDERS[job.report_type]
+        data = builder(job.params or {})
+        body = json.dumps(
+            {"report_type": job.report_type, "params": job.params, "generated_at": timezone.now(), "data": data},
+            cls=DjangoJSONEncoder,
+        )
+        payload = gzip.compress(body.encode("utf-8"))
+        job.result_file.save(f"report_job_{job.id}.json.gz", ContentFile(payload), save=False)
+    except Exception:
+        failed = owned.update(
+            status=ReportJobStatus.FAILED,
+            error=traceback.format_exc()[:4000],
+            finished_at=timezone.now(),
+        )
+        return ReportJobStatus.FAILED if failed else STALE
+
+    completed = owned.update(
+        status=ReportJobStatus.SUCCEEDED,
+        result_file=job.result_file.name,
+        result_size=len(payload),
+        error="",
+        finished_at=timezone.now(),
+    )
+    if not completed:
+        job.result_file.delete(save=False)
+        return STALE
+    return ReportJobStatus.SUCCEEDED
@@ -0,0 +1,45 @@
+import gzip
+import json
+import os
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+
+from reports.services import build_consolidated_daily_pack
+
+
+class Command(BaseCommand):
+    help = (
+        "Build the consolidated daily pack (liquidity for every active branch with per-branch "
+        "drill-down) and write it as JSON (gzip-compressed when the file name ends in .gz)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--date", help="Business day YYYY-MM-DD (default: today).")
+        parser.add_argument("--include-listings", action="store_true", help="Add each session's teller listing.")
+        parser.add_argument("--output", help="Output file (default: stdout).")
+
+    def handle(self, *args, **options):
+        day = None
+        if options.get("date"):
+            try:
+                day = datetime.strptime(options["date"], "%Y-%m-%d").date()
+            except ValueError:
+                raise CommandError("--date must be in YYYY-MM-DD format.")
+
+        data = build_consolidated_daily_pack(day=day, include_listings=options["include_listings"])
+        body = json.dumps(data, cls=DjangoJSONEncoder, indent=2)
+
+        output = options.get("output")
+        if not output:
+            self.stdout.write(body)
+            return
+
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        opener = gzip.open if output.endswith(".gz") else open
+        with opener(output, "wt", encoding="utf-8") as fh:
+            fh.write(body)
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote consolidated pack for {data['date']} ({data['branches']} branch(es)) to {output}"
+        ))
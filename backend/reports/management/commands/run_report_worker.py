@@ -0,0 +1,88 @@
+import multiprocessing
+import os
+import socket
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from reports.jobs import claim_jobs, fail_job, requeue_stale_jobs
+from reports.worker import init_worker_process, run_job_in_process
+
+
+class Command(BaseCommand):
+    help = (
+        "Process queued ReportJob rows in a pool of worker processes. "
+        "Runs until interrupted; use --once to drain the queue and exit."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=getattr(settings, "REPORT_WORKER_PROCESSES", 2),
+            help="Worker processes (default: REPORT_WORKER_PROCESSES).",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=getattr(settings, "REPORT_WORKER_POLL_SECONDS", 2),
+            help="Seconds between queue polls when idle (default: REPORT_WORKER_POLL_SECONDS).",
+        )
+        parser.add_argument("--once", action="store_true", help="Exit when the queue is empty.")
+
+    def handle(self, *args, **options):
+        processes = options["processes"]
+        if processes < 1:
+            raise CommandError("--processes must be at least 1.")
+        poll = options["poll_interval"]
+        worker = f"{socket.gethostname()}:{os.getpid()}"
+
+        # Pool processes are spawned (not forked) so they never share this
+        # process's database connection; each opens its own.
+        connections.close_all()
+        self.stdout.write(f"Report worker {worker} started with {processes} process(es).")
+
+        running = {}
+        with ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_worker_process,
+        ) as pool:
+            try:
+                while True:
+                    requeue_stale_jobs()
+
+                    for future in [f for f in running if f.done()]:
+                        job_id = running.pop(future)
+                        try:
+                            status = future.result()
+                        except Exception as e:  # e.g. a pool process died
+                            fail_job(job_id, f"Worker process error: {e!r}", worker=worker)
+                            status = "FAILED"
+                        self.stdout.write(f"- job #{job_id}: {status}")
+
+                    claimed = claim_jobs(limit=processes - len(running), worker=worker)
+                    for job_id in claimed:
+                        try:
+                            running[pool.submit(run_job_in_process, job_id)] = job_id
+                        except BrokenProcessPool as e:
+                            fail_job(job_id, f"Worker process error: {e!r}", worker=worker)
+                            raise CommandError("Report worker pool is broken; restart the worker.")
+
+                    if options["once"] and not running and not claimed:
+                        break
+                    if not claimed:
+                        if running:
+                            wait(list(running), timeout=poll, return_when=FIRST_COMPLETED)
+                        else:
+                            time.sleep(poll)
+            except KeyboardInterrupt:
+                self.stdout.write(self.style.WARNING(
+                    f"Interrupted; waiting for {len(running)} running job(s) to finish."
+                ))
+
+        self.stdout.write(self.style.SUCCESS("Report worker stopped."))
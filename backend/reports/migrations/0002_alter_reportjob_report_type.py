@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-18 23:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='reportjob',
+            name='report_type',
+            field=models.CharField(choices=[('BRANCH_DAILY_PACK', 'Branch daily pack'), ('BRANCH_LIQUIDITY', 'Branch liquidity'), ('CONSOLIDATED_DAILY_PACK', 'Consolidated daily pack (all branches)')], max_length=50),
+        ),
+    ]
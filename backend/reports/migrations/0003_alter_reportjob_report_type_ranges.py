@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-19 09:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0002_alter_reportjob_report_type'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='reportjob',
+            name='report_type',
+            field=models.CharField(choices=[('BRANCH_DAILY_PACK', 'Branch daily pack'), ('BRANCH_LIQUIDITY', 'Branch liquidity'), ('CONSOLIDATED_DAILY_PACK', 'Consolidated daily pack (all branches)'), ('CASHBOOK_RANGE', 'Cashbook for a date range'), ('BRANCH_LIQUIDITY_RANGE', 'Branch liquidity for a date range'), ('TELLER_LISTING_RANGE', 'Teller listing for a date range')], max_length=50),
+        ),
+    ]
@@ -1,3 +1,66 @@
+import os
+
+from django.conf import settings
 from django.db import models
 
-# Create your models here.
+
+def report_job_upload_path(instance, filename):
+    """Generate file path for generated report files."""
+    created = instance.created_at
+    return os.path.join('reports', 'jobs', f"{created:%Y}", f"{created:%m}", filename)
+
+
+class ReportJobStatus(models.TextChoices):
+    PENDING = "PENDING", "Pending"
+    RUNNING = "RUNNING", "Running"
+    SUCCEEDED = "SUCCEEDED", "Succeeded"
+    FAILED = "FAILED", "Failed"
+
+
+class ReportType(models.TextChoices):
+    BRANCH_DAILY_PACK = "BRANCH_DAILY_PACK", "Branch daily pack"
+    BRANCH_LIQUIDITY = "BRANCH_LIQUIDITY", "Branch liquidity"
+    CONSOLIDATED_DAILY_PACK = "CONSOLIDATED_DAILY_PACK", "Consolidated daily pack (all branches)"
+    CASHBOOK_RANGE = "CASHBOOK_RANGE", "Cashbook for a date range"
+    BRANCH_LIQUIDITY_RANGE = "BRANCH_LIQUIDITY_RANGE", "Branch liquidity for a date range"
+    TELLER_LISTING_RANGE = "TELLER_LISTING_RANGE", "Teller listing for a date range"
+
+
+class ReportJob(models.Model):
+    """
+    A report generated off the web workers.
+    Spec:
+      - the API creates a PENDING job
+      - `manage.py run_report_worker` claims it (RUNNING) and builds the report
+        in a process pool
+      - the result is stored gzip-compressed under MEDIA_ROOT (SUCCEEDED),
+        or the error is kept (FAILED)
+    """
+    report_type = models.CharField(max_length=50, choices=ReportType.choices)
+    params = models.JSONField(default=dict, blank=True)
+
+    status = models.CharField(max_length=20, choices=ReportJobStatus.choices, default=ReportJobStatus.PENDING)
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name="report_jobs"
+    )
+
+    attempts = models.PositiveIntegerField(default=0)
+    worker = models.CharField(max_length=100, blank=True, default="")
+    error = models.TextField(blank=True, default="")
+
+    result_file = models.FileField(upload_to=report_job_upload_path, null=True, blank=True)
+    result_size = models.PositiveBigIntegerField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["status", "created_at"]),
+            models.Index(fields=["requested_by", "created_at"]),
+        ]
+
+    def __str__(self):
+        return f"ReportJob#{self.id} {self.report_type} [{self.status}]"
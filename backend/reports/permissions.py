@@ -15,4 +15,9 @@ class IsManagerAuditorOrSuperAdmin(BasePermission):
     def has_permission(self, request, view):
         return request.user and request.user.is_authenticated and _role(request.user) in [
             "BRANCH_MANAGER", "MANAGER", "AUDITOR", "INTERNAL_AUDITOR", "SUPER_ADMIN"
-        ]
\ No newline at end of file
+        ]
+class IsAuditorOrSuperAdmin(BasePermission):
+    def has_permission(self, request, view):
+        return request.user and request.user.is_authenticated and _role(request.user) in [
+            "AUDITOR", "INTERNAL_AUDITOR", "SUPER_ADMIN"
+        ]
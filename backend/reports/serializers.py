@@ -0,0 +1,62 @@
+from django.conf import settings
+from rest_framework import serializers
+
+from .models import ReportJob, ReportType
+
+
+RANGE_REPORT_TYPES = (
+    ReportType.CASHBOOK_RANGE,
+    ReportType.BRANCH_LIQUIDITY_RANGE,
+    ReportType.TELLER_LISTING_RANGE,
+)
+
+
+class ReportJobSerializer(serializers.ModelSerializer):
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ReportJob
+        fields = [
+            "id",
+            "report_type",
+            "params",
+            "status",
+            "requested_by",
+            "attempts",
+            "error",
+            "result_size",
+            "created_at",
+            "started_at",
+            "finished_at",
+            "download_url",
+        ]
+        read_only_fields = fields
+
+    def get_download_url(self, obj: ReportJob):
+        if not obj.result_file:
+            return None
+        path = f"/api/reports/jobs/{obj.id}/download/"
+        request = self.context.get("request")
+        return request.build_absolute_uri(path) if request else path
+
+
+class ReportJobCreateSerializer(serializers.Serializer):
+    report_type = serializers.ChoiceField(choices=ReportType.choices)
+    branch_id = serializers.IntegerField(required=False)
+    date = serializers.DateField(required=False)
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+    cashier_id = serializers.IntegerField(required=False)
+
+    def validate(self, attrs):
+        if attrs["report_type"] not in RANGE_REPORT_TYPES:
+            return attrs
+        date_from, date_to = attrs.get("date_from"), attrs.get("date_to")
+        if not date_from or not date_to:
+            raise serializers.ValidationError("date_from and date_to are required for range reports.")
+        if date_to < date_from:
+            raise serializers.ValidationError("date_to must not be before date_from.")
+        max_days = getattr(settings, "REPORT_MAX_RANGE_DAYS", 366)
+        if (date_to - date_from).days + 1 > max_days:
+            raise serializers.ValidationError(f"Date range cannot exceed {max_days} days.")
+        return attrs
@@ -1,9 +1,18 @@
 from dataclasses import dataclass
 from decimal import Decimal
-from django.db.models import Sum
+from django.db.models import Sum, Q
+from django.db.models.functions import TruncDate
 from django.utils import timezone
 
+from accounts.models import Branch
 from cash.models import TellerSession, CashLedgerEntry, TellerSessionStatus, CashEventType, CashDirection
+from cash.services import CLOSE_OUT_REFERENCE_TYPE
+
+
+# The close-out return empties a drawer into the vault after it was counted;
+# counting it would zero every closed session's expected cash, so the
+# figures below leave it out (teller listings still show it).
+CLOSE_OUT = Q(event_type=CashEventType.DRAWER_TO_VAULT, reference_type=CLOSE_OUT_REFERENCE_TYPE)
 
 
 @dataclass
@@ -24,6 +33,18 @@ def _day_window(day=None):
     return DateWindow(start=start, end=end)
 
 
+def _range_window(date_from, date_to):
+    """[date_from, date_to] inclusive business days -> [start, end) datetimes."""
+    start = _day_window(date_from).start
+    end = _day_window(date_to).end
+    return DateWindow(start=start, end=end)
+
+
+def month_to_date(day=None):
+    day = day or timezone.localdate()
+    return day.replace(day=1), day
+
+
 def cashier_session_for_day(cashier_user, day=None):
     w = _day_window(day)
 
@@ -68,7 +89,7 @@ def _sum_by(qs, **filters):
 
 
 def summarize_cashbook(session: TellerSession, day=None):
-    qs = ledger_for_session(session, day=day)
+    qs = ledger_for_session(session, day=day).exclude(CLOSE_OUT)
 
     opening = session.opening_amount or Decimal("0.00")
 
@@ -198,4 +219,318 @@ def build_branch_daily_pack(branch_id: int, day=None):
     return {
         "branch_liquidity": branch_liquidity(branch_id, day=day),
         "sessions": packs,
-    }
\ No newline at end of file
+    }
+
+
+def build_consolidated_daily_pack(day=None, include_listings: bool = False):
+    """
+    Institution-wide daily pack for every active branch.
+
+    Set-based: one query each for the branches and the day's sessions, one
+    grouped ledger aggregate for all sessions (and, with include_listings,
+    one ledger scan), so the cost does not grow with the number of branches the way calling
+    build_branch_daily_pack per branch does. Figures use the same rules as
+    summarize_cashbook / branch_liquidity.
+    """
+    w = _day_window(day)
+    branches = list(Branch.objects.filter(is_active=True).order_by("name"))
+    sessions = list(
+        TellerSession.objects.select_related("cashier")
+        .filter(branch__is_active=True, allocated_at__gte=w.start, allocated_at__lt=w.end)
+        .order_by("branch_id", "cashier_id", "-id")
+    )
+
+    day_ledger = CashLedgerEntry.objects.filter(
+        session__in=[s.id for s in sessions], created_at__gte=w.start, created_at__lt=w.end
+    )
+    totals = {
+        row["session_id"]: row
+        for row in day_ledger.exclude(CLOSE_OUT).values("session_id").annotate(
+            inflow=Sum("amount", filter=Q(direction=CashDirection.INFLOW)),
+            outflow=Sum("amount", filter=Q(direction=CashDirection.OUTFLOW)),
+        )
+    }
+
+    listings = {}
+    if include_listings:
+        for e in day_ledger.select_related("created_by").order_by("session_id", "created_at", "id"):
+            listings.setdefault(e.session_id, []).append({
+                "id": e.id,
+                "created_at": e.created_at,
+                "event_type": e.event_type,
+                "direction": e.direction,
+                "amount": str(e.amount),
+                "narration": e.narration,
+                "reference_type": e.reference_type,
+                "reference_id": e.reference_id,
+                "created_by": getattr(e.created_by, "username", None),
+                "reverses_entry_id": e.reverses_entry_id,
+            })
+
+    by_branch = {}
+    for s in sessions:
+        by_branch.setdefault(s.branch_id, []).append(s)
+
+    grand_expected = Decimal("0.00")
+    grand_counted = Decimal("0.00")
+    grand_variance = Decimal("0.00")
+    table = []
+    drilldown = {}
+
+    for b in branches:
+        rows = []
+        total_expected = Decimal("0.00")
+        total_counted = Decimal("0.00")
+        total_variance = Decimal("0.00")
+
+        for s in by_branch.get(b.id, []):
+            t = totals.get(s.id, {})
+            expected = _money(t.get("inflow")) - _money(t.get("outflow"))
+            counted = s.counted_closing_amount or Decimal("0.00")
+            variance = s.variance_amount or Decimal("0.00")
+            total_expected += expected
+            total_counted += counted
+            total_variance += variance
+
+            row = {
+                "session_id": s.id,
+                "cashier_username": getattr(s.cashier, "username", ""),
+                "status": s.status,
+                "opening_amount": str(s.opening_amount or Decimal("0.00")),
+                "expected_closing_amount": str(expected),
+                "counted_closing_amount": str(counted),
+                "variance_amount": str(variance),
+            }
+            if include_listings:
+                row["teller_listing"] = listings.get(s.id, [])
+            rows.append(row)
+
+        grand_expected += total_expected
+        grand_counted += total_counted
+        grand_variance += total_variance
+
+        table.append({
+            "branch_id": b.id,
+            "branch_code": b.code,
+            "branch_name": b.name,
+            "sessions": len(rows),
+            "open_sessions": sum(1 for r in rows if r["status"] != TellerSessionStatus.CLOSED),
+            "total_expected": str(total_expected),
+            "total_counted": str(total_counted),
+            "total_variance": str(total_variance),
+        })
+        drilldown[str(b.id)] = rows
+
+    return {
+        "date": w.start.date(),
+        "branches": len(branches),
+        "total_expected": str(grand_expected),
+        "total_counted": str(grand_counted),
+        "total_variance": str(grand_variance),
+        "liquidity": table,
+        "drilldown": drilldown,
+    }
+
+
+# ---- date-range reports ----
+# One query per report over [start, end), bucketed by business day with
+# TruncDate (current time zone). Same figures as the daily versions.
+
+def _range_ledger(branch_id, w: DateWindow, cashier_id=None):
+    qs = CashLedgerEntry.objects.filter(branch_id=branch_id, created_at__gte=w.start, created_at__lt=w.end)
+    if cashier_id:
+        qs = qs.filter(session__cashier_id=cashier_id)
+    return qs
+
+
+def summarize_cashbook_range(branch_id: int, date_from, date_to, cashier_id=None):
+    w = _range_window(date_from, date_to)
+    inflow = Q(direction=CashDirection.INFLOW)
+    outflow = Q(direction=CashDirection.OUTFLOW)
+    buckets = (
+        _range_ledger(branch_id, w, cashier_id=cashier_id)
+        .exclude(CLOSE_OUT)
+        .annotate(day=TruncDate("created_at"))
+        .values("day")
+        .annotate(
+            total_inflow=Sum("amount", filter=inflow),
+            total_outflow=Sum("amount", filter=outflow),
+            savings_deposits_cash=Sum("amount", filter=inflow & Q(event_type=CashEventType.SAVINGS_DEPOSIT_CASH)),
+            loan_repayments_cash=Sum("amount", filter=inflow & Q(event_type=CashEventType.LOAN_REPAYMENT_CASH)),
+            savings_withdrawals_cash=Sum("amount", filter=outflow & Q(event_type=CashEventType.SAVINGS_WITHDRAWAL_CASH)),
+            loan_disbursements_cash=Sum("amount", filter=outflow & Q(event_type=CashEventType.LOAN_DISBURSEMENT_CASH)),
+            reversals_total=Sum("amount", filter=Q(event_type=CashEventType.REVERSAL)),
+        )
+        .order_by("day")
+    )
+
+    fields = [
+        "total_inflow",
+        "total_outflow",
+        "savings_deposits_cash",
+        "loan_repayments_cash",
+        "savings_withdrawals_cash",
+        "loan_disbursements_cash",
+        "reversals_total",
+    ]
+    totals = {f: Decimal("0.00") for f in fields}
+    days = []
+    for b in buckets:
+        row = {"date": b["day"]}
+        for f in fields:
+            v = _money(b[f])
+            totals[f] += v
+            row[f] = str(v)
+        row["net_movement"] = str(_money(b["total_inflow"]) - _money(b["total_outflow"]))
+        days.append(row)
+
+    return {
+        "branch_id": branch_id,
+        "cashier_id": cashier_id,
+        "date_from": date_from,
+        "date_to": date_to,
+        "totals": {
+            **{f: str(v) for f, v in totals.items()},
+            "net_movement": str(totals["total_inflow"] - totals["total_outflow"]),
+        },
+        "days": days,
+    }
+
+
+def branch_liquidity_range(branch_id: int, date_from, date_to):
+    """
+    branch_liquidity for every day of the range in one query. Sessions are
+    anchored on the day they were allocated and their ledger sums (limited
+    to that day) are left-joined, as in the daily report: a session with no
+    entries still shows, and one running past midnight is counted once.
+    """
+    w = _range_window(date_from, date_to)
+    same_day = (
+        Q(ledger_entries__created_at__gte=w.start, ledger_entries__created_at__lt=w.end)
+        & Q(ledger_entries__created_at__date=TruncDate("allocated_at"))
+    )
+    sessions = (
+        TellerSession.objects.filter(branch_id=branch_id, allocated_at__gte=w.start, allocated_at__lt=w.end)
+        .annotate(
+            day=TruncDate("allocated_at"),
+            inflow=Sum("ledger_entries__amount", filter=same_day & Q(ledger_entries__direction=CashDirection.INFLOW)),
+            outflow=Sum("ledger_entries__amount", filter=same_day & Q(ledger_entries__direction=CashDirection.OUTFLOW)),
+            close_out=Sum(
+                "ledger_entries__amount",
+                filter=same_day & Q(
+                    ledger_entries__event_type=CashEventType.DRAWER_TO_VAULT,
+                    ledger_entries__reference_type=CLOSE_OUT_REFERENCE_TYPE,
+                ),
+            ),
+        )
+        .values(
+            "id",
+            "day",
+            "cashier__username",
+            "status",
+            "opening_amount",
+            "counted_closing_amount",
+            "variance_amount",
+            "inflow",
+            "outflow",
+            "close_out",
+        )
+        .order_by("day", "cashier__username", "id")
+    )
+
+    days = {}
+    total_expected = Decimal("0.00")
+    total_counted = Decimal("0.00")
+    total_variance = Decimal("0.00")
+    for s in sessions:
+        # close-out returns are outflows, see CLOSE_OUT
+        expected = _money(s["inflow"]) - (_money(s["outflow"]) - _money(s["close_out"]))
+        counted = _money(s["counted_closing_amount"])
+        variance = _money(s["variance_amount"])
+        total_expected += expected
+        total_counted += counted
+        total_variance += variance
+
+        day = days.setdefault(s["day"], {
+            "date": s["day"],
+            "total_expected": Decimal("0.00"),
+            "total_counted": Decimal("0.00"),
+            "total_variance": Decimal("0.00"),
+            "rows": [],
+        })
+        day["total_expected"] += expected
+        day["total_counted"] += counted
+        day["total_variance"] += variance
+        day["rows"].append({
+            "session_id": s["id"],
+            "cashier_username": s["cashier__username"] or "",
+            "status": s["status"],
+            "opening_amount": str(_money(s["opening_amount"])),
+            "expected_closing_amount": str(expected),
+            "counted_closing_amount": str(counted),
+            "variance_amount": str(variance),
+        })
+
+    for day in days.values():
+        for key in ["total_expected", "total_counted", "total_variance"]:
+            day[key] = str(day[key])
+
+    return {
+        "branch_id": branch_id,
+        "date_from": date_from,
+        "date_to": date_to,
+        "total_expected": str(total_expected),
+        "total_counted": str(total_counted),
+        "total_variance": str(total_variance),
+        "days": list(days.values()),
+    }
+
+
+TELLER_LISTING_FIELDS = [
+    "id",
+    "created_at",
+    "session_id",
+    "event_type",
+    "direction",
+    "amount",
+    "narration",
+    "reference_type",
+    "reference_id",
+    "created_by__username",
+    "reverses_entry_id",
+]
+
+
+def transaction_listing_range_rows(branch_id: int, date_from, date_to, cashier_id=None, chunk_size=2000):
+    """
+    Teller listing for a date range as tuples in TELLER_LISTING_FIELDS order,
+    read with a server-side cursor (iterator) so long ranges are never held
+    in memory.
+    """
+    w = _range_window(date_from, date_to)
+    return (
+        _range_ledger(branch_id, w, cashier_id=cashier_id)
+        .order_by("created_at", "id")
+        .values_list(*TELLER_LISTING_FIELDS)
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+def iter_transaction_listing_range(branch_id: int, date_from, date_to, cashier_id=None, chunk_size=2000):
+    """Same rows as transaction_listing_range_rows, shaped like transaction_listing."""
+    rows = transaction_listing_range_rows(branch_id, date_from, date_to, cashier_id=cashier_id, chunk_size=chunk_size)
+    for (id_, created_at, session_id, event_type, direction, amount, narration,
+         reference_type, reference_id, created_by, reverses_entry_id) in rows:
+        yield {
+            "id": id_,
+            "created_at": created_at,
+            "session_id": session_id,
+            "event_type": event_type,
+            "direction": direction,
+            "amount": str(amount),
+            "narration": narration,
+            "reference_type": reference_type,
+            "reference_id": reference_id,
+            "created_by": created_by,
+            "reverses_entry_id": reverses_entry_id,
+        }
@@ -0,0 +1,40 @@
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from cash.models import CashLedgerEntry, TellerSession
+from cash.signals import cash_activity
+
+from .cache import invalidate_branch_day
+
+
+def _invalidate_on_commit(branch_id, days):
+    days = {d for d in days if d is not None}
+
+    def _run():
+        for day in days:
+            invalidate_branch_day(branch_id, day)
+
+    # after commit, so a concurrent request cannot re-cache pre-commit data
+    transaction.on_commit(_run)
+
+
+def _local_day(dt):
+    return timezone.localtime(dt).date() if dt else None
+
+
+@receiver(post_save, sender=CashLedgerEntry, dispatch_uid="reports_ledger_entry_saved")
+def ledger_entry_saved(sender, instance, **kwargs):
+    _invalidate_on_commit(instance.branch_id, [_local_day(instance.created_at)])
+
+
+@receiver(post_save, sender=TellerSession, dispatch_uid="reports_teller_session_saved")
+def teller_session_saved(sender, instance, **kwargs):
+    # daily reports are anchored on the session's allocation day
+    _invalidate_on_commit(instance.branch_id, [_local_day(instance.allocated_at), timezone.localdate()])
+
+
+@receiver(cash_activity, dispatch_uid="reports_cash_activity")
+def cash_activity_recorded(sender, branch_id, days, **kwargs):
+    _invalidate_on_commit(branch_id, days)
@@ -1,3 +1,332 @@
+import json
+from decimal import Decimal
+from unittest import mock
+
+from django.core.cache import cache
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from accounts.models import Branch, User
+from cash.models import TellerSession, TellerSessionStatus, CashDirection, CashEventType
+from cash.services import confirm_session_opening, post_cash_entry
+
+from . import views
+
+
+class ReportCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.branch = Branch.objects.create(
+            name="Main", code="MAIN", region="East", phone="123", address="Addr"
+        )
+        self.manager = User.objects.create_user(
+            username="mgr", email="mgr@example.com", password="x", role="BRANCH_MANAGER", branch=self.branch
+        )
+        self.cashier = User.objects.create_user(
+            username="cash", email="cash@example.com", password="x", role="CASHIER", branch=self.branch
+        )
+        self.session = TellerSession.objects.create(
+            branch=self.branch,
+            cashier=self.cashier,
+            status=TellerSessionStatus.ALLOCATED,
+            opening_amount=Decimal("100.00"),
+            allocated_by=self.manager,
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            confirm_session_opening(session=self.session, cashier=self.cashier, counted_amount=Decimal("100.00"))
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+        self.url = "/api/reports/branch_liquidity/"
+
+    def test_per_process_cache_does_not_keep_the_current_day(self):
+        with mock.patch.object(views, "branch_liquidity", wraps=views.branch_liquidity) as build:
+            first = self.client.get(self.url)
+            second = self.client.get(self.url, HTTP_IF_NONE_MATCH=first["ETag"])
+            self.assertEqual(build.call_count, 2)
+            self.assertEqual(second.status_code, 304)
+
+    @mock.patch("reports.cache.cache_is_shared", return_value=True)
+    def test_cached_until_branch_cash_changes(self, _shared):
+        with mock.patch.object(views, "branch_liquidity", wraps=views.branch_liquidity) as build:
+            first = self.client.get(self.url)
+            second = self.client.get(self.url)
+            self.assertEqual(build.call_count, 1)
+            self.assertEqual(first.data, second.data)
+
+            not_modified = self.client.get(self.url, HTTP_IF_NONE_MATCH=first["ETag"])
+            self.assertEqual(not_modified.status_code, 304)
+
+            with self.captureOnCommitCallbacks(execute=True):
+                post_cash_entry(
+                    branch=self.branch,
+                    session=self.session,
+                    event_type=CashEventType.SAVINGS_DEPOSIT_CASH,
+                    direction=CashDirection.INFLOW,
+                    amount=Decimal("25.00"),
+                    created_by=self.cashier,
+                )
+
+            third = self.client.get(self.url, HTTP_IF_NONE_MATCH=first["ETag"])
+            self.assertEqual(build.call_count, 2)
+            self.assertEqual(third.status_code, 200)
+            self.assertNotEqual(third["ETag"], first["ETag"])
+
+
+class ReportJobTests(TestCase):
+    def setUp(self):
+        import tempfile
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        self.branch = Branch.objects.create(
+            name="Main", code="MAIN", region="East", phone="123", address="Addr"
+        )
+        self.manager = User.objects.create_user(
+            username="mgr", email="mgr@example.com", password="x", role="BRANCH_MANAGER", branch=self.branch
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+
+    def test_submit_claim_run_and_download(self):
+        import gzip
+        import json
+        from .jobs import claim_jobs, run_job
+        from .models import ReportJob, ReportJobStatus
+
+        with self.settings(MEDIA_ROOT=self.media.name):
+            resp = self.client.post(
+                "/api/reports/jobs/", {"report_type": "BRANCH_LIQUIDITY", "date": "2026-01-15"}, format="json"
+            )
+            self.assertEqual(resp.status_code, 202)
+            job_id = resp.data["id"]
+            self.assertEqual(resp.data["params"]["branch_id"], self.branch.id)
+
+            self.assertEqual(self.client.get(f"/api/reports/jobs/{job_id}/download/").status_code, 409)
+
+            self.assertEqual(claim_jobs(limit=5, worker="test"), [job_id])
+            self.assertEqual(claim_jobs(limit=5, worker="other"), [])
+            self.assertEqual(run_job(job_id), ReportJobStatus.SUCCEEDED)
+
+            job = ReportJob.objects.get(pk=job_id)
+            self.assertEqual(job.attempts, 1)
+            download = self.client.get(f"/api/reports/jobs/{job_id}/download/")
+            self.assertEqual(download.status_code, 200)
+            body = json.loads(gzip.decompress(b"".join(download.streaming_content)))
+            self.assertEqual(body["data"]["branch_id"], self.branch.id)
+
+
+    def test_requeued_job_is_only_completed_by_its_current_claim(self):
+        from django.utils import timezone
+        from .jobs import STALE, claim_jobs, requeue_stale_jobs, run_job, submit_job
+        from .models import ReportJob, ReportJobStatus, ReportType
+
+        job = submit_job(
+            report_type=ReportType.BRANCH_LIQUIDITY, params={"branch_id": self.branch.id}, requested_by=self.manager
+        )
+        with self.settings(MEDIA_ROOT=self.media.name):
+            claim_jobs(limit=1, worker="first")
+            first_claim = ReportJob.objects.get(pk=job.id)
+            # the first worker looks dead: its job is handed to another one
+            ReportJob.objects.filter(pk=job.id).update(started_at=timezone.now() - timezone.timedelta(hours=1))
+            requeue_stale_jobs()
+            claim_jobs(limit=1, worker="second")
+
+            with mock.patch.object(ReportJob.objects, "get", return_value=first_claim):
+                self.assertEqual(run_job(job.id), STALE)
+            self.assertEqual(ReportJob.objects.get(pk=job.id).status, ReportJobStatus.RUNNING)
+            self.assertEqual(run_job(job.id), ReportJobStatus.SUCCEEDED)
+
+
+class ConsolidatedDailyPackTests(TestCase):
+    def _branch_with_session(self, code, deposit):
+        branch = Branch.objects.create(name=code, code=code, region="East", phone="123", address="Addr")
+        manager = User.objects.create_user(
+            username=f"mgr{code}", email=f"mgr{code}@example.com", password="x", role="BRANCH_MANAGER", branch=branch
+        )
+        cashier = User.objects.create_user(
+            username=f"cash{code}", email=f"cash{code}@example.com", password="x", role="CASHIER", branch=branch
+        )
+        session = TellerSession.objects.create(
+            branch=branch,
+            cashier=cashier,
+            status=TellerSessionStatus.ALLOCATED,
+            opening_amount=Decimal("100.00"),
+            allocated_by=manager,
+        )
+        confirm_session_opening(session=session, cashier=cashier, counted_amount=Decimal("100.00"))
+        post_cash_entry(
+            branch=branch,
+            session=session,
+            event_type=CashEventType.SAVINGS_DEPOSIT_CASH,
+            direction=CashDirection.INFLOW,
+            amount=deposit,
+            created_by=cashier,
+        )
+        return branch
+
+    def test_matches_per_branch_liquidity_in_constant_queries(self):
+        from .services import branch_liquidity, build_consolidated_daily_pack
+
+        branches = [self._branch_with_session(code, Decimal(amount)) for code, amount in [("A", "10.00"), ("B", "20.00")]]
+
+        # branches, sessions, grouped totals, listings: independent of the branch count
+        with self.assertNumQueries(4):
+            pack = build_consolidated_daily_pack(include_listings=True)
+
+        self.assertEqual(pack["branches"], 2)
+        by_id = {row["branch_id"]: row for row in pack["liquidity"]}
+        for b in branches:
+            single = branch_liquidity(b.id)
+            self.assertEqual(by_id[b.id]["total_expected"], single["total_expected"])
+            self.assertEqual(len(pack["drilldown"][str(b.id)][0]["teller_listing"]), 2)
+        self.assertEqual(pack["total_expected"], "230.00")
+
+    def test_closed_session_keeps_its_expected_cash(self):
+        from cash.services import close_branch_sessions
+        from django.utils import timezone
+        from .services import (
+            branch_liquidity, branch_liquidity_range, build_consolidated_daily_pack, summarize_cashbook,
+        )
+
+        branch = self._branch_with_session("C", Decimal("10.00"))
+        session = TellerSession.objects.get(branch=branch)
+        close_branch_sessions(
+            branch=branch, closed_by=session.allocated_by, counts={session.id: (Decimal("108.00"), "short")}
+        )
+        session.refresh_from_db()
+        self.assertEqual(session.expected_closing_amount, Decimal("110.00"))
+
+        summary = summarize_cashbook(session)
+        self.assertEqual(summary["expected_closing_amount"], "110.00")
+        self.assertEqual(summary["variance_amount"], "-2.00")
+        self.assertEqual(branch_liquidity(branch.id)["total_expected"], "110.00")
+        self.assertEqual(build_consolidated_daily_pack()["total_expected"], "110.00")
+        today = timezone.localdate()
+        self.assertEqual(branch_liquidity_range(branch.id, today, today)["total_expected"], "110.00")
+
+
+class RangeReportTests(TestCase):
+    def setUp(self):
+        self.branch = Branch.objects.create(
+            name="Main", code="MAIN", region="East", phone="123", address="Addr"
+        )
+        self.manager = User.objects.create_user(
+            username="mgr", email="mgr@example.com", password="x", role="BRANCH_MANAGER", branch=self.branch
+        )
+        self.cashier = User.objects.create_user(
+            username="cash", email="cash@example.com", password="x", role="CASHIER", branch=self.branch
+        )
+        self.session = TellerSession.objects.create(
+            branch=self.branch,
+            cashier=self.cashier,
+            status=TellerSessionStatus.ALLOCATED,
+            opening_amount=Decimal("100.00"),
+            allocated_by=self.manager,
+        )
+        confirm_session_opening(session=self.session, cashier=self.cashier, counted_amount=Decimal("100.00"))
+        post_cash_entry(
+            branch=self.branch,
+            session=self.session,
+            event_type=CashEventType.SAVINGS_WITHDRAWAL_CASH,
+            direction=CashDirection.OUTFLOW,
+            amount=Decimal("30.00"),
+            created_by=self.cashier,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+
+    def test_range_matches_daily_reports(self):
+        from django.utils import timezone
+        from .services import branch_liquidity, summarize_cashbook, summarize_cashbook_range
+
+        today = timezone.localdate()
+        week_ago = today - timezone.timedelta(days=7)
+        daily = summarize_cashbook(self.session, day=today)
+
+        with self.assertNumQueries(1):
+            summarize_cashbook_range(self.branch.id, week_ago, today)
+        # month to date may be longer than the synchronous limit
+        override = self.settings(REPORT_SYNC_MAX_RANGE_DAYS=31)
+        override.enable()
+        self.addCleanup(override.disable)
+        resp = self.client.get(
+            "/api/reports/cashbook_range/", {"date_from": week_ago.isoformat(), "date_to": today.isoformat()}
+        )
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(resp.data["days"]), 1)
+        self.assertEqual(Decimal(resp.data["totals"]["total_inflow"]), Decimal(daily["total_inflow"]))
+        self.assertEqual(Decimal(resp.data["totals"]["net_movement"]), Decimal(daily["expected_closing_amount"]))
+
+        liquidity = self.client.get("/api/reports/branch_liquidity_range/", {"period": "mtd"})
+        self.assertEqual(
+            Decimal(liquidity.data["total_expected"]),
+            Decimal(branch_liquidity(self.branch.id, day=today)["total_expected"]),
+        )
+
+        listing = self.client.get(
+            "/api/reports/teller_listing_range/", {"date_from": week_ago.isoformat(), "date_to": today.isoformat()}
+        )
+        rows = json.loads(b"".join(listing.streaming_content))
+        self.assertEqual([Decimal(r["amount"]) for r in rows], [Decimal("100.00"), Decimal("30.00")])
+
+    def test_long_ranges_are_queued_as_jobs(self):
+        import gzip
+        import tempfile
+        from django.utils import timezone
+        from .jobs import claim_jobs, run_job
+        from .models import ReportJob, ReportJobStatus, ReportType
+        from .services import branch_liquidity_range
+
+        today = timezone.localdate()
+        params = {"date_from": (today - timezone.timedelta(days=30)).isoformat(), "date_to": today.isoformat()}
+        with self.settings(REPORT_SYNC_MAX_RANGE_DAYS=7):
+            resp = self.client.get("/api/reports/branch_liquidity_range/", params)
+        self.assertEqual(resp.status_code, 202)
+        self.assertTrue(resp["Location"].endswith(f"/api/reports/jobs/{resp.data['id']}/"))
+        job = ReportJob.objects.get(pk=resp.data["id"])
+        self.assertEqual(job.report_type, ReportType.BRANCH_LIQUIDITY_RANGE)
+        self.assertEqual(job.params, dict(params, branch_id=self.branch.id))
+
+        with tempfile.TemporaryDirectory() as media, self.settings(MEDIA_ROOT=media):
+            claim_jobs(limit=1, worker="test")
+            self.assertEqual(run_job(job.id), ReportJobStatus.SUCCEEDED)
+            with ReportJob.objects.get(pk=job.id).result_file.open("rb") as fh:
+                body = json.loads(gzip.decompress(fh.read()))
+        expected = branch_liquidity_range(self.branch.id, today - timezone.timedelta(days=30), today)
+        self.assertEqual(Decimal(body["data"]["total_expected"]), Decimal(expected["total_expected"]))
+
+    def test_session_spanning_midnight_is_counted_once(self):
+        from datetime import datetime, timedelta
+        from django.utils import timezone
+        from cash.models import CashLedgerEntry
+        from .services import branch_liquidity, branch_liquidity_range
+
+        today = timezone.localdate()
+        yesterday = today - timedelta(days=1)
+        late = timezone.make_aware(datetime(yesterday.year, yesterday.month, yesterday.day, 22, 0))
+        night_cashier = User.objects.create_user(
+            username="night", email="night@example.com", password="x", role="CASHIER", branch=self.branch
+        )
+        night = TellerSession.objects.create(
+            branch=self.branch, cashier=night_cashier, status=TellerSessionStatus.CLOSED,
+            opening_amount=Decimal("50.00"), allocated_by=self.manager,
+            counted_closing_amount=Decimal("45.00"), variance_amount=Decimal("-5.00"),
+        )
+        TellerSession.objects.filter(pk=night.pk).update(allocated_at=late)
+        for hours, amount in [(1, "50.00"), (3, "20.00")]:
+            entry = CashLedgerEntry.objects.create(
+                branch=self.branch, session=night, event_type=CashEventType.SAVINGS_DEPOSIT_CASH,
+                direction=CashDirection.INFLOW, amount=Decimal(amount), created_by=night_cashier,
+            )
+            CashLedgerEntry.objects.filter(pk=entry.pk).update(created_at=late + timedelta(hours=hours))
+        # allocated today, nothing posted yet
+        TellerSession.objects.create(
+            branch=self.branch, cashier=night_cashier, status=TellerSessionStatus.ALLOCATED,
+            opening_amount=Decimal("10.00"), allocated_by=self.manager,
+        )
 
-# Create your tests here.
+        report = branch_liquidity_range(self.branch.id, yesterday, today)
+        self.assertEqual([len(d["rows"]) for d in report["days"]], [1, 2])
+        self.assertEqual(report["total_counted"], "45.00")
+        self.assertEqual(report["total_variance"], "-5.00")
+        for day, date in zip(report["days"], [yesterday, today]):
+            self.assertEqual(day["total_expected"], branch_liquidity(self.branch.id, day=date)["total_expected"])
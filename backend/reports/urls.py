@@ -1,8 +1,9 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ReportsViewSet
+from .views import ReportsViewSet, ReportJobViewSet
 
 router = DefaultRouter()
+router.register(r"jobs", ReportJobViewSet, basename="report-jobs")
 router.register(r"", ReportsViewSet, basename="reports")
 
 urlpatterns = [
@@ -1,11 +1,32 @@
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import FileResponse, StreamingHttpResponse
 from django.utils import timezone
 from rest_framework import viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
-from .permissions import IsCashier, IsBranchManager, IsManagerAuditorOrSuperAdmin
-from .services import build_cashier_daily_pack, build_branch_daily_pack, branch_liquidity
+from .permissions import IsCashier, IsBranchManager, IsManagerAuditorOrSuperAdmin, IsAuditorOrSuperAdmin
+from .services import (
+    build_cashier_daily_pack,
+    build_branch_daily_pack,
+    branch_liquidity,
+    build_consolidated_daily_pack,
+    summarize_cashbook_range,
+    branch_liquidity_range,
+    iter_transaction_listing_range,
+    month_to_date,
+    transaction_listing_range_rows,
+    TELLER_LISTING_FIELDS,
+)
+from .cache import cached_report
+from .exports import export_response
+from .jobs import submit_job
+from .models import ReportJob, ReportJobStatus, ReportType
+from .serializers import RANGE_REPORT_TYPES, ReportJobSerializer, ReportJobCreateSerializer
 
 
 class ReportsViewSet(viewsets.ViewSet):
@@ -20,11 +41,65 @@ class ReportsViewSet(viewsets.ViewSet):
         except Exception:
             return timezone.localdate()
 
+    def _parse_range(self, request):
+        """
+        ?date_from=YYYY-MM-DD&date_to=YYYY-MM-DD (inclusive) or ?period=mtd.
+        Returns (date_from, date_to, error_response).
+        """
+        if request.query_params.get("period") == "mtd":
+            date_from, date_to = month_to_date(self._parse_date(request))
+            return date_from, date_to, None
+        try:
+            date_from = timezone.datetime.strptime(request.query_params.get("date_from", ""), "%Y-%m-%d").date()
+            date_to = timezone.datetime.strptime(request.query_params.get("date_to", ""), "%Y-%m-%d").date()
+        except ValueError:
+            return None, None, Response(
+                {"detail": "date_from and date_to (YYYY-MM-DD) or period=mtd are required."}, status=400
+            )
+        if date_to < date_from:
+            return None, None, Response({"detail": "date_to must not be before date_from."}, status=400)
+        max_days = getattr(settings, "REPORT_MAX_RANGE_DAYS", 366)
+        if (date_to - date_from).days + 1 > max_days:
+            return None, None, Response({"detail": f"Date range cannot exceed {max_days} days."}, status=400)
+        return date_from, date_to, None
+
+    def _range_branch_id(self, request):
+        """Branch managers get their own branch; auditors / super admins pass branch_id."""
+        if getattr(request.user, "role", "") in ["BRANCH_MANAGER", "MANAGER"]:
+            return getattr(request.user, "branch_id", None)
+        branch_id = request.query_params.get("branch_id")
+        return int(branch_id) if branch_id and branch_id.isdigit() else None
+
+    def _range_cashier_id(self, request):
+        cashier_id = request.query_params.get("cashier_id")
+        return int(cashier_id) if cashier_id and cashier_id.isdigit() else None
+
+    def _range_job(self, request, report_type, branch_id, date_from, date_to, cashier_id=None):
+        """
+        Ranges longer than REPORT_SYNC_MAX_RANGE_DAYS are built by the report
+        worker instead: 202 with the queued job (poll its Location). None otherwise.
+        """
+        if (date_to - date_from).days + 1 <= getattr(settings, "REPORT_SYNC_MAX_RANGE_DAYS", 7):
+            return None
+        params = {"branch_id": int(branch_id), "date_from": date_from.isoformat(), "date_to": date_to.isoformat()}
+        if cashier_id:
+            params["cashier_id"] = cashier_id
+        job = submit_job(report_type=report_type, params=params, requested_by=request.user)
+        response = Response(ReportJobSerializer(job, context={"request": request}).data, status=202)
+        response["Location"] = request.build_absolute_uri(f"/api/reports/jobs/{job.id}/")
+        return response
+
     @action(detail=False, methods=["get"], permission_classes=[IsAuthenticated, IsCashier])
     def cashier_daily_pack(self, request):
         day = self._parse_date(request)
-        data = build_cashier_daily_pack(request.user, day=day)
-        return Response(data)
+        return cached_report(
+            request,
+            report="cashier_daily_pack",
+            branch_id=getattr(request.user, "branch_id", None),
+            day=day,
+            variant=request.user.pk,
+            build=lambda: build_cashier_daily_pack(request.user, day=day),
+        )
 
     @action(detail=False, methods=["get"], permission_classes=[IsAuthenticated, IsBranchManager])
     def branch_daily_pack(self, request):
@@ -32,8 +107,13 @@ class ReportsViewSet(viewsets.ViewSet):
         branch_id = getattr(request.user, "branch_id", None)
         if not branch_id:
             return Response({"detail": "User has no branch assigned."}, status=400)
-        data = build_branch_daily_pack(int(branch_id), day=day)
-        return Response(data)
+        return cached_report(
+            request,
+            report="branch_daily_pack",
+            branch_id=int(branch_id),
+            day=day,
+            build=lambda: build_branch_daily_pack(int(branch_id), day=day),
+        )
 
     @action(detail=False, methods=["get"], permission_classes=[IsAuthenticated, IsBranchManager])
     def branch_liquidity(self, request):
@@ -41,8 +121,13 @@ class ReportsViewSet(viewsets.ViewSet):
         branch_id = getattr(request.user, "branch_id", None)
         if not branch_id:
             return Response({"detail": "User has no branch assigned."}, status=400)
-        data = branch_liquidity(int(branch_id), day=day)
-        return Response(data)
+        return cached_report(
+            request,
+            report="branch_liquidity",
+            branch_id=int(branch_id),
+            day=day,
+            build=lambda: branch_liquidity(int(branch_id), day=day),
+        )
 
     @action(detail=False, methods=["get"], permission_classes=[IsAuthenticated, IsManagerAuditorOrSuperAdmin])
     def admin_branch_daily_pack(self, request):
@@ -54,5 +139,155 @@ class ReportsViewSet(viewsets.ViewSet):
         branch_id = request.query_params.get("branch_id")
         if not branch_id:
             return Response({"detail": "branch_id is required"}, status=400)
-        data = build_branch_daily_pack(int(branch_id), day=day)
-        return Response(data)
\ No newline at end of file
+        return cached_report(
+            request,
+            report="branch_daily_pack",
+            branch_id=int(branch_id),
+            day=day,
+            build=lambda: build_branch_daily_pack(int(branch_id), day=day),
+        )
+
+    @action(detail=False, methods=["get"], permission_classes=[IsAuthenticated, IsAuditorOrSuperAdmin])
+    def admin_consolidated_daily_pack(self, request):
+        """
+        Auditor / Super Admin:
+        Liquidity table for all active branches with per-branch drill-down.
+        ?include_listings=1 adds each session's teller listing.
+        """
+        day = self._parse_date(request)
+        include_listings = request.query_params.get("include_listings") in ["1", "true", "yes"]
+        data = build_consolidated_daily_pack(day=day, include_listings=include_listings)
+        return Response(data)
+
+    @action(detail=False, methods=["get"], permission_classes=[IsAuthenticated, IsManagerAuditorOrSuperAdmin])
+    def cashbook_range(self, request):
+        """Cashbook totals for a date range, bucketed per day. Optional cashier_id."""
+        date_from, date_to, error = self._parse_range(request)
+        if error:
+            return error
+        branch_id = self._range_branch_id(request)
+        if not branch_id:
+            return Response({"detail": "branch_id is required"}, status=400)
+        cashier_id = self._range_cashier_id(request)
+        job = self._range_job(request, ReportType.CASHBOOK_RANGE, branch_id, date_from, date_to, cashier_id)
+        if job:
+            return job
+        return Response(summarize_cashbook_range(branch_id, date_from, date_to, cashier_id=cashier_id))
+
+    @action(detail=False, methods=["get"], permission_classes=[IsAuthenticated, IsManagerAuditorOrSuperAdmin])
+    def branch_liquidity_range(self, request):
+        date_from, date_to, error = self._parse_range(request)
+        if error:
+            return error
+        branch_id = self._range_branch_id(request)
+        if not branch_id:
+            return Response({"detail": "branch_id is required"}, status=400)
+        job = self._range_job(request, ReportType.BRANCH_LIQUIDITY_RANGE, branch_id, date_from, date_to)
+        if job:
+            return job
+        return Response(branch_liquidity_range(branch_id, date_from, date_to))
+
+    @action(detail=False, methods=["get"], permission_classes=[IsAuthenticated, IsManagerAuditorOrSuperAdmin])
+    def teller_listing_range(self, request):
+        """Streams the teller listing for a date range as a JSON array. Optional cashier_id."""
+        date_from, date_to, error = self._parse_range(request)
+        if error:
+            return error
+        branch_id = self._range_branch_id(request)
+        if not branch_id:
+            return Response({"detail": "branch_id is required"}, status=400)
+        cashier_id = self._range_cashier_id(request)
+        job = self._range_job(request, ReportType.TELLER_LISTING_RANGE, branch_id, date_from, date_to, cashier_id)
+        if job:
+            return job
+        rows = iter_transaction_listing_range(branch_id, date_from, date_to, cashier_id=cashier_id)
+
+        def stream():
+            yield "["
+            for i, row in enumerate(rows):
+                yield ("," if i else "") + json.dumps(row, cls=DjangoJSONEncoder)
+            yield "]"
+
+        return StreamingHttpResponse(stream(), content_type="application/json")
+
+    @action(detail=False, methods=["get"], permission_classes=[IsAuthenticated, IsManagerAuditorOrSuperAdmin])
+    def teller_listing_export(self, request):
+        """Teller listing for a date range as a CSV / XLSX (?file_format=xlsx) download."""
+        date_from, date_to, error = self._parse_range(request)
+        if error:
+            return error
+        branch_id = self._range_branch_id(request)
+        if not branch_id:
+            return Response({"detail": "branch_id is required"}, status=400)
+        rows = transaction_listing_range_rows(
+            branch_id, date_from, date_to, cashier_id=self._range_cashier_id(request)
+        )
+        header = [f.replace("__username", "") for f in TELLER_LISTING_FIELDS]
+        return export_response(
+            request, f"teller_listing_{branch_id}_{date_from:%Y%m%d}_{date_to:%Y%m%d}", header, rows
+        )
+
+
+class ReportJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Background report jobs, processed by `manage.py run_report_worker`.
+      - POST   jobs/                 submit (returns 202 with the PENDING job)
+      - GET    jobs/<id>/            poll status
+      - GET    jobs/<id>/download/   gzip-compressed JSON result
+    Branch managers are limited to their own branch.
+    """
+    permission_classes = [IsAuthenticated, IsManagerAuditorOrSuperAdmin]
+    serializer_class = ReportJobSerializer
+    queryset = ReportJob.objects.all()
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        if getattr(self.request.user, "role", "") != "SUPER_ADMIN":
+            qs = qs.filter(requested_by=self.request.user)
+        return qs.order_by("-created_at")
+
+    def create(self, request):
+        serializer = ReportJobCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        branch_id = data.get("branch_id")
+        if data["report_type"] == ReportType.CONSOLIDATED_DAILY_PACK:
+            if not IsAuditorOrSuperAdmin().has_permission(request, self):
+                return Response({"detail": "Only auditors can request the consolidated pack."}, status=403)
+            params = {"date": data["date"].isoformat()} if data.get("date") else {}
+            job = submit_job(report_type=data["report_type"], params=params, requested_by=request.user)
+            return Response(ReportJobSerializer(job, context={"request": request}).data, status=202)
+
+        if getattr(request.user, "role", "") in ["BRANCH_MANAGER", "MANAGER"]:
+            own_branch = getattr(request.user, "branch_id", None)
+            if not own_branch:
+                return Response({"detail": "User has no branch assigned."}, status=400)
+            if branch_id and branch_id != own_branch:
+                return Response({"detail": "You can only request reports for your branch."}, status=403)
+            branch_id = own_branch
+        if not branch_id:
+            return Response({"detail": "branch_id is required"}, status=400)
+
+        params = {"branch_id": branch_id}
+        if data["report_type"] in RANGE_REPORT_TYPES:
+            params.update(date_from=data["date_from"].isoformat(), date_to=data["date_to"].isoformat())
+            if data.get("cashier_id"):
+                params["cashier_id"] = data["cashier_id"]
+        elif data.get("date"):
+            params["date"] = data["date"].isoformat()
+
+        job = submit_job(report_type=data["report_type"], params=params, requested_by=request.user)
+        return Response(ReportJobSerializer(job, context={"request": request}).data, status=202)
+
+    @action(detail=True, methods=["get"])
+    def download(self, request, pk=None):
+        job = self.get_object()
+        if job.status != ReportJobStatus.SUCCEEDED or not job.result_file:
+            return Response({"detail": f"Report is not ready (status {job.status})."}, status=409)
+        return FileResponse(
+            job.result_file.open("rb"),
+            as_attachment=True,
+            filename=f"report_job_{job.id}.json.gz",
+            content_type="application/gzip",
+        )
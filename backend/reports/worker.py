@@ -0,0 +1,23 @@
+"""
+Process-pool entry points for `manage.py run_report_worker`.
+
+Pool processes are spawned, so they must be importable before Django is set
+up: keep model imports inside the functions.
+"""
+
+
+def init_worker_process():
+    import django
+    django.setup()
+
+
+def run_job_in_process(job_id) -> str:
+    # pool processes are long-lived; drop stale connections around each job
+    from django.db import close_old_connections
+    from .jobs import run_job
+
+    close_old_connections()
+    try:
+        return run_job(job_id)
+    finally:
+        close_old_connections()
@@ -7,6 +7,7 @@ from .views import (
     branch_manager_pending_withdrawals,
     branch_manager_approve_withdrawal,
     branch_manager_reject_withdrawal,
+    branch_manager_transactions_export,
 )
 
 
@@ -21,6 +22,11 @@ urlpatterns = [
         branch_manager_pending_withdrawals,
         name="bm-savings-pending-withdrawals",
     ),
+    path(
+        "branch-manager/savings/transactions/export/",
+        branch_manager_transactions_export,
+        name="bm-savings-transactions-export",
+    ),
     path(
         "branch-manager/savings/withdrawals/<int:tx_id>/approve/",
         branch_manager_approve_withdrawal,
@@ -26,6 +26,7 @@ from cash.hooks import (
     record_cash_savings_deposit,
     record_cash_savings_withdrawal,
 )
+from reports.exports import export_response, iter_rows
 
 
 def _user_is_super_admin(user) -> bool:
@@ -439,6 +440,74 @@ def branch_manager_pending_withdrawals(request):
     return Response(data)
 
 
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def branch_manager_transactions_export(request):
+    """
+    Stream savings transactions for the current branch as CSV
+    (or XLSX with ?file_format=xlsx).
+    Optional filters: date_from, date_to (YYYY-MM-DD, inclusive), status, tx_type.
+    Branch Manager only (Super Admin sees all).
+    """
+    if not (_user_is_branch_manager(request.user) or _user_is_super_admin(request.user)):
+        return Response(status=status.HTTP_403_FORBIDDEN)
+
+    qs = SavingsTransaction.objects.all()
+    if not _user_is_super_admin(request.user):
+        qs = qs.filter(account__branch_id=request.user.branch_id)
+
+    params = request.query_params
+    try:
+        if params.get("date_from"):
+            qs = qs.filter(created_at__date__gte=datetime.strptime(params["date_from"], "%Y-%m-%d").date())
+        if params.get("date_to"):
+            qs = qs.filter(created_at__date__lte=datetime.strptime(params["date_to"], "%Y-%m-%d").date())
+    except ValueError:
+        return Response({"detail": "Dates must be YYYY-MM-DD."}, status=status.HTTP_400_BAD_REQUEST)
+    if params.get("status"):
+        qs = qs.filter(status=params["status"])
+    if params.get("tx_type"):
+        qs = qs.filter(tx_type=params["tx_type"])
+
+    fields = [
+        "id",
+        "created_at",
+        "account__branch_id",
+        "account__account_number",
+        "account__client__full_name",
+        "tx_type",
+        "is_credit_adjustment",
+        "amount",
+        "status",
+        "payment_method",
+        "reference",
+        "narration",
+        "posted_by__username",
+        "approved_by__username",
+        "approved_at",
+    ]
+    header = [
+        "id",
+        "created_at",
+        "branch_id",
+        "account_number",
+        "client_name",
+        "tx_type",
+        "is_credit_adjustment",
+        "amount",
+        "status",
+        "payment_method",
+        "reference",
+        "narration",
+        "posted_by",
+        "approved_by",
+        "approved_at",
+    ]
+    return export_response(
+        request, "savings_transactions", header, iter_rows(qs.order_by("created_at", "id"), fields)
+    )
+
+
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
 @transaction.atomic